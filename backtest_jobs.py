@@ -0,0 +1,240 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+import uuid
+
+# -----------------------------------------------------------------------------
+# Backtest job queue
+# -----------------------------------------------------------------------------
+# Long backtests run as jobs instead of inside the request: submit() returns
+# a job id at once, a fixed number of runner threads take queued jobs by
+# priority (higher first, then oldest), and the HTTP handlers only read job
+# state, so they stay fast however many backtests are running.
+#
+# A job is queued -> running -> done | failed | cancelled. The job function
+# gets the Job and reports progress through job.update(stage, progress); a
+# cancelled job's `cancel` event is set so the function (and StrategyPool
+# calls given the event) can stop early. Finished jobs are kept for
+# BACKTEST_JOB_TTL seconds so their results can be fetched.
+
+BACKTEST_JOB_WORKERS = int(os.getenv("BACKTEST_JOB_WORKERS", "2"))
+BACKTEST_JOB_QUEUE = int(os.getenv("BACKTEST_JOB_QUEUE", "100"))  # Queued jobs before submit() refuses
+BACKTEST_JOB_TTL = float(os.getenv("BACKTEST_JOB_TTL", "3600"))
+DEFAULT_PRIORITY = 5
+TERMINAL = ("done", "failed", "cancelled")
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, fn, priority=DEFAULT_PRIORITY, owner=None, description=None):
+        self.id = uuid.uuid4().hex
+        self.fn = fn
+        self.priority = priority
+        self.owner = owner
+        self.description = description or {}
+        self.status = "queued"
+        self.stage = "queued"
+        self.progress = 0.0
+        self.error = None
+        self.result = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.order = None  # Submission sequence number, ties broken oldest first
+        self.version = 0  # Bumped on every change, for waiters
+        self.cancel = threading.Event()
+        self._changed = threading.Condition()
+
+    def update(self, stage=None, progress=None, status=None):
+        with self._changed:
+            if stage is not None:
+                self.stage = stage
+            if progress is not None:
+                self.progress = max(0.0, min(1.0, float(progress)))
+            if status is not None:
+                self.status = status
+                if status == "running":
+                    self.started_at = time.time()
+                elif status in TERMINAL:
+                    self.finished_at = time.time()
+            self.version += 1
+            self._changed.notify_all()
+
+    def wait(self, version, timeout):
+        """
+        Block until the job changes after `version` or is finished, at most
+        timeout seconds. Returns the current version.
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version or self.status in TERMINAL, timeout)
+            return self.version
+
+    @property
+    def finished(self):
+        return self.status in TERMINAL
+
+    def to_dict(self):
+        with self._changed:
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "stage": self.stage,
+                "progress": round(self.progress, 3),
+                "priority": self.priority,
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "queued_seconds": round((self.started_at or time.time()) - self.created_at, 3),
+                "run_seconds": round((self.finished_at or time.time()) - self.started_at, 3) if self.started_at else None,
+                "version": self.version,
+                **self.description,
+            }
+
+
+class JobQueue:
+    """
+    Priority queue of jobs served by a fixed set of runner threads.
+    """
+
+    def __init__(self, workers=BACKTEST_JOB_WORKERS, max_queued=BACKTEST_JOB_QUEUE, ttl=BACKTEST_JOB_TTL):
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self._lock = threading.Condition()
+        self._heap = []
+        self._order = itertools.count()
+        self._jobs = {}
+        self._closed = False
+        self.stats = {"submitted": 0, "done": 0, "failed": 0, "cancelled": 0, "rejected": 0}
+        self._threads = [
+            threading.Thread(target=self._run, name=f"backtest-job-{i}", daemon=True) for i in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    # -------------------------------------------------------------------------
+    # Client side
+    # -------------------------------------------------------------------------
+    def submit(self, fn, priority=DEFAULT_PRIORITY, owner=None, description=None):
+        """
+        Queue fn(job) and return the Job. Raises QueueFull when max_queued
+        jobs are already waiting.
+        """
+        job = Job(fn, priority, owner, description)
+        with self._lock:
+            self._expire()
+            if self._closed:
+                raise QueueFull("Job queue is shut down")
+            if sum(1 for queued in self._jobs.values() if queued.status == "queued") >= self.max_queued:
+                self.stats["rejected"] += 1
+                raise QueueFull(f"{self.max_queued} backtest jobs are already queued, try again later")
+            job.order = next(self._order)
+            self._jobs[job.id] = job
+            heapq.heappush(self._heap, (-priority, job.order, job))
+            self.stats["submitted"] += 1
+            self._lock.notify()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self, owner=None):
+        with self._lock:
+            self._expire()
+            return [job for job in self._jobs.values() if owner is None or job.owner == owner]
+
+    def cancel(self, job_id):
+        """
+        Cancel a queued or running job. Returns the job, or None if unknown.
+        """
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return job
+        job.cancel.set()
+        with self._lock:
+            if job.status == "queued":
+                # Left in the heap; runners skip cancelled entries
+                self.stats["cancelled"] += 1
+                job.update(stage="cancelled", status="cancelled")
+        return job
+
+    def position(self, job):
+        """
+        Number of queued jobs that will run before `job`.
+        """
+        with self._lock:
+            return sum(1 for queued in self._jobs.values()
+                       if queued.status == "queued" and (-queued.priority, queued.order) < (-job.priority, job.order))
+
+    def _expire(self):
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished and now - job.finished_at > self.ttl:
+                del self._jobs[job_id]
+
+    # -------------------------------------------------------------------------
+    # Runner side
+    # -------------------------------------------------------------------------
+    def _next(self):
+        with self._lock:
+            while True:
+                while self._heap:
+                    _, _, job = heapq.heappop(self._heap)
+                    if job.status == "queued":
+                        job.update(stage="starting", status="running")
+                        return job
+                if self._closed:
+                    return None
+                self._lock.wait()
+
+    def _run(self):
+        while True:
+            job = self._next()
+            if job is None:
+                return
+            try:
+                job.result = job.fn(job)
+                outcome = "cancelled" if job.cancel.is_set() else "done"
+            except Exception as e:
+                if job.cancel.is_set():
+                    outcome = "cancelled"
+                else:
+                    outcome = "failed"
+                    job.error = str(e) or type(e).__name__
+                    print(f"Backtest job {job.id} failed: {job.error}")
+            if outcome != "done":
+                job.result = None
+            with self._lock:
+                self.stats[outcome] += 1
+            job.update(stage=outcome, progress=1.0 if outcome == "done" else None, status=outcome)
+
+    def shutdown(self, wait=True):
+        """
+        Cancel everything and stop the runner threads.
+        """
+        with self._lock:
+            self._closed = True
+            jobs = [job for job in self._jobs.values() if not job.finished]
+            self._lock.notify_all()
+        for job in jobs:
+            self.cancel(job.id)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def snapshot(self):
+        with self._lock:
+            states = [job.status for job in self._jobs.values()]
+            return dict(
+                self.stats,
+                queued=states.count("queued"),
+                running=states.count("running"),
+                workers=len(self._threads),
+                max_queued=self.max_queued,
+            )
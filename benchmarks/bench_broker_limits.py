@@ -0,0 +1,79 @@
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from broker_limits import PRIORITY_ENTRY, PRIORITY_EXIT, BrokerLimiter, OrderGate  # noqa: E402
+from broker_session import SessionManager  # noqa: E402
+from fake_smartapi import FakeSmartConnect  # noqa: E402
+
+# -----------------------------------------------------------------------------
+# Shared broker budget under a burst of orders
+# -----------------------------------------------------------------------------
+# python benchmarks/bench_broker_limits.py --bots 40 --evaluations 10 --rate 10
+#
+# `bots` threads evaluate `evaluations` times each against the offline
+# SmartAPI stand-in, every one of them holding a BUY signal for the first
+# half and a SELL signal for the second. Without the order gate each
+# evaluation is an order, as before; with it each bot sends one BUY and one
+# SELL. Every order goes through the shared placeOrder bucket (`rate` per
+# second), where SELLs queue as exits ahead of BUYs.
+
+
+def run(bots, evaluations, rate, gated):
+    FakeSmartConnect.broker.orders.clear()
+    limiter = BrokerLimiter({"placeOrder": (rate, rate)})
+    session = SessionManager(FakeSmartConnect, limiter).session("key", "user", "pass", "JBSWY3DPEHPK3PXP")
+    gate = OrderGate()
+    waits = {"BUY": [], "SELL": []}
+    lock = threading.Lock()
+
+    def bot(bot_id):
+        for evaluation in range(evaluations):
+            signal = 1 if evaluation < evaluations // 2 else -1
+            if gated:
+                decision = gate.decide(bot_id, signal)
+                if decision is None:
+                    continue
+                side = decision[0]
+            else:
+                side = "BUY" if signal == 1 else "SELL"
+            started = time.perf_counter()
+            session.placeOrder({"transactiontype": side},
+                               priority=PRIORITY_EXIT if side == "SELL" else PRIORITY_ENTRY)
+            with lock:
+                waits[side].append(time.perf_counter() - started)
+            if gated:
+                gate.settle(bot_id, True)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=bot, args=(index,)) for index in range(bots)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return waits, elapsed, len(FakeSmartConnect.broker.orders), limiter.snapshot()["placeOrder"], gate.snapshot()
+
+
+def p95(values):
+    values = sorted(values)
+    return values[int(len(values) * 0.95)] * 1000 if values else 0.0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bots", type=int, default=40)
+    parser.add_argument("--evaluations", type=int, default=10)
+    parser.add_argument("--rate", type=float, default=10.0, help="placeOrder requests per second")
+    args = parser.parse_args()
+
+    print(f"{args.bots} bots x {args.evaluations} evaluations, placeOrder budget {args.rate:.0f}/s")
+    print(f"{'mode':<12} {'orders':>7} {'total s':>8} {'buy p95 ms':>11} {'sell p95 ms':>12} "
+          f"{'max queued':>11} {'collapsed':>10}")
+    for name, gated in [("every tick", False), ("order gate", True)]:
+        waits, elapsed, orders, bucket, gate = run(args.bots, args.evaluations, args.rate, gated)
+        print(f"{name:<12} {orders:>7} {elapsed:>8.2f} {p95(waits['BUY']):>11.0f} {p95(waits['SELL']):>12.0f} "
+              f"{bucket['max_queued']:>11} {gate['collapsed']:>10}")
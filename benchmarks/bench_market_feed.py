@@ -0,0 +1,77 @@
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from fake_tick_server import FakeTickServer, synthetic_ticks  # noqa: E402
+from live_bars import LiveBars  # noqa: E402
+from market_calendar import BAR_SETTLE_SECONDS, IST  # noqa: E402
+from market_feed import MarketFeed  # noqa: E402
+
+# -----------------------------------------------------------------------------
+# Tick ingestion through the offline WebSocket
+# -----------------------------------------------------------------------------
+# python benchmarks/bench_market_feed.py --symbols 50 --minutes 30 --rate 5
+#
+# Replays a synthetic session for `symbols` tokens (`rate` ticks per second
+# each) as fast as the fake server can send it, into MarketFeed + LiveBars.
+# Reports ticks per second end to end, the aggregation cost per tick and how
+# soon after a bar's end its close event fired on the market clock, against
+# the BAR_SETTLE_SECONDS a polling bot waits for Yahoo to publish the bar.
+
+
+def run(symbols, minutes, rate):
+    start = datetime(2026, 10, 16, 9, 15, tzinfo=IST)
+    tokens = [str(10000 + index) for index in range(symbols)]
+    ticks = synthetic_ticks(tokens, start=start, seconds=minutes * 60, per_second=rate)
+    server = FakeTickServer(ticks, speed=0).start()
+    bars = LiveBars()
+    delays = []
+
+    def on_bar(symbol, interval, bar):
+        if interval == "1m":
+            end = datetime.fromisoformat(bar["end"]).timestamp()
+            delays.append(bars.clock() / 1e9 - end)
+
+    bars.listeners.append(on_bar)
+    feed = MarketFeed(bars, lambda: {"Authorization": "Bearer x", "x-api-key": "k", "x-client-code": "u",
+                                     "x-feed-token": "f"}, url=server.url)
+    for token in tokens:
+        feed.watch(f"SYM{token}.NS", token)
+    started = time.perf_counter()
+    server.wait_replayed(600)
+    while feed.stats["ticks"] < server.stats["sent"] and time.perf_counter() - started < 600:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    feed.close()
+    server.stop()
+
+    # Aggregation alone, without the socket
+    alone = LiveBars()
+    for token in tokens:
+        alone.track(f"SYM{token}.NS")
+    t = time.perf_counter()
+    for tick in ticks:
+        alone.on_tick(f"SYM{tick['token']}.NS", tick["time"] * 1_000_000, tick["ltp"] / 100.0, tick["volume"])
+    per_tick = (time.perf_counter() - t) / len(ticks)
+    return len(ticks), elapsed, per_tick, delays, bars.snapshot()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--symbols", type=int, default=50)
+    parser.add_argument("--minutes", type=int, default=30)
+    parser.add_argument("--rate", type=float, default=5.0, help="Ticks per second per symbol")
+    args = parser.parse_args()
+
+    count, elapsed, per_tick, delays, stats = run(args.symbols, args.minutes, args.rate)
+    delays.sort()
+    print(f"{count} ticks for {args.symbols} symbols over {args.minutes} market minutes")
+    print(f"end to end      {count / elapsed:>10.0f} ticks/s ({elapsed:.2f} s)")
+    print(f"aggregation     {per_tick * 1e6:>10.1f} us/tick")
+    print(f"bars closed     {stats['bars']:>10} (partial first bars dropped: {stats['partial']})")
+    if delays:
+        print(f"bar close event {delays[len(delays) // 2]:>10.2f} s after the bar end (median), "
+              f"vs {BAR_SETTLE_SECONDS:.0f} s settle when polling")
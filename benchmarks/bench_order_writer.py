@@ -0,0 +1,121 @@
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from fake_supabase import FakeClient, FakeDatabase  # noqa: E402
+from order_writer import OrderWriter  # noqa: E402
+
+# -----------------------------------------------------------------------------
+# Inline inserts vs. the background order writer
+# -----------------------------------------------------------------------------
+# python benchmarks/bench_order_writer.py --orders 2000 --latency 0.02 --outage 3
+#
+# Bots record orders against the offline Supabase stand-in with `latency`
+# seconds per request. The time a bot spends recording an order is compared
+# for a blocking insert per order and for OrderWriter.submit(). The outage
+# run takes the database down for `outage` seconds in the middle of the
+# stream and then checks that every order reached the table, through
+# retries, the spool file and its replay.
+
+
+def percentiles(values):
+    values = sorted(values)
+    if not values:
+        return 0.0, 0.0, 0.0
+    return (values[len(values) // 2] * 1000, values[int(len(values) * 0.99)] * 1000, values[-1] * 1000)
+
+
+def record_orders(record, orders, bots):
+    """
+    `bots` threads recording `orders` rows in total; returns per-call times.
+    """
+    times = []
+    lock = threading.Lock()
+
+    def bot(index):
+        for i in range(index, orders, bots):
+            row = {"order_id": f"O{i:08d}", "type": "BUY", "ticker": f"SYM{i % 50}-EQ", "price": 100.0,
+                   "quantity": 50, "bot_id": index}
+            started = time.perf_counter()
+            record(row)
+            with lock:
+                times.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=bot, args=(index,)) for index in range(bots)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return times
+
+
+def wait_for(database, rows, timeout):
+    deadline = time.monotonic() + timeout
+    while len(database.rows("bot_orders")) < rows and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return len(database.rows("bot_orders"))
+
+
+def inline(orders, bots, latency):
+    database = FakeDatabase()
+    database.latency = latency
+    client = FakeClient(database)
+    started = time.perf_counter()
+    times = record_orders(lambda row: client.table("bot_orders").insert(row).execute(), orders, bots)
+    return times, time.perf_counter() - started, database.calls, len(database.rows("bot_orders"))
+
+
+def batched(orders, bots, latency, outage, spool_path):
+    database = FakeDatabase()
+    database.latency = latency
+    client = FakeClient(database)
+    writer = OrderWriter(lambda rows: client.table("bot_orders").insert(rows).execute(), spool_path=spool_path,
+                         flush_seconds=0.05, base_backoff=0.1, max_backoff=1.0).start()
+
+    def take_down():
+        time.sleep(0.2)
+        database.down = True
+        time.sleep(outage)
+        database.down = False
+
+    if outage:
+        threading.Thread(target=take_down, daemon=True).start()
+    started = time.perf_counter()
+    times = record_orders(writer.submit, orders, bots)
+    if outage:
+        time.sleep(outage + 0.3)
+    written = wait_for(database, orders, timeout=30 + outage)
+    elapsed = time.perf_counter() - started
+    writer.close()
+    stored = {row["order_id"] for row in database.rows("bot_orders")}
+    return times, elapsed, database.calls, written, len(stored), writer.snapshot()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--bots", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds per database request")
+    parser.add_argument("--outage", type=float, default=3.0, help="Seconds the database is down in the outage run")
+    args = parser.parse_args()
+
+    print(f"{args.orders} orders from {args.bots} bots, {args.latency * 1000:.0f} ms per database request")
+    print(f"{'mode':<18} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'requests':>9} {'stored':>7} {'total s':>8}")
+    times, elapsed, calls, stored = inline(args.orders, args.bots, args.latency)
+    print(f"{'inline insert':<18} {percentiles(times)[0]:>8.3f} {percentiles(times)[1]:>8.3f} "
+          f"{percentiles(times)[2]:>8.3f} {calls:>9} {stored:>7} {elapsed:>8.2f}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, outage in [("order writer", 0.0), (f"writer, {args.outage:.0f}s down", args.outage)]:
+            spool_path = os.path.join(directory, f"spool-{outage}.jsonl")
+            times, elapsed, calls, written, unique, stats = batched(args.orders, args.bots, args.latency, outage,
+                                                                    spool_path)
+            p50, p99, worst = percentiles(times)
+            print(f"{name:<18} {p50:>8.3f} {p99:>8.3f} {worst:>8.3f} {calls:>9} {written:>7} {elapsed:>8.2f}")
+            print(f"{'':<18} unique orders {unique}/{args.orders}, spooled {stats['spooled']}, "
+                  f"replayed {stats['replayed']}, failed inserts {stats['failed_inserts']}, "
+                  f"spool left {stats['spool_pending']}")
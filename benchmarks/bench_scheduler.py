@@ -0,0 +1,109 @@
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from bot_scheduler import BotScheduler  # noqa: E402
+
+# -----------------------------------------------------------------------------
+# Thread-per-bot vs. central scheduler
+# -----------------------------------------------------------------------------
+# python benchmarks/bench_scheduler.py --bots 1000 --interval 1 --duration 10
+#
+# Each simulated bot does a little CPU work per tick (standing in for reading
+# cached bars and computing a signal) across 50 symbols, with start times
+# spread over one interval. Jitter is measured from when a tick was due to
+# when its work finished, so it includes time spent waiting for the GIL or
+# for a worker.
+
+
+def work(units):
+    total = 0
+    for i in range(units):
+        total += i * i
+    return total
+
+
+def percentiles(values):
+    values = sorted(values)
+    if not values:
+        return 0.0, 0.0, 0.0
+    return (values[len(values) // 2] * 1000, values[int(len(values) * 0.99)] * 1000, values[-1] * 1000)
+
+
+def thread_per_bot(bots, interval, duration, units, offsets):
+    lags = []
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    start = time.monotonic() + 0.5  # Common start once every thread exists
+
+    def run(offset):
+        due = start + offset
+        stop.wait(max(0.0, due - time.monotonic()))
+        while not stop.is_set():
+            work(units)
+            with lock:
+                lags.append(time.monotonic() - due)
+            due += interval
+            stop.wait(max(0.0, due - time.monotonic()))
+
+    threads = [threading.Thread(target=run, args=(offset,), daemon=True) for offset in offsets]
+    for thread in threads:
+        thread.start()
+    time.sleep(max(0.0, start - time.monotonic()) + duration)
+    peak_threads = threading.active_count()
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return peak_threads, lags
+
+
+def scheduled(bots, interval, duration, units, offsets, workers):
+    scheduler = BotScheduler(max_workers=workers).start()
+    lags = []
+
+    def setup(job):
+        def evaluate():
+            work(units)
+            lags.append(time.monotonic() - job[0].due)
+        evaluate()
+        return evaluate
+
+    start = time.monotonic() + 0.5
+    for i, offset in enumerate(offsets):
+        job = []
+        delay = start + offset - time.monotonic()
+        job.append(scheduler.add(i, f"SYM{i % 50}", lambda job=job: setup(job), interval=interval, delay=delay))
+    time.sleep(max(0.0, start - time.monotonic()) + duration)
+    threads = scheduler.stats()["threads"]
+    for i in range(bots):
+        scheduler.remove(i)
+    scheduler.shutdown()
+    return threads, lags
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bots", type=int, default=1000)
+    parser.add_argument("--interval", type=float, default=1.0)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--work", type=int, default=2000, help="Loop iterations of CPU work per tick")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--burst", action="store_true", help="Start every bot at the same instant")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    offsets = [0.0 if args.burst else rng.uniform(0, args.interval) for _ in range(args.bots)]
+
+    print(f"{args.bots} bots, {args.interval}s interval, {args.duration}s run, {args.work} work units per tick")
+    print(f"{'mode':<16} {'threads':>8} {'ticks':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, (threads, lags) in [
+        ("thread per bot", thread_per_bot(args.bots, args.interval, args.duration, args.work, offsets)),
+        ("scheduler", scheduled(args.bots, args.interval, args.duration, args.work, offsets, args.workers)),
+    ]:
+        p50, p99, worst = percentiles(lags)
+        print(f"{name:<16} {threads:>8} {len(lags):>8} {p50:>8.1f} {p99:>8.1f} {worst:>8.1f}")
@@ -0,0 +1,86 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "strategies"))
+from super_trend import calculate_supertrend, supertrend_scan  # noqa: E402
+
+# -----------------------------------------------------------------------------
+# Supertrend: per-row .iloc loop vs. array scan
+# -----------------------------------------------------------------------------
+# python benchmarks/bench_supertrend.py --sizes 10000 100000 1000000
+#
+# The strategy seeds the recursion with 0, which never matches a band, so on
+# real data the scan ends after the first bar. To time the full recursion both
+# implementations are also run seeded on the first upper band.
+
+
+def iloc_loop(close, upper_band, lower_band, seed=0.0):
+    """The previous implementation, kept as the reference."""
+    supertrend = pd.Series(index=close.index, dtype=float)
+    for i in range(len(close)):
+        if i == 0:
+            supertrend.iloc[i] = seed
+        elif supertrend.iloc[i-1] == upper_band.iloc[i-1] and close.iloc[i] < upper_band.iloc[i]:
+            supertrend.iloc[i] = upper_band.iloc[i]
+        elif supertrend.iloc[i-1] == upper_band.iloc[i-1] and close.iloc[i] > upper_band.iloc[i]:
+            supertrend.iloc[i] = lower_band.iloc[i]
+        elif supertrend.iloc[i-1] == lower_band.iloc[i-1] and close.iloc[i] > lower_band.iloc[i]:
+            supertrend.iloc[i] = lower_band.iloc[i]
+        elif supertrend.iloc[i-1] == lower_band.iloc[i-1] and close.iloc[i] < lower_band.iloc[i]:
+            supertrend.iloc[i] = upper_band.iloc[i]
+    return supertrend
+
+
+def make_bars(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    spread = np.abs(rng.normal(0, 1, n))
+    return pd.DataFrame({"High": close + spread, "Low": close - spread, "Close": close})
+
+
+def bands(df, lookback=10, multiplier=3):
+    high, low, close = df["High"], df["Low"], df["Close"]
+    tr = pd.concat([high - low, (high - close.shift(1)).abs(), (low - close.shift(1)).abs()], axis=1).max(axis=1)
+    atr = tr.rolling(window=lookback, min_periods=1).mean()
+    hl_avg = (high + low) / 2
+    return close, hl_avg + multiplier * atr, hl_avg - multiplier * atr
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--max-reference", type=int, default=100_000,
+                        help="Largest size to run the slow .iloc reference on")
+    args = parser.parse_args()
+
+    print(f"{'bars':>10} {'iloc loop':>12} {'array scan':>12} {'speedup':>10}  {'strategy (seed 0)':>18}")
+    for n in args.sizes:
+        df = make_bars(n)
+        close, upper, lower = bands(df)
+        seed = float(upper.iloc[0])
+
+        fast, fast_time = timed(supertrend_scan, close.to_numpy(), upper.to_numpy(), lower.to_numpy(), seed)
+        _, strategy_time = timed(calculate_supertrend, df.copy())
+
+        if n <= args.max_reference:
+            reference, reference_time = timed(iloc_loop, close, upper, lower, seed)
+            np.testing.assert_array_equal(fast, reference.to_numpy())
+            np.testing.assert_array_equal(
+                calculate_supertrend(df.copy())["Supertrend"].to_numpy(),
+                iloc_loop(close, upper, lower).to_numpy(),
+            )
+            print(f"{n:>10} {reference_time:>11.3f}s {fast_time:>11.4f}s {reference_time / fast_time:>9.0f}x"
+                  f"  {strategy_time:>17.4f}s")
+        else:
+            print(f"{n:>10} {'skipped':>12} {fast_time:>11.4f}s {'':>10}  {strategy_time:>17.4f}s")
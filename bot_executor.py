@@ -1,20 +1,50 @@
 import os
+import sys
+import json
+import atexit
 import time
-import threading
 from logzero import logger
 import requests
-import importlib.util
-import pandas as pd
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from datetime import datetime, timedelta
-from SmartApi import SmartConnect
-import pyotp
 from supabase import create_client, Client
+from instruments import registry as instrument_registry
+import market_data
+from broker_session import SessionManager
+from broker_limits import PRIORITY_ENTRY, PRIORITY_EXIT, BrokerLimiter, OrderGate
+from strategy_cache import StrategyCache, STRATEGY_REVALIDATE_SECONDS
+from strategy_pool import StrategyPool, StrategyTimeout
+from strategy_runner import lookback_for
+from shared_bars import SharedBarPublisher
+from sweep import SWEEP_PROCESSES, build_combinations, rank
+from performance import METRICS, ORDER_QUANTITY, evaluate as evaluate_backtest, settings_from
+import result_formats
+from result_cache import ResultCache, data_version, result_key
+from log_buffer import LogBook
+from event_bus import EventBus, TooManySubscribers
+from order_writer import OrderWriter
+from backtest_jobs import DEFAULT_PRIORITY, JobQueue, QueueFull
+from universe import UNIVERSE_MAX_SYMBOLS, summarize
+from bot_scheduler import BotScheduler, BOT_INTERVAL
+from market_calendar import nse as nse_calendar, BAR_MINUTES, BAR_SETTLE_SECONDS
+from live_bars import LIVE_INTERVALS, LiveBars
+from market_feed import MARKET_FEED, MarketFeed
+
+# Shared strategy helpers (signal_engine, ...) importable from uploaded strategies
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "strategies"))
 
 # Load environment variables
 from dotenv import load_dotenv
 load_dotenv()
 
+if os.getenv("SMARTAPI_FAKE"):
+    from fake_smartapi import FakeSmartConnect as SmartConnect
+else:
+    from SmartApi import SmartConnect
+
+if os.getenv("SUPABASE_FAKE"):
+    from fake_supabase import create_client
+
 # SmartAPI Credentials
 API_KEY = os.getenv("API_KEY")
 USERNAME = os.getenv("USERNAME")
@@ -28,43 +58,59 @@ SUPABASE_KEY = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
 # Initialize Supabase client
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
+# Executed orders go to bot_orders in batches from a background thread (spooled to disk while Supabase is down)
+order_writer = OrderWriter(lambda rows: supabase.table("bot_orders").insert(rows).execute()).start()
+atexit.register(order_writer.close)
+
 # Flask App
 app = Flask(__name__)
 
-# Dictionary to store running bot threads and stop flags
+# SmartAPI sessions shared by all bots, within one per-endpoint request budget
+broker_limiter = BrokerLimiter()
+broker_sessions = SessionManager(SmartConnect, broker_limiter)
+
+# Turns each bot's signals into orders only when its position changes
+order_gate = OrderGate()
+
+# All bots share one scheduler thread and a bounded worker pool
+bot_scheduler = BotScheduler().start()
+
+# Dictionary to store running bots (kept until /stop-bot, like before)
 running_bots = {}
 
-# Logs storage
-logs = []
+# Recent log lines and bot events, globally and per bot
+log_book = LogBook()
+LOG_READ_LIMIT = 500  # Most lines one /logs call returns
 
-def log_message(message):
-    """Stores logs in memory for frontend retrieval."""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    logs.insert(0, f"[{timestamp}] {message}")  # Insert new logs at the beginning
+# Pushes every new log entry to the open /events streams
+event_bus = EventBus()
+log_book.listeners.append(event_bus.publish)
+EVENT_HEARTBEAT_SECONDS = 15.0
+EVENT_STREAM_SECONDS = float(os.getenv("EVENT_STREAM_SECONDS", "300"))  # Then the client reconnects, freeing the thread
+
+# Load the instrument master once and pick up refreshed files in the background
+instrument_registry.reload()
+instrument_registry.watch()
+
+def log_message(message, bot_id=None, event="log", data=None):
+    """Stores logs in memory for frontend retrieval and pushes them to /events."""
+    log_book.append(message, bot_id, event, data)
     print(f"[LOG] {message}")  # Also print logs in console
 
-def get_symbol_token(stock_symbol):
-    df = pd.read_csv("instruments.csv")
-    result = df[df["symbol"] == stock_symbol]
-    if not result.empty:
-        return result.iloc[0]["token"]
-    else:
+def format_log(entry):
+    timestamp = datetime.fromtimestamp(entry["time"]).strftime("%Y-%m-%d %H:%M:%S")
+    return f"[{timestamp}] {entry['message']}"
+
+def get_symbol_token(stock_symbol, exchange=None):
+    token = instrument_registry.lookup(stock_symbol, exchange)
+    if token is None:
         log_message(f"Symbol token not found for {stock_symbol}")
-        return None
+    return token
 
-# Function to initialize SmartAPI connection
+# Function to get the shared SmartAPI session (logs in on first use only)
 def init_smartapi():
     try:
-        smartapi = SmartConnect(api_key=API_KEY)
-        totp = pyotp.TOTP(TOTP_SECRET).now()
-        data = smartapi.generateSession(USERNAME, PASSWORD, totp)
-
-        if not data.get("status"):
-            log_message(f"SmartAPI Login Failed: {data}")
-            return None
-        
-        log_message("SmartAPI Login Successful.")
-        return smartapi
+        return broker_sessions.session(API_KEY, USERNAME, PASSWORD, TOTP_SECRET)
     except Exception as e:
         log_message(f"SmartAPI Initialization Failed: {str(e)}")
         return None
@@ -84,28 +130,124 @@ def fetch_strategy_file(strategy_filename):
         log_message(f"Error fetching strategy file from Supabase: {str(e)}")
         return None
 
-# Function to dynamically load strategy module
-def load_strategy_module(strategy_filename):
-    strategy_code = fetch_strategy_file(strategy_filename)
-    if strategy_code is None:
+# Function to read the storage version of a strategy file (cheap metadata call)
+def fetch_strategy_version(strategy_filename):
+    info = supabase.storage.from_("strategies").info(strategy_filename)
+    return info.get("etag") or info.get("version") or info.get("last_modified") or info.get("updated_at")
+
+# Compiled strategies keyed by file path and content hash
+strategy_cache = StrategyCache(fetch_strategy_file, fetch_strategy_version)
+
+# Bars of running bots' symbols, published in shared memory for the strategy workers
+bar_publisher = SharedBarPublisher()
+atexit.register(bar_publisher.close)
+
+# Bot ID -> (symbol, interval, whether the live feed streams it) it keeps published
+bot_feeds = {}
+
+# Ticks of running bots' symbols from the SmartAPI WebSocket, aggregated into bars that extend the cached history
+live_bars = LiveBars()
+
+def feed_credentials():
+    return broker_sessions.session(API_KEY, USERNAME, PASSWORD, TOTP_SECRET).feed_headers()
+
+if MARKET_FEED:
+    market_feed = MarketFeed(live_bars, feed_credentials)
+    market_data.live_source = live_bars
+    atexit.register(market_feed.close)
+else:
+    market_feed = None
+
+# A closed live bar wakes the bots trading it instead of waiting for the settle delay. Not the
+# session's last bar: it closes with the market and was already acted on before the close
+def bar_closed(symbol, interval, bar):
+    during_session = nse_calendar.is_open(datetime.fromisoformat(bar["end"]))
+    for bot_id, feed in list(bot_feeds.items()):
+        if feed[:2] == (symbol, interval):
+            log_message(f"{interval} bar of {symbol} closed at {bar['close']}", bot_id, event="bar",
+                        data=dict(bar, symbol=symbol, interval=interval))
+            if during_session:
+                bot_scheduler.wake(bot_id)
+
+live_bars.listeners.append(bar_closed)
+
+# Stream a bot's symbol from the live feed; False when its bars come from Yahoo Finance only
+def watch_live(stock_symbol, symbol, interval):
+    if market_feed is None or interval not in LIVE_INTERVALS:
+        return False
+    token = get_symbol_token(f"{stock_symbol}-EQ", "NSE")
+    return token is not None and market_feed.watch(symbol, token, "NSE")
+
+# Strategies run in worker processes (their Yahoo Finance calls go through the shared bar cache)
+strategy_pool = StrategyPool(strategy_cache.get_code)
+
+# Backtests (synchronous or queued), sweeps and universe runs get their own workers so they never delay live bots
+sweep_pool = StrategyPool(strategy_cache.get_code, processes=SWEEP_PROCESSES)
+
+# Queued backtests; runner threads only wait on the sweep workers, so this bounds their share of them
+backtest_jobs = JobQueue()
+JOB_MAX_WAIT = 25.0  # Longest long-poll / stream heartbeat interval
+
+# Backtest result frames by strategy hash, symbol, range, params and data version
+result_cache = ResultCache()
+
+# Strategy ID -> (file path, looked up at); repeat backtests skip the Supabase query
+strategy_paths = {}
+
+# Look up the storage path of a strategy (None if there is no such strategy)
+def strategy_file_path(strategy_id):
+    cached = strategy_paths.get(strategy_id)
+    if cached is not None and time.time() - cached[1] < STRATEGY_REVALIDATE_SECONDS:
+        return cached[0]
+    response = supabase.table("py_strategies").select("file_path").eq("id", strategy_id).execute()
+    if not response.data:
+        strategy_paths.pop(strategy_id, None)
         return None
-    # strategy_code = open("trend_follow_99b667f0-70b4-4591-829c-9af7b468b8a6.py", "rb").read()
-    module_name = strategy_filename.replace(".py", "")
-    spec = importlib.util.spec_from_loader(module_name, loader=None)
-    strategy_module = importlib.util.module_from_spec(spec)
-    exec(strategy_code.decode("utf-8"), strategy_module.__dict__)
-    
-    return strategy_module
+    file_path = response.data[0]["file_path"]
+    strategy_paths[strategy_id] = (file_path, time.time())
+    return file_path
+
+# Check that a strategy can be fetched and compiled
+def can_load_strategy(strategy_filename):
+    _, code = strategy_cache.get_code(strategy_filename)
+    return code is not None
+
+# Broker order statuses: still being validated (looked at again), and refused by the broker or exchange
+PENDING_ORDER_STATUSES = {"validation pending", "put order req received", "open pending"}
+FAILED_ORDER_STATUSES = {"rejected", "cancelled"}
+ORDER_STATUS_CHECKS = int(os.getenv("ORDER_STATUS_CHECKS", "3"))
+ORDER_STATUS_WAIT = 1.0  # Seconds between looks at a pending order
+
+def order_status(order):
+    return ((order or {}).get("status") or (order or {}).get("orderstatus") or "").lower() or None
+
+# The order book entry of a just-placed order; None when the book could not tell
+def placed_order(smartapi, order_id, placed_at, priority):
+    order = None
+    since = placed_at
+    for check in range(ORDER_STATUS_CHECKS):
+        if check:
+            time.sleep(ORDER_STATUS_WAIT)
+            since = time.monotonic()
+        try:
+            order = smartapi.order_book(since=since, priority=priority).get(order_id)
+        except Exception as e:
+            logger.warning(f"Could not check the status of order {order_id}: {e}")
+            return order
+        if order is not None and order_status(order) not in PENDING_ORDER_STATUSES:
+            break
+    return order
 
 # Function to place an order
-def place_order(smartapi, tradingsymbol, transaction_type, quantity, price, user_id, bot_id, product_type="INTRADAY"):
+def place_order(smartapi, tradingsymbol, transaction_type, quantity, price, user_id, bot_id, product_type="INTRADAY",
+                exit=None):
     tradingsymbol = tradingsymbol + "-EQ"
     try:
         logger.info(f"Placing {transaction_type} order for {tradingsymbol} - Qty: {quantity}, Price: {price}")
         order_params = {
             "variety": "NORMAL",
             "tradingsymbol": tradingsymbol,
-            "symboltoken": get_symbol_token(tradingsymbol),
+            "symboltoken": get_symbol_token(tradingsymbol, "NSE"),
             "transactiontype": transaction_type,
             "exchange": "NSE",
             "ordertype": "LIMIT",
@@ -114,9 +256,22 @@ def place_order(smartapi, tradingsymbol, transaction_type, quantity, price, user
             "price": price,
             "quantity": quantity
         }
-        order_id = smartapi.placeOrder(order_params)
+        # Exits (closing or reversing a position; by default any SELL) get the order budget before entries
+        if exit is None:
+            exit = transaction_type == "SELL"
+        priority = PRIORITY_EXIT if exit else PRIORITY_ENTRY
+        order_id = smartapi.placeOrder(order_params, priority=priority)
         logger.info(f"Order ID: {order_id}")
-        # Insert the executed order into Supabase
+        # An order id only means the broker accepted the request; the exchange may still refuse it
+        order = placed_order(smartapi, order_id, time.monotonic(), priority)
+        status = order_status(order)
+        if status in FAILED_ORDER_STATUSES:
+            reason = order.get("text") or status
+            log_message(f"{transaction_type} order {order_id} for {tradingsymbol} was {status}: {reason}", bot_id,
+                        event="order", data={"order_id": order_id, "type": transaction_type, "ticker": tradingsymbol,
+                                             "price": price, "quantity": quantity, "status": status, "error": reason})
+            return {"success": False, "order_id": order_id, "error": f"Order {status}: {reason}"}
+        # Record the executed order
         order_data = {
             "order_id": order_id,
             "type": transaction_type,
@@ -127,63 +282,130 @@ def place_order(smartapi, tradingsymbol, transaction_type, quantity, price, user
             "user_id": user_id,
             "bot_id": bot_id
         }
-        supabase.table("bot_orders").insert(order_data).execute()
+        order_writer.submit(order_data)  # Written to Supabase in the background
 
-        log_message(f"Order placed successfully. Order ID: {order_id}")
+        log_message(f"Order placed successfully. Order ID: {order_id}", bot_id, event="order", data=order_data)
         return {"success": True, "order_id": order_id}
     except Exception as e:
         logger.exception("Order placement failed.")
+        log_message(f"{transaction_type} order for {tradingsymbol} failed: {str(e)}", bot_id, event="order",
+                    data={"type": transaction_type, "ticker": tradingsymbol, "price": price, "quantity": quantity,
+                          "error": str(e)})
         return {"success": False, "error": str(e)}
 
 
-# Bot execution function (runs in a separate thread)
-def bot_execution(bot_id, stock_symbol, strategy_filename, user_id):
-    global running_bots
+SIGNAL_NAMES = {1: "BUY", -1: "SELL", 0: "HOLD"}
+
+SEED_ORDER_ROWS = 20  # Newest recorded orders looked at when a bot starts
+
+# Side of the bot's newest order that the broker has not rejected or cancelled, counting rows still
+# waiting in the order writer; None if it has none
+def last_order_side(bot_id, smartapi):
+    rows = [row for row in order_writer.unwritten() if str(row.get("bot_id")) == str(bot_id)]
+    response = (supabase.table("bot_orders").select("order_id, type, execution_time").eq("bot_id", bot_id)
+                .order("execution_time", desc=True).limit(SEED_ORDER_ROWS).execute())
+    rows += response.data or []
+    try:
+        book = smartapi.order_book(since=time.monotonic())  # Today's orders only
+    except Exception as e:
+        logger.warning(f"Could not read the order book for bot {bot_id}, trusting its recorded orders: {e}")
+        book = {}
+    rows.sort(key=lambda row: str(row.get("execution_time") or ""), reverse=True)
+    for row in rows:
+        if order_status(book.get(row.get("order_id"))) not in FAILED_ORDER_STATUSES:
+            return row["type"]
+    return None
+
+# Bot setup (runs once on a scheduler worker); returns the per-tick evaluation
+def bot_execution(bot_id, stock_symbol, strategy_filename, user_id, interval=market_data.DEFAULT_INTERVAL,
+                  quantity=ORDER_QUANTITY, long_only=False):
     smartapi = init_smartapi()
     
     if not smartapi:
-        log_message("SmartAPI login failed")
-        return
+        log_message("SmartAPI login failed", bot_id)
+        return None
     
-    strategy_module = load_strategy_module(strategy_filename)
-    if not strategy_module:
-        log_message("Failed to load strategy")
-        return
-
-    stop_flag = running_bots[bot_id]["stop_flag"]
+    if not can_load_strategy(strategy_filename):
+        log_message("Failed to load strategy", bot_id)
+        return None
 
-    while not stop_flag.is_set():  # Check stop flag to exit immediately
+    # Resume the position the bot's last order left, so a restart does not trade twice
+    try:
+        last_side = last_order_side(bot_id, smartapi)
+    except Exception as e:
+        log_message(f"Could not read the last order of bot {bot_id}: {str(e)}", bot_id)
+        return None
+    order_gate.seed(bot_id, last_side, long_only)
+    if order_gate.position(bot_id) != order_gate.FLAT:
+        log_message(f"Bot {bot_id} resumes {order_gate.position(bot_id)} {stock_symbol} "
+                    f"(its last order was a {last_side}).", bot_id)
+
+    symbol = f"{stock_symbol}.NS"
+    runner = strategy_pool.runner(bot_id, strategy_filename, symbol, interval)
+    bar_publisher.watch(symbol, interval)
+    bot_feeds[bot_id] = (symbol, interval, watch_live(stock_symbol, symbol, interval))
+    last_signal = None
+
+    def evaluate():
+        nonlocal last_signal
+        log_message(f"Executing strategy for {stock_symbol}...", bot_id)
         try:
-            log_message(f"Executing strategy for {stock_symbol}...")
-            backtest_results = strategy_module.backtest_strategy(
-                f"{stock_symbol}.NS",
-                (datetime.today() - timedelta(days=60)).strftime("%Y-%m-%d"), 
-                datetime.now().strftime("%Y-%m-%d")
-            )
-
-            if backtest_results is None or backtest_results.empty:
-                log_message(f"No backtest results for {stock_symbol}. Retrying in 10 seconds.")
-                stop_flag.wait(10)  # Sleep but allows immediate stop
-                continue
-
-            latest_signal = backtest_results["Signal"].iloc[-1]
-            latest_close = backtest_results["Close"].iloc[-1]
-
-            if latest_signal == 1:
-                log_message(f"Buy signal detected for {stock_symbol}.")
-                place_order(smartapi, stock_symbol, "BUY", 50, latest_close, user_id, bot_id)
-
-            elif latest_signal == -1:
-                log_message(f"Sell signal detected for {stock_symbol}.")
-                place_order(smartapi, stock_symbol, "SELL", 50, latest_close, user_id=user_id, bot_id=bot_id)
-
-            stop_flag.wait(10)  # Sleep but allows immediate stop
-
+            bar_publisher.refresh(symbol, interval, lookback_for(interval))
         except Exception as e:
-            log_message(f"Error in bot execution: {str(e)}")
-            break
-
-    log_message(f"Bot {bot_id} stopped.")
+            # The worker falls back to the bar store
+            log_message(f"Could not publish bars for {stock_symbol}: {str(e)}", bot_id)
+        evaluation = runner.evaluate()
+
+        if evaluation is None:
+            if not runner.incremental:
+                log_message(f"No backtest results for {stock_symbol}. Retrying at the next run.", bot_id)
+            return
+
+        latest_signal, latest_close = evaluation
+        if latest_signal != last_signal:
+            log_message(f"Signal for {stock_symbol} changed to {SIGNAL_NAMES.get(latest_signal, latest_signal)}.", bot_id,
+                        event="signal", data={"symbol": stock_symbol, "signal": int(latest_signal),
+                                              "previous": last_signal, "close": float(latest_close)})
+            last_signal = int(latest_signal)
+
+        # Only a change of position places an order; repeated signals are collapsed
+        decision = order_gate.decide(bot_id, latest_signal)
+        if decision is None:
+            return
+        side, lots = decision  # Two lots reverse a long into a short or back
+        exit = order_gate.position(bot_id) != order_gate.FLAT
+        log_message(f"{side.capitalize()} signal detected for {stock_symbol}.", bot_id)
+        result = place_order(smartapi, stock_symbol, side, quantity * lots, latest_close, user_id, bot_id, exit=exit)
+        order_gate.settle(bot_id, result["success"])
+
+    return evaluate
+
+# Free a stopped bot's worker state and shared bars
+def release_bot(bot_id):
+    strategy_pool.forget(bot_id)
+    order_gate.forget(bot_id)
+    feed = bot_feeds.pop(bot_id, None)
+    if feed is not None:
+        symbol, interval, live = feed
+        bar_publisher.unwatch(symbol, interval)
+        if live:
+            market_feed.unwatch(symbol)
+
+# Called by the scheduler when a bot ends on its own (setup failed or evaluation raised)
+def bot_exited(bot_id, error):
+    release_bot(bot_id)
+    if error is not None:
+        log_message(f"Error in bot execution: {str(error)}", bot_id)
+    log_message(f"Bot {bot_id} stopped.", bot_id)
+
+# Next scheduled evaluation; a bar the live feed already woke the bot for is not evaluated again
+def next_bot_run(now, symbol, interval, intrabar):
+    moment = nse_calendar.next_run(now, interval, intrabar=intrabar, poll=BOT_INTERVAL)
+    delivered = live_bars.last_close(symbol, interval)
+    settle = timedelta(seconds=BAR_SETTLE_SECONDS)
+    if not intrabar and delivered is not None and moment - settle <= delivered:
+        moment = nse_calendar.next_run(delivered + settle, interval)
+    return moment
 
 # API Endpoint: Start a Bot
 @app.route("/start-bot", methods=["POST"])
@@ -192,8 +414,19 @@ def start_bot():
     bot_id = data.get("bot_id")
     stock_symbol = data.get("stock_symbol")
     user_id = data.get("user_id")
+    interval = data.get("interval", market_data.DEFAULT_INTERVAL)  # Bar interval of the strategy
+    intrabar = bool(data.get("intrabar", False))  # Evaluate during the bar instead of at its close
+    quantity = data.get("quantity", ORDER_QUANTITY)  # Shares per order
+    long_only = data.get("long_only", False)  # SELL only closes a long (as backtests trade) instead of going short
     print(user_id)
 
+    if interval not in BAR_MINUTES:
+        return jsonify({"success": False, "error": f"Unsupported interval: {interval}"}), 400
+    if not isinstance(quantity, int) or quantity <= 0:
+        return jsonify({"success": False, "error": "quantity must be a positive integer"}), 400
+    if not isinstance(long_only, bool):
+        return jsonify({"success": False, "error": "long_only must be true or false"}), 400
+
     if bot_id in running_bots:
         return jsonify({"success": False, "error": "Bot is already running"}), 400
 
@@ -202,14 +435,17 @@ def start_bot():
     strategy_name_response = supabase.table("py_strategies").select("file_path").eq("id", strategy_id).execute()
     strategy_filename = strategy_name_response.data[0]["file_path"]
 
-    stop_flag = threading.Event()
-    bot_thread = threading.Thread(target=bot_execution, args=(bot_id, stock_symbol, strategy_filename, user_id), daemon=True)
-    
-    running_bots[bot_id] = {"thread": bot_thread, "stop_flag": stop_flag}
-    bot_thread.start()
+    job = bot_scheduler.add(
+        bot_id,
+        stock_symbol,
+        lambda: bot_execution(bot_id, stock_symbol, strategy_filename, user_id, interval, quantity, long_only),
+        on_exit=bot_exited,
+        next_run=lambda now: next_bot_run(now, f"{stock_symbol}.NS", interval, intrabar),
+    )
+    running_bots[bot_id] = {"job": job}
 
-    log_message(f"Bot {bot_id} started.")
-    return jsonify({"success": True, "message": f"Bot {bot_id} started"}), 200
+    log_message(f"Bot {bot_id} started ({'long only' if long_only else 'long and short'}).", bot_id)
+    return jsonify({"success": True, "message": f"Bot {bot_id} started", "long_only": long_only}), 200
 
 # API Endpoint: Stop a Bot
 @app.route("/stop-bot", methods=["POST"])
@@ -218,54 +454,510 @@ def stop_bot():
     bot_id = data.get("bot_id")
 
     if bot_id not in running_bots:
-        log_message(f"Bot {bot_id} is not running")
+        log_message(f"Bot {bot_id} is not running", bot_id)
         return jsonify({"success": False, "error": "Bot is not running"}), 400
 
-    log_message(f"Stopping bot {bot_id}...")
-    running_bots[bot_id]["stop_flag"].set()
-    running_bots[bot_id]["thread"].join()
+    log_message(f"Stopping bot {bot_id}...", bot_id)
+    if bot_scheduler.remove(bot_id):  # Waits for an evaluation in progress
+        release_bot(bot_id)
+        log_message(f"Bot {bot_id} stopped.", bot_id)
     del running_bots[bot_id]
 
     return jsonify({"success": True, "message": f"Bot {bot_id} stopped"}), 200
 
+# One server-sent event of a log entry
+def sse_event(entry):
+    return f"id: {entry['seq']}\nevent: {entry['event']}\ndata: {json.dumps(entry, default=str)}\n\n"
+
+# API Endpoint: Push bot logs, signal changes and orders as server-sent events
+# ?bot_id=1,2 limits the stream to those bots; the Last-Event-ID header a reconnecting
+# EventSource sends (or ?since=<seq>) replays what was missed, otherwise the 20 latest entries
+@app.route("/events", methods=["GET"])
+def stream_events():
+    bot_ids = {bot_id for bot_id in request.args.get("bot_id", "").split(",") if bot_id} or None
+    since = request.headers.get("Last-Event-ID", type=int)  # Newer than ?since on a reconnect
+    if since is None:
+        since = request.args.get("since", type=int)
+    try:
+        # Subscribe before the replay so nothing falls in between
+        subscription = event_bus.subscribe(bot_ids)
+    except TooManySubscribers as e:
+        return jsonify({"success": False, "error": str(e)}), 503
+
+    pages = [log_book.read(bot_id, since or 0, LOG_READ_LIMIT if since is not None else 20)
+             for bot_id in (sorted(bot_ids) if bot_ids else [None])]
+
+    def events():
+        try:
+            yield "retry: 3000\n\n"
+            last = since or 0
+            if since is not None and any(page["truncated"] or page["reset"] for page in pages):
+                yield "event: gap\ndata: {}\n\n"  # Some entries after since are gone; reload the view
+            for entry in sorted((entry for page in pages for entry in page["entries"]), key=lambda entry: entry["seq"]):
+                last = max(last, entry["seq"])
+                yield sse_event(entry)
+
+            deadline = time.monotonic() + EVENT_STREAM_SECONDS
+            while time.monotonic() < deadline:
+                entry = subscription.get(EVENT_HEARTBEAT_SECONDS)
+                if entry is None:
+                    if subscription.dropped:
+                        yield "event: dropped\ndata: {}\n\n"  # Too far behind; reconnect with Last-Event-ID
+                        return
+                    yield ": keepalive\n\n"
+                elif entry["seq"] > last:
+                    last = entry["seq"]
+                    yield sse_event(entry)
+        finally:
+            subscription.close()
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# API Endpoint: Event stream subscribers and drops
+@app.route("/events/stats", methods=["GET"])
+def event_stats():
+    return jsonify(event_bus.snapshot()), 200
+
+# API Endpoint: Order persistence queue, batches and spool
+@app.route("/orders/stats", methods=["GET"])
+def order_writer_stats():
+    return jsonify(order_writer.snapshot()), 200
+
+# API Endpoint: Broker request budget (queue depth and waits per endpoint) and collapsed orders
+@app.route("/broker/stats", methods=["GET"])
+def broker_stats():
+    return jsonify({
+        "endpoints": broker_limiter.snapshot(),
+        "orders": order_gate.snapshot(),
+        "sessions": broker_sessions.stats(),
+    }), 200
+
+# API Endpoint: Live market feed connection and tick-to-bar aggregation
+@app.route("/market-feed/stats", methods=["GET"])
+def market_feed_stats():
+    feed = market_feed.snapshot() if market_feed is not None else {"enabled": False}
+    return jsonify({"feed": feed, "bars": live_bars.snapshot()}), 200
+
+# API Endpoint: Scheduler load (bots, worker threads, scheduling lag)
+@app.route("/scheduler/stats", methods=["GET"])
+def scheduler_stats():
+    return jsonify(bot_scheduler.stats()), 200
+
+# API Endpoint: Strategy worker processes (timeouts, crashes, recycling)
+@app.route("/strategy-pool/stats", methods=["GET"])
+def strategy_pool_stats():
+    return jsonify(strategy_pool.snapshot()), 200
+
+# API Endpoint: Shared-memory bar segments
+@app.route("/shared-bars/stats", methods=["GET"])
+def shared_bars_stats():
+    return jsonify(bar_publisher.snapshot()), 200
+
+# API Endpoint: Search instruments (watchlist autocomplete)
+@app.route("/instruments/search", methods=["GET"])
+def search_instruments():
+    query = request.args.get("q", "")
+    limit = min(request.args.get("limit", 20, type=int), 100)
+    results = [instrument._asdict() for instrument in instrument_registry.search(query, limit)]
+    return jsonify({"results": results}), 200
+
+# API Endpoint: Market data cache counters
+@app.route("/market-data/stats", methods=["GET"])
+def market_data_stats():
+    return jsonify(market_data.stats()), 200
+
+# API Endpoint: Drop cached strategy code after an edit or re-upload
+@app.route("/strategy-cache/invalidate", methods=["POST"])
+def invalidate_strategy_cache():
+    data = request.json or {}
+    file_path = data.get("file_path")
+    strategy_id = data.get("strategy_id")
+    if strategy_id:
+        strategy_paths.pop(strategy_id, None)
+    if strategy_id and not file_path:
+        file_path = strategy_file_path(strategy_id)
+        if not file_path:
+            return jsonify({"success": False, "error": "Strategy not found"}), 404
+    strategy_cache.invalidate(file_path)
+    return jsonify({"success": True, "stats": strategy_cache.snapshot()}), 200
+
+# API Endpoint: Backtest result cache counters
+@app.route("/result-cache/stats", methods=["GET"])
+def result_cache_stats():
+    return jsonify(result_cache.snapshot()), 200
+
 # API Endpoint: Fetch logs
+# ?bot_id=: only that bot's lines; ?since=<seq>: only lines after that sequence number
+# "logs" keeps the old shape (newest first); "entries" are oldest first with seq numbers
 @app.route("/logs", methods=["GET"])
 def get_logs():
-    return jsonify({"logs": logs[:20]}), 200  # Limit to last 50 logs
+    bot_id = request.args.get("bot_id")
+    since = request.args.get("since", type=int)
+    limit = min(request.args.get("limit", 20 if since is None else LOG_READ_LIMIT, type=int), LOG_READ_LIMIT)
+    page = log_book.read(bot_id, since or 0, max(limit, 1))
+    return jsonify({
+        "logs": [format_log(entry) for entry in reversed(page["entries"])],
+        "entries": page["entries"],
+        "next_since": page["last_seq"],
+        "truncated": page["truncated"],
+        "reset": page["reset"],
+    }), 200
+
+
+# Parse a backtest request body: (options, None), or (None, error response)
+def backtest_options(data):
+    result_format = data.get("format", "records")  # records, columns, ndjson or arrow
+    if result_format not in result_formats.FORMATS:
+        return None, (jsonify({"success": False, "error": f"Unknown format {result_format}; choose from {list(result_formats.FORMATS)}"}), 400)
+    if result_format == "arrow" and not result_formats.arrow_available():
+        return None, (jsonify({"success": False, "error": "Arrow responses need pyarrow installed on the server"}), 501)
+    if not data.get("stock_symbol"):
+        return None, (jsonify({"success": False, "error": "stock_symbol is required"}), 400)
+    try:
+        options = {
+            "stock_symbol": data.get("stock_symbol") + ".NS",
+            "start_date": data.get("start_date"),
+            "end_date": data.get("end_date"),
+            "params": data.get("params") or {},  # Keyword arguments for backtest_strategy
+            "use_cache": data.get("cache", True),  # False: always recompute (the result is still stored)
+            "include_rows": data.get("rows", True),  # False: summary (and curve / trades) only
+            "format": result_format,
+            "columns": data.get("columns"),  # Only these result columns
+            "decimals": data.get("round"),  # Round floats to this many decimals
+            "equity_points": int(data.get("equity_points", 0)),  # Downsampled equity curve length, 0 for none
+            "include_trades": bool(data.get("trades", False)),
+            "settings": settings_from(data),  # quantity, capital, cost_bps, slippage_bps
+        }
+    except (ValueError, TypeError) as e:
+        return None, (jsonify({"success": False, "error": str(e)}), 400)
+
+    strategy_filename = strategy_file_path(data.get("strategy_id"))
+    if not strategy_filename:
+        return None, (jsonify({"success": False, "error": "Strategy not found"}), 404)
+    if not can_load_strategy(strategy_filename):
+        return None, (jsonify({"success": False, "error": "Failed to load strategy"}), 500)
+    options["strategy_filename"] = strategy_filename
+    return options, None
+
+# Raise ValueError for params the strategy's backtest_strategy does not take
+def check_backtest_params(options, pool):
+    if not options["params"]:
+        return
+    parameters = pool.parameters(options["strategy_filename"])
+    unknown = sorted(set(options["params"]) - set(parameters))
+    if unknown:
+        raise ValueError(f"Unknown parameters {unknown}; strategy accepts {sorted(parameters)}")
+
+# Run one backtest, or take it from the result cache: (results frame, cached)
+def run_backtest(options, pool, cancel=None):
+    strategy_filename, stock_symbol = options["strategy_filename"], options["stock_symbol"]
+    start_date, end_date, params = options["start_date"], options["end_date"], options["params"]
+
+    def compute():
+        logger.info(f"Running backtest for {stock_symbol} from {start_date} to {end_date}")
+        return pool.backtest(strategy_filename, stock_symbol, start_date, end_date, params, cancel=cancel)
 
+    sha, _ = strategy_cache.get_code(strategy_filename)
+    try:
+        version = data_version(stock_symbol, start_date, end_date)
+    except Exception as e:
+        logger.warning(f"No data version for {stock_symbol}, not caching: {e}")
+        version = None
+    if version is None:
+        return compute(), False
+    key = result_key(sha, stock_symbol, start_date, end_date, params, version)
+    if not options["use_cache"]:
+        backtest_results = compute()
+        if backtest_results is not None and len(backtest_results):
+            result_cache.put(key, backtest_results)
+        return backtest_results, False
+    return result_cache.get_or_compute(key, compute)
+
+# Summary, settings and (if asked for) equity curve and trades of a result frame
+def backtest_summary(backtest_results, options, cached):
+    response = {"success": True, "cached": cached}
+    if "Close" in backtest_results and "Signal" in backtest_results:
+        response.update(evaluate_backtest(backtest_results, options["settings"], equity_points=options["equity_points"],
+                                          include_trades=options["include_trades"]))
+        response["settings"] = options["settings"]
+    return response
+
+# Response with the result rows in the requested format
+def backtest_response(backtest_results, response, options):
+    if not options["include_rows"]:
+        return jsonify(response)
+    result_format, decimals = options["format"], options["decimals"]
+    try:
+        if result_format == "records":
+            # Unchanged layout for the current frontend: NaN as 0, row number included
+            frame = result_formats.result_frame(backtest_results.fillna(0).reset_index(), options["columns"])
+        else:
+            frame = result_formats.result_frame(backtest_results, options["columns"])
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    response = dict(response)
+    if result_format == "records":
+        response["results"] = result_formats.rounded(frame, decimals).to_dict(orient="records")
+        return jsonify(response)
+    if result_format == "columns":
+        response["results"] = result_formats.columnar(frame, decimals)
+        return jsonify(response)
+    if result_format == "ndjson":
+        return Response(stream_with_context(result_formats.ndjson_lines(frame, decimals, head=response)),
+                        mimetype=result_formats.NDJSON_MIME)
+    return Response(result_formats.arrow_ipc(frame, head=response, decimals=decimals), mimetype=result_formats.ARROW_MIME)
 
 @app.route("/backtest", methods=["POST"])
 def backtest():
+    options, error = backtest_options(request.json)
+    if error:
+        return error
+
+    try:
+        check_backtest_params(options, sweep_pool)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        logger.exception("Backtest setup failed.")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+    try:
+        backtest_results, cached = run_backtest(options, sweep_pool)
+        if backtest_results is None or len(backtest_results) == 0:
+            return jsonify({"success": False, "error": "No backtest results found"}), 404
+        response = backtest_summary(backtest_results, options, cached)
+        logger.info("Backtest successful.")
+        return backtest_response(backtest_results, response, options)
+    except StrategyTimeout as e:
+        logger.error(f"Backtest timed out: {e}")
+        return jsonify({"success": False, "error": str(e)}), 504
+    except Exception as e:
+        logger.exception("Backtest failed.")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+# A queued backtest: the /backtest steps with progress, run on the sweep workers
+def backtest_job(options):
+    def run(job):
+        job.update(stage="checking parameters", progress=0.05)
+        check_backtest_params(options, sweep_pool)
+        job.update(stage="running strategy", progress=0.1)
+        backtest_results, cached = run_backtest(options, sweep_pool, cancel=job.cancel)
+        if backtest_results is None or len(backtest_results) == 0:
+            raise LookupError("No backtest results found")
+        job.update(stage="evaluating", progress=0.9)
+        return backtest_results, backtest_summary(backtest_results, options, cached), options
+    return run
+
+# Job status, with its place in the queue while it waits
+def job_status(job):
+    status = job.to_dict()
+    if job.status == "queued":
+        status["position"] = backtest_jobs.position(job)
+    return status
+
+# API Endpoint: Submit a backtest job (same body as /backtest, plus priority)
+@app.route("/backtest/jobs", methods=["POST"])
+def submit_backtest_job():
+    data = request.json
+    options, error = backtest_options(data)
+    if error:
+        return error
+    try:
+        priority = int(data.get("priority", DEFAULT_PRIORITY))  # Higher runs first
+    except (ValueError, TypeError):
+        return jsonify({"success": False, "error": "priority must be an integer"}), 400
+
+    description = {
+        "strategy_id": data.get("strategy_id"),
+        "stock_symbol": options["stock_symbol"],
+        "start_date": options["start_date"],
+        "end_date": options["end_date"],
+    }
+    try:
+        job = backtest_jobs.submit(backtest_job(options), priority, owner=data.get("user_id"), description=description)
+    except QueueFull as e:
+        return jsonify({"success": False, "error": str(e)}), 429
+    logger.info(f"Queued backtest job {job.id} for {options['stock_symbol']} (priority {priority})")
+    return jsonify({"success": True, **job_status(job)}), 202
+
+# API Endpoint: List backtest jobs (optionally of one user)
+@app.route("/backtest/jobs", methods=["GET"])
+def list_backtest_jobs():
+    jobs = backtest_jobs.jobs(request.args.get("user_id"))
+    return jsonify({"jobs": [job_status(job) for job in sorted(jobs, key=lambda job: job.created_at, reverse=True)]}), 200
+
+# API Endpoint: Job status; ?wait=N&version=V waits up to N seconds for a change after version V
+@app.route("/backtest/jobs/<job_id>", methods=["GET"])
+def backtest_job_status(job_id):
+    job = backtest_jobs.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+    wait = min(request.args.get("wait", 0, type=float), JOB_MAX_WAIT)
+    if wait > 0:
+        job.wait(request.args.get("version", job.version, type=int), wait)
+    return jsonify(job_status(job)), 200
+
+# API Endpoint: Job status as NDJSON lines, one per change, until the job finishes
+@app.route("/backtest/jobs/<job_id>/stream", methods=["GET"])
+def stream_backtest_job(job_id):
+    job = backtest_jobs.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+
+    def lines():
+        while True:
+            # A line per change, or the unchanged status as a heartbeat so proxies keep the connection
+            status = job_status(job)
+            version = status["version"]
+            yield json.dumps(status) + "\n"
+            if job.finished:
+                return
+            job.wait(version, JOB_MAX_WAIT)
+
+    return Response(stream_with_context(lines()), mimetype=result_formats.NDJSON_MIME)
+
+# API Endpoint: Result of a finished job, formatted like /backtest
+@app.route("/backtest/jobs/<job_id>/result", methods=["GET"])
+def backtest_job_result(job_id):
+    job = backtest_jobs.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+    if job.status == "failed":
+        return jsonify({"success": False, **job_status(job)}), 500
+    if job.status != "done":
+        return jsonify({"success": False, "error": f"Job is {job.status}", **job_status(job)}), 409
+    backtest_results, response, options = job.result
+    return backtest_response(backtest_results, dict(response, job_id=job.id), options)
+
+# API Endpoint: Cancel a queued or running job
+@app.route("/backtest/jobs/<job_id>", methods=["DELETE"])
+def cancel_backtest_job(job_id):
+    job = backtest_jobs.cancel(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+    return jsonify({"success": True, **job_status(job)}), 200
+
+# API Endpoint: Job queue counters
+@app.route("/backtest-jobs/stats", methods=["GET"])
+def backtest_jobs_stats():
+    return jsonify(backtest_jobs.snapshot()), 200
+
+# API Endpoint: Parameter sweep (grid and/or random search), ranked by a metric
+@app.route("/backtest/sweep", methods=["POST"])
+def backtest_sweep():
     data = request.json
     strategy_id = data.get("strategy_id")
     stock_symbol = data.get("stock_symbol") + ".NS"
     start_date = data.get("start_date")
     end_date = data.get("end_date")
+    grid = data.get("grid") or {}  # {"rsi_period": [7, 14, 21]} or {"rsi_period": {"min": 5, "max": 30, "step": 5}}
+    random_search = data.get("random") or {}  # {"samples": 500, "ranges": {...}, "seed": 1}
+    metric = data.get("metric", "sharpe")
+    top = int(data.get("top", 50))
+    try:
+        settings = settings_from(data)  # quantity, capital, cost_bps, slippage_bps
+    except (ValueError, TypeError) as e:
+        return jsonify({"success": False, "error": str(e)}), 400
 
-    # Fetch strategy file from Supabase
-    strategy_name_response = supabase.table("py_strategies").select("file_path").eq("id", strategy_id).execute()
-    if not strategy_name_response.data:
+    if metric not in METRICS:
+        return jsonify({"success": False, "error": f"Unknown metric {metric}; choose from {list(METRICS)}"}), 400
+
+    strategy_filename = strategy_file_path(strategy_id)
+    if not strategy_filename:
         return jsonify({"success": False, "error": "Strategy not found"}), 404
 
-    strategy_filename = strategy_name_response.data[0]["file_path"]
-    strategy_module = load_strategy_module(strategy_filename)
-    if not strategy_module:
+    if not can_load_strategy(strategy_filename):
         return jsonify({"success": False, "error": "Failed to load strategy"}), 500
 
     try:
-        logger.info(f"Running backtest for {stock_symbol} from {start_date} to {end_date}")
-        backtest_results = strategy_module.backtest_strategy(stock_symbol, start_date, end_date)
-        backtest_results = backtest_results.fillna(0)
-        backtest_results = backtest_results.reset_index()
-        backtest_results = backtest_results.to_dict(orient="records")
-        if backtest_results is None or len(backtest_results) == 0:
-            return jsonify({"success": False, "error": "No backtest results found"}), 404
-        logger.info("Backtest successful.")
-        print(backtest_results, type(backtest_results))
-        return jsonify({"success": True, "results": backtest_results})
+        parameters = sweep_pool.parameters(strategy_filename)
+        combinations = build_combinations(
+            grid,
+            random_search.get("ranges"),
+            int(random_search.get("samples", 0)),
+            random_search.get("seed"),
+            parameters,
+        )
+    except (ValueError, TypeError, KeyError) as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
-        logger.exception("Backtest failed.")
+        logger.exception("Sweep setup failed.")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+    logger.info(f"Sweeping {len(combinations)} combinations for {stock_symbol} from {start_date} to {end_date}")
+    started = time.perf_counter()
+    rows = sweep_pool.sweep(strategy_filename, stock_symbol, start_date, end_date, combinations, settings)
+    elapsed = time.perf_counter() - started
+    logger.info(f"Sweep finished in {elapsed:.2f}s.")
+
+    return jsonify({
+        "success": True,
+        "parameters": parameters,
+        "combinations": len(combinations),
+        "failed": sum(1 for row in rows if "error" in row),
+        "elapsed_seconds": round(elapsed, 3),
+        "metric": metric,
+        "results": rank(rows, metric, top),
+    })
+
+# API Endpoint: Backtest one strategy over a list of symbols or a watchlist
+@app.route("/backtest/universe", methods=["POST"])
+def backtest_universe():
+    data = request.json
+    strategy_id = data.get("strategy_id")
+    symbols = data.get("stock_symbols") or []
+    watchlist_id = data.get("watchlist_id")  # Watchlists are per user: the owner's user id
+    start_date = data.get("start_date")
+    end_date = data.get("end_date")
+    params = data.get("params") or {}
+    metric = data.get("metric", "sharpe")
+    try:
+        settings = settings_from(data)  # quantity, capital, cost_bps, slippage_bps
+    except (ValueError, TypeError) as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    if metric not in METRICS:
+        return jsonify({"success": False, "error": f"Unknown metric {metric}; choose from {list(METRICS)}"}), 400
+
+    if not symbols and watchlist_id:
+        watchlist_response = supabase.table("watchlist").select("stock_symbol").eq("user_id", watchlist_id).execute()
+        symbols = [row["stock_symbol"] for row in watchlist_response.data or []]
+    symbols = list(dict.fromkeys(symbol if "." in symbol else symbol + ".NS" for symbol in symbols))
+    if not symbols:
+        return jsonify({"success": False, "error": "No symbols given"}), 400
+    if len(symbols) > UNIVERSE_MAX_SYMBOLS:
+        return jsonify({"success": False, "error": f"{len(symbols)} symbols exceeds the limit of {UNIVERSE_MAX_SYMBOLS}"}), 400
+
+    strategy_filename = strategy_file_path(strategy_id)
+    if not strategy_filename:
+        return jsonify({"success": False, "error": "Strategy not found"}), 404
+
+    if not can_load_strategy(strategy_filename):
+        return jsonify({"success": False, "error": "Failed to load strategy"}), 500
+
+    try:
+        parameters = sweep_pool.parameters(strategy_filename)
+    except Exception as e:
+        logger.exception("Universe backtest setup failed.")
         return jsonify({"success": False, "error": str(e)}), 500
+    unknown = sorted(set(params) - set(parameters))
+    if unknown:
+        return jsonify({"success": False, "error": f"Unknown parameters {unknown}; strategy accepts {sorted(parameters)}"}), 400
+
+    logger.info(f"Running universe backtest of {len(symbols)} symbols from {start_date} to {end_date}")
+    started = time.perf_counter()
+    rows = sweep_pool.universe(strategy_filename, symbols, start_date, end_date, params, settings)
+    elapsed = time.perf_counter() - started
+    logger.info(f"Universe backtest finished in {elapsed:.2f}s.")
+
+    return jsonify({
+        "success": True,
+        "elapsed_seconds": round(elapsed, 3),
+        "summary": summarize(rows, metric),
+        "results": rows,
+    })
 
 @app.route("/")
 def home():
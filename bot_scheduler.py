@@ -0,0 +1,244 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+# -----------------------------------------------------------------------------
+# Bot scheduler
+# -----------------------------------------------------------------------------
+# One scheduler thread owns every bot's next due time in a heap. Due bots are
+# grouped by symbol (their data fetches coalesce anyway) and handed to a
+# bounded worker pool, so the thread count stays fixed no matter how many bots
+# are running.
+#
+# A bot is registered with a setup() callable. The first run executes setup()
+# in the pool; it returns the evaluate() callable for later runs, or None if
+# the bot cannot start. A bot leaves the schedule when it is removed, when
+# setup() returns None, or when evaluate() raises.
+#
+# By default a bot runs every `interval` seconds. A bot can instead pass
+# next_run(now) returning the wall-clock datetime of its next evaluation (e.g.
+# the next bar close from market_calendar); long sleeps are split into
+# MAX_SLEEP chunks and re-checked against the wall clock so clock steps
+# and suspends cannot make a bot fire early or late. wake() runs a bot now
+# instead (e.g. when the live feed closes its bar) and then goes on with
+# next_run from there.
+
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", "8"))
+BOT_INTERVAL = float(os.getenv("BOT_INTERVAL", "10"))
+GROUP_SIZE = 16  # Max bots of one symbol evaluated back to back in one task
+MAX_SLEEP = 3600.0
+
+
+class BotJob:
+    def __init__(self, bot_id, symbol, setup, interval, on_exit, next_run=None):
+        self.bot_id = bot_id
+        self.symbol = symbol
+        self.setup = setup
+        self.evaluate = None
+        self.interval = interval
+        self.on_exit = on_exit
+        self.next_run = next_run
+        self.due = 0.0
+        self.wake_at = None  # Wall-clock target when next_run is used
+        self.woken = False  # wake() arrived during a run: run again right after
+        self.cancelled = False
+        self.idle = threading.Event()
+        self.idle.set()
+
+    def step(self):
+        """
+        Run setup or one evaluation. Returns False when the bot is done.
+        """
+        if self.evaluate is None:
+            self.evaluate = self.setup()
+            return self.evaluate is not None
+        self.evaluate()
+        return True
+
+    def next_due(self):
+        """
+        Monotonic time of the next run after one just finished.
+        """
+        now = time.monotonic()
+        if self.next_run is not None:
+            self.wake_at = self.next_run(datetime.now(timezone.utc)).timestamp()
+            return now + min(max(0.0, self.wake_at - time.time()), MAX_SLEEP)
+        # Fixed rate; skip ticks that were missed entirely
+        next_due = self.due + self.interval
+        return next_due if next_due > now else now + self.interval
+
+
+class BotScheduler:
+    """
+    Timer heap + worker pool multiplexing many bots.
+    """
+
+    def __init__(self, max_workers=BOT_WORKERS, group_size=GROUP_SIZE):
+        self.group_size = group_size
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bot-worker")
+        self._cond = threading.Condition()
+        self._heap = []
+        self._jobs = {}
+        self._sequence = itertools.count()
+        self._running = 0
+        self._lags = deque(maxlen=10000)
+        self.ticks = 0
+        self.wakes = 0
+        self._thread = None
+        self._stopped = False
+
+    def start(self):
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="bot-scheduler", daemon=True)
+                self._thread.start()
+        return self
+
+    def shutdown(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._pool.shutdown(wait=True)
+
+    # -------------------------------------------------------------------------
+    # Bot registration
+    # -------------------------------------------------------------------------
+    def add(self, bot_id, symbol, setup, interval=BOT_INTERVAL, on_exit=None, delay=0.0, next_run=None):
+        """
+        Schedule a bot. setup() runs after `delay` seconds, as soon as a
+        worker is free; later runs follow interval or next_run.
+        """
+        job = BotJob(bot_id, symbol, setup, interval, on_exit, next_run)
+        with self._cond:
+            if bot_id in self._jobs:
+                raise KeyError(f"Bot {bot_id} is already scheduled")
+            self._jobs[bot_id] = job
+            self._push(job, time.monotonic() + delay)
+        return job
+
+    def remove(self, bot_id, timeout=None):
+        """
+        Unschedule a bot and wait for an evaluation in progress to finish.
+        Returns False if the bot was not scheduled.
+        """
+        with self._cond:
+            job = self._jobs.pop(bot_id, None)
+            if job is None:
+                return False
+            job.cancelled = True
+        job.idle.wait(timeout)
+        return True
+
+    def wake(self, bot_id):
+        """
+        Evaluate a running bot as soon as a worker is free. Returns False if
+        the bot is not scheduled or still setting up.
+        """
+        with self._cond:
+            job = self._jobs.get(bot_id)
+            if job is None or job.evaluate is None:
+                return False
+            self.wakes += 1
+            if not job.idle.is_set():
+                job.woken = True
+                return True
+            job.wake_at = None
+            self._push(job, time.monotonic())
+        return True
+
+    def __contains__(self, bot_id):
+        with self._cond:
+            return bot_id in self._jobs
+
+    def _push(self, job, due):
+        job.due = due
+        heapq.heappush(self._heap, (due, next(self._sequence), job))
+        self._cond.notify()
+
+    # -------------------------------------------------------------------------
+    # Dispatch
+    # -------------------------------------------------------------------------
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    delay = self._heap[0][0] - time.monotonic()
+                    if delay <= 0:
+                        break
+                    self._cond.wait(delay)
+                if self._stopped:
+                    return
+
+                now = time.monotonic()
+                due = defaultdict(list)
+                while self._heap and self._heap[0][0] <= now:
+                    job_due, _, job = heapq.heappop(self._heap)
+                    if job.cancelled or job_due != job.due:
+                        continue  # Removed, or superseded by wake()
+                    remaining = job.wake_at - time.time() if job.wake_at is not None else 0.0
+                    if remaining > 0.5:
+                        self._push(job, now + min(remaining, MAX_SLEEP))
+                        continue
+                    job.idle.clear()
+                    due[job.symbol].append(job)
+
+            for jobs in due.values():
+                for i in range(0, len(jobs), self.group_size):
+                    self._pool.submit(self._run_group, jobs[i:i + self.group_size])
+
+    def _run_group(self, jobs):
+        with self._cond:
+            self._running += len(jobs)
+        for job in jobs:
+            started = time.monotonic()
+            self._lags.append(started - job.due)
+            self.ticks += 1
+            error = None
+            keep = False
+            if not job.cancelled:
+                try:
+                    keep = job.step()
+                    next_due = job.next_due() if keep else None
+                except Exception as e:
+                    error = e
+                    keep = False
+
+            with self._cond:
+                self._running -= 1
+                if keep and not job.cancelled:
+                    if job.woken:
+                        job.woken = False
+                        job.wake_at = None
+                        next_due = time.monotonic()
+                    self._push(job, next_due)
+                    finished = False
+                else:
+                    finished = not job.cancelled
+                    if finished:
+                        self._jobs.pop(job.bot_id, None)
+            job.idle.set()
+            if finished and job.on_exit is not None:
+                job.on_exit(job.bot_id, error)
+
+    def stats(self):
+        with self._cond:
+            lags = sorted(self._lags)
+            return {
+                "bots": len(self._jobs),
+                "scheduled": len(self._heap),
+                "running": self._running,
+                "ticks": self.ticks,
+                "wakes": self.wakes,
+                "threads": threading.active_count(),
+                "lag_p50_ms": lags[len(lags) // 2] * 1000 if lags else 0.0,
+                "lag_p99_ms": lags[int(len(lags) * 0.99)] * 1000 if lags else 0.0,
+                "lag_max_ms": lags[-1] * 1000 if lags else 0.0,
+            }
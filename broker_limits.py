@@ -0,0 +1,303 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+
+# -----------------------------------------------------------------------------
+# Broker request budget
+# -----------------------------------------------------------------------------
+# Angel One limits every API to a number of requests per second per account,
+# and all bots trade through the same account. Each SmartAPI endpoint gets a
+# token bucket (BROKER_RATE_LIMITS, "method=rate[/burst]" pairs, overrides
+# the defaults below) shared by every bot, and callers that find it empty
+# queue for the next token in priority order: exits before entries before
+# anything else, first come first served within a priority. A caller that
+# would wait longer than BROKER_MAX_WAIT seconds gets RateLimited instead.
+#
+# The per-second defaults stay at or under the published SmartAPI limits.
+# Methods without an entry use BROKER_DEFAULT_RATE.
+
+PRIORITY_EXIT = 0
+PRIORITY_ENTRY = 1
+PRIORITY_OTHER = 2
+PRIORITY_NAMES = {PRIORITY_EXIT: "exit", PRIORITY_ENTRY: "entry", PRIORITY_OTHER: "other"}
+
+DEFAULT_RATE_LIMITS = {
+    "placeOrder": (10, 10),
+    "modifyOrder": (10, 10),
+    "cancelOrder": (10, 10),
+    "ltpData": (10, 10),
+    "getCandleData": (3, 3),
+    "orderBook": (1, 1),
+    "position": (1, 1),
+    "generateSession": (1, 1),
+    "generateToken": (1, 1),
+}
+BROKER_DEFAULT_RATE = float(os.getenv("BROKER_DEFAULT_RATE", "1"))
+BROKER_MAX_WAIT = float(os.getenv("BROKER_MAX_WAIT", "30"))
+WAIT_SAMPLES = 1000  # Recent waits kept per endpoint for the percentiles
+
+
+class RateLimited(Exception):
+    """Raised when a broker call would wait longer than allowed for its turn."""
+
+
+def check_rate(rate, burst):
+    """
+    Raise ValueError unless the bucket can ever hand out a token.
+    """
+    if not rate > 0 or not burst >= 1:
+        raise ValueError(f"rate must be positive and burst at least 1, got {rate}/{burst}")
+
+
+def parse_rate_limits(spec):
+    """
+    {"placeOrder": (rate, burst), ...} from "placeOrder=10/20,ltpData=5".
+    """
+    limits = {}
+    for item in (spec or "").split(","):
+        if not item.strip():
+            continue
+        try:
+            method, value = item.split("=", 1)
+            rate, _, burst = value.partition("/")
+            rate = float(rate)
+            burst = float(burst) if burst else max(1.0, rate)
+            check_rate(rate, burst)
+            limits[method.strip()] = (rate, burst)
+        except ValueError:
+            print(f"Ignoring malformed broker rate limit: {item}")
+    return limits
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class TokenBucket:
+    """
+    `rate` tokens per second up to `burst`, handed out in priority order.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+        self._waiting = []  # Heap of (priority, ticket)
+        self._tickets = itertools.count()
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self.stats = {"calls": 0, "throttled": 0, "timeouts": 0, "max_queued": 0}
+        self.priority_calls = {name: 0 for name in PRIORITY_NAMES.values()}
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, priority=PRIORITY_OTHER, timeout=None):
+        """
+        Take one token, waiting behind higher-priority and earlier callers.
+        Returns the seconds waited; raises RateLimited after `timeout`.
+        """
+        started = time.monotonic()
+        place = (priority, next(self._tickets))
+        with self._cond:
+            heapq.heappush(self._waiting, place)
+            self.stats["max_queued"] = max(self.stats["max_queued"], len(self._waiting))
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    first = self._waiting[0] == place
+                    if first and self.tokens >= 1:
+                        self.tokens -= 1
+                        break
+                    remaining = None if timeout is None else started + timeout - now
+                    if remaining is not None and remaining <= 0:
+                        self.stats["timeouts"] += 1
+                        raise RateLimited(f"No broker request budget after waiting {timeout:.1f}s")
+                    # The head sleeps until its token is due; everyone else until the head moves on
+                    delay = (1 - self.tokens) / self.rate if first else None
+                    if remaining is not None:
+                        delay = remaining if delay is None else min(delay, remaining)
+                    self._cond.wait(delay)
+            finally:
+                self._waiting.remove(place)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+            waited = time.monotonic() - started
+            self.stats["calls"] += 1
+            self.priority_calls[PRIORITY_NAMES.get(priority, "other")] += 1
+            if waited > 0.001:
+                self.stats["throttled"] += 1
+            self._waits.append(waited)
+            return waited
+
+    def snapshot(self):
+        with self._cond:
+            self._refill(time.monotonic())
+            waits = list(self._waits)
+            return dict(
+                self.stats,
+                rate=self.rate,
+                burst=self.burst,
+                tokens=round(self.tokens, 2),
+                queued=len(self._waiting),
+                queued_by_priority={name: sum(1 for priority, _ in self._waiting if PRIORITY_NAMES.get(priority) == name)
+                                    for name in PRIORITY_NAMES.values()},
+                calls_by_priority=dict(self.priority_calls),
+                wait_p50_ms=round(percentile(waits, 0.5) * 1000, 1),
+                wait_p95_ms=round(percentile(waits, 0.95) * 1000, 1),
+                wait_max_ms=round(max(waits, default=0.0) * 1000, 1),
+            )
+
+
+class BrokerLimiter:
+    """
+    One TokenBucket per SmartAPI method, created on first use.
+    """
+
+    def __init__(self, limits=None, default_rate=BROKER_DEFAULT_RATE, max_wait=BROKER_MAX_WAIT):
+        self.limits = dict(DEFAULT_RATE_LIMITS)
+        self.limits.update(parse_rate_limits(os.getenv("BROKER_RATE_LIMITS")) if limits is None else limits)
+        for rate, burst in self.limits.values():
+            check_rate(rate, burst)
+        check_rate(default_rate, max(1.0, default_rate))
+        self.default_rate = default_rate
+        self.max_wait = max_wait
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, method):
+        with self._lock:
+            bucket = self._buckets.get(method)
+            if bucket is None:
+                rate, burst = self.limits.get(method, (self.default_rate, max(1.0, self.default_rate)))
+                bucket = self._buckets[method] = TokenBucket(rate, burst)
+            return bucket
+
+    def acquire(self, method, priority=PRIORITY_OTHER):
+        return self.bucket(method).acquire(priority, self.max_wait)
+
+    def snapshot(self):
+        with self._lock:
+            buckets = dict(self._buckets)
+        return {method: bucket.snapshot() for method, bucket in sorted(buckets.items())}
+
+
+# -----------------------------------------------------------------------------
+# Order gate
+# -----------------------------------------------------------------------------
+# Strategies report a signal on every evaluation and it stays at BUY or SELL
+# for as long as the condition holds, so sending an order per evaluation
+# piles up positions and burns the order budget. The gate keeps each bot's
+# position (flat, long or short) and a signal only sends an order when it
+# changes the position: BUY goes long, SELL goes short, or flat for a
+# long-only bot (as the backtests trade). Reversing from long to short or
+# back is one order for twice the quantity; every other signal is collapsed.
+# A failed order leaves the position as it was, so the next evaluation with
+# the same signal tries again.
+#
+# The position is what the bot's orders were accepted for: an order counts
+# as a success once the broker returned an order id and the order book does
+# not show it rejected or cancelled. One the exchange refuses or leaves
+# unfilled later still moves the gate. A starting bot is seeded from its
+# newest recorded order that is not rejected or cancelled (a BUY means
+# long, a SELL short or, for a long-only bot, flat), so a restart does not
+# trade again; its position is forgotten when it stops.
+
+class OrderGate:
+    """
+    Per-bot flat/long/short state machine that turns signals into orders.
+    """
+
+    FLAT = "flat"
+    LONG = "long"
+    SHORT = "short"
+
+    def __init__(self):
+        self._positions = {}
+        self._long_only = set()
+        self._pending = {}  # Bot -> position its order in flight is for
+        self._lock = threading.Lock()
+        self.stats = {"orders": 0, "reversals": 0, "collapsed": 0, "failed": 0}
+
+    def _target(self, bot_id, side):
+        if side == "BUY":
+            return self.LONG
+        return self.FLAT if bot_id in self._long_only else self.SHORT
+
+    def decide(self, bot_id, signal):
+        """
+        (side, lots) of the order that takes the bot to its latest signal's
+        position, or None (nothing to do). lots is 2 for a reversal. Every
+        order must be followed by settle().
+        """
+        with self._lock:
+            if signal not in (1, -1):
+                return None
+            if bot_id in self._pending:
+                self.stats["collapsed"] += 1
+                return None
+            side = "BUY" if signal == 1 else "SELL"
+            position = self._positions.get(bot_id, self.FLAT)
+            target = self._target(bot_id, side)
+            if position == target:
+                self.stats["collapsed"] += 1
+                return None
+            self._pending[bot_id] = target
+            return side, 2 if self.FLAT not in (position, target) else 1
+
+    def seed(self, bot_id, last_side, long_only=False):
+        """
+        Mode and position of a starting bot from the side of its newest
+        order (None when it has none).
+        """
+        with self._lock:
+            if long_only:
+                self._long_only.add(bot_id)
+            else:
+                self._long_only.discard(bot_id)
+            self._positions[bot_id] = self._target(bot_id, last_side) if last_side else self.FLAT
+
+    def settle(self, bot_id, success):
+        """
+        Finish decide(): success means the broker accepted the order and it
+        was not rejected or cancelled when checked, not that it filled.
+        """
+        with self._lock:
+            target = self._pending.pop(bot_id, None)
+            if success and target is not None:
+                if self.FLAT not in (self._positions.get(bot_id, self.FLAT), target):
+                    self.stats["reversals"] += 1
+                self._positions[bot_id] = target
+                self.stats["orders"] += 1
+            else:
+                self.stats["failed"] += 1
+
+    def position(self, bot_id):
+        with self._lock:
+            return self._positions.get(bot_id, self.FLAT)
+
+    def forget(self, bot_id):
+        with self._lock:
+            self._positions.pop(bot_id, None)
+            self._long_only.discard(bot_id)
+            self._pending.pop(bot_id, None)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(
+                self.stats,
+                bots=len(self._positions),
+                long=sum(1 for position in self._positions.values() if position == self.LONG),
+                short=sum(1 for position in self._positions.values() if position == self.SHORT),
+                long_only=len(self._long_only),
+                in_flight=len(self._pending),
+            )
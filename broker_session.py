@@ -0,0 +1,224 @@
+import base64
+import json
+import threading
+import time
+
+import pyotp
+from logzero import logger
+
+from broker_limits import PRIORITY_EXIT, PRIORITY_OTHER
+
+# -----------------------------------------------------------------------------
+# Shared SmartAPI sessions
+# -----------------------------------------------------------------------------
+# One authenticated SmartConnect per credential set, shared by every bot.
+# Tokens are refreshed shortly before the JWT expires and a full TOTP login is
+# repeated transparently when the broker rejects the session. With a
+# BrokerLimiter every broker request, logins included, first waits for its
+# turn in the per-endpoint request budget.
+#
+# The day's order book (orderBook is allowed about once a second) is shared
+# too: bots checking their orders at the same time get one fetch between
+# them, made after the newest order any of them is waiting for.
+
+SESSION_ERROR_CODES = {"AG8001", "AG8002", "AG8003"}  # Invalid / expired / missing token
+REFRESH_MARGIN = 10 * 60  # Refresh this many seconds before the JWT expires
+DEFAULT_TOKEN_LIFETIME = 6 * 60 * 60  # Used when the JWT carries no exp claim
+
+
+class SessionError(Exception):
+    """Raised when a broker session cannot be established."""
+
+
+def jwt_expiry(token):
+    """
+    Read the exp claim of a JWT without verifying it. Returns None if the
+    token cannot be decoded.
+    """
+    if not token:
+        return None
+    try:
+        payload = token.replace("Bearer ", "").split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+def is_session_error(error=None, response=None):
+    """
+    Whether a SmartAPI exception or response means the session is no longer valid.
+    """
+    if error is not None:
+        if type(error).__name__ == "TokenException":
+            return True
+        message = str(error)
+        return any(code in message for code in SESSION_ERROR_CODES) or "Invalid Token" in message
+    if isinstance(response, dict) and response.get("status") is False:
+        return response.get("errorcode") in SESSION_ERROR_CODES
+    return False
+
+
+class BrokerSession:
+    """
+    Thread-safe wrapper around one logged-in SmartConnect.
+    Attribute access returns the client's methods wrapped with session checks,
+    so callers keep using it like a SmartConnect (session.placeOrder(...)).
+    """
+
+    def __init__(self, api_key, username, password, totp_secret, connect_factory, limiter=None):
+        self.api_key = api_key
+        self.username = username
+        self._password = password
+        self._totp_secret = totp_secret
+        self._connect_factory = connect_factory
+        self.limiter = limiter
+        self._lock = threading.RLock()
+        self.client = None
+        self.expires_at = 0.0
+        self.logins = 0
+        self.refreshes = 0
+        self._book_lock = threading.Lock()
+        self._book = None
+        self._book_at = 0.0  # Monotonic time the order book was requested
+
+    def _throttle(self, method, priority):
+        if self.limiter is not None:
+            self.limiter.acquire(method, priority)
+
+    def _login(self):
+        client = self._connect_factory(api_key=self.api_key)
+        self._throttle("generateSession", PRIORITY_EXIT)  # Every other call is waiting for it
+        totp = pyotp.TOTP(self._totp_secret).now()
+        data = client.generateSession(self.username, self._password, totp)
+        if not data or not data.get("status"):
+            raise SessionError(f"SmartAPI Login Failed: {data}")
+        self.client = client
+        self.expires_at = jwt_expiry(client.access_token) or time.time() + DEFAULT_TOKEN_LIFETIME
+        self.logins += 1
+        logger.info(f"SmartAPI login for {self.username}, token valid until {time.ctime(self.expires_at)}")
+
+    def _refresh(self):
+        try:
+            self._throttle("generateToken", PRIORITY_EXIT)
+            self.client.generateToken(self.client.refresh_token)
+            self.expires_at = jwt_expiry(self.client.access_token) or time.time() + DEFAULT_TOKEN_LIFETIME
+            self.refreshes += 1
+        except Exception as e:
+            logger.warning(f"SmartAPI token refresh failed, logging in again: {e}")
+            self._login()
+
+    def get(self):
+        """
+        Return a SmartConnect with a token that is valid for at least REFRESH_MARGIN.
+        """
+        with self._lock:
+            if self.client is None:
+                self._login()
+            elif time.time() > self.expires_at - REFRESH_MARGIN:
+                self._refresh()
+            return self.client
+
+    def feed_headers(self):
+        """
+        Headers for the SmartAPI market data WebSocket.
+        """
+        client = self.get()
+        token = client.access_token
+        return {
+            "Authorization": token if token.startswith("Bearer ") else f"Bearer {token}",
+            "x-api-key": self.api_key,
+            "x-client-code": self.username,
+            "x-feed-token": client.getfeedToken(),
+        }
+
+    def invalidate(self, client=None):
+        """
+        Drop the current session so the next call logs in again. When `client`
+        is given, only drop it if it is still the current one, so that many
+        threads failing on the same stale session trigger a single login.
+        """
+        with self._lock:
+            if client is None or client is self.client:
+                self.client = None
+
+    def call(self, method, *args, priority=PRIORITY_OTHER, **kwargs):
+        """
+        Call a SmartConnect method, logging in again and retrying once if the
+        broker rejected the session. `priority` orders the call in the rate
+        limiter's queue and is not passed on.
+        """
+        for attempt in range(2):
+            client = self.get()
+            self._throttle(method, priority)
+            try:
+                response = getattr(client, method)(*args, **kwargs)
+            except Exception as e:
+                if attempt == 0 and is_session_error(error=e):
+                    logger.warning(f"SmartAPI session rejected during {method}, logging in again")
+                    self.invalidate(client)
+                    continue
+                raise
+            if attempt == 0 and is_session_error(response=response):
+                logger.warning(f"SmartAPI session rejected during {method}, logging in again")
+                self.invalidate(client)
+                continue
+            return response
+
+    def order_book(self, since=0.0, priority=PRIORITY_OTHER):
+        """
+        {order id: order} of today's orders, fetched again only if the last
+        fetch started before `since` (a time.monotonic() value).
+        """
+        with self._book_lock:
+            if self._book is None or self._book_at < since:
+                requested = time.monotonic()
+                response = self.call("orderBook", priority=priority)
+                if not response or not response.get("status"):
+                    raise RuntimeError(f"Order book unavailable: {(response or {}).get('message')}")
+                self._book = {order["orderid"]: order for order in response.get("data") or []}
+                self._book_at = requested
+            return self._book
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+
+
+class SessionManager:
+    """
+    Hands out one BrokerSession per (api_key, username).
+    """
+
+    def __init__(self, connect_factory=None, limiter=None):
+        if connect_factory is None:
+            from SmartApi import SmartConnect as connect_factory
+        self.connect_factory = connect_factory
+        self.limiter = limiter  # Shared by every session
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def session(self, api_key, username, password, totp_secret):
+        key = (api_key, username)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._sessions[key] = BrokerSession(
+                    api_key, username, password, totp_secret, self.connect_factory, self.limiter
+                )
+        session.get()  # Log in (or refresh) outside the manager lock
+        return session
+
+    def stats(self):
+        with self._lock:
+            return [
+                {
+                    "username": session.username,
+                    "logged_in": session.client is not None,
+                    "expires_at": session.expires_at,
+                    "logins": session.logins,
+                    "refreshes": session.refreshes,
+                }
+                for session in self._sessions.values()
+            ]
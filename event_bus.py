@@ -0,0 +1,100 @@
+import os
+import queue
+import threading
+
+# -----------------------------------------------------------------------------
+# Bot event fan-out
+# -----------------------------------------------------------------------------
+# One in-process publisher (the LogBook, on every append) and many
+# subscribers (open /events streams). publish() never blocks: each
+# subscriber has a bounded queue, and one that falls EVENT_QUEUE_SIZE events
+# behind is dropped instead of slowing the bots down or growing without
+# bound. A dropped client reconnects with the last sequence number it saw
+# and catches up from the log rings.
+
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "256"))
+EVENT_MAX_SUBSCRIBERS = int(os.getenv("EVENT_MAX_SUBSCRIBERS", "48"))  # Each open stream holds a server thread
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Subscription:
+    def __init__(self, bus, bot_ids, size):
+        self.bus = bus
+        self.bot_ids = bot_ids  # None for every bot's events
+        self.queue = queue.Queue(maxsize=size)
+        self.dropped = False
+
+    def wants(self, entry):
+        return self.bot_ids is None or entry["bot_id"] in self.bot_ids
+
+    def get(self, timeout):
+        """
+        The next event, or None after timeout seconds or once dropped.
+        """
+        if self.dropped:
+            return None
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """
+    Non-blocking fan-out of events to bounded subscriber queues.
+    """
+
+    def __init__(self, queue_size=EVENT_QUEUE_SIZE, max_subscribers=EVENT_MAX_SUBSCRIBERS):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self.stats = {"published": 0, "delivered": 0, "dropped_subscribers": 0, "rejected": 0}
+
+    def subscribe(self, bot_ids=None):
+        """
+        New Subscription to the events of bot_ids (a set of bot id strings)
+        or of everything. Raises TooManySubscribers at the limit.
+        """
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                self.stats["rejected"] += 1
+                raise TooManySubscribers(f"{self.max_subscribers} event streams are already open")
+            subscription = Subscription(self, bot_ids, self.queue_size)
+            self._subscribers.add(subscription)
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, entry):
+        with self._lock:
+            self.stats["published"] += 1
+            for subscription in list(self._subscribers):
+                if not subscription.wants(entry):
+                    continue
+                try:
+                    subscription.queue.put_nowait(entry)
+                    self.stats["delivered"] += 1
+                except queue.Full:
+                    # Slow consumer: cut it loose rather than block or buffer more
+                    subscription.dropped = True
+                    self._subscribers.discard(subscription)
+                    self.stats["dropped_subscribers"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(
+                self.stats,
+                subscribers=len(self._subscribers),
+                max_subscribers=self.max_subscribers,
+                queue_size=self.queue_size,
+                backlog=max((subscription.queue.qsize() for subscription in self._subscribers), default=0),
+            )
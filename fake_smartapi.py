@@ -0,0 +1,130 @@
+import base64
+import itertools
+import json
+import threading
+import time
+
+# -----------------------------------------------------------------------------
+# Offline SmartAPI stand-in
+# -----------------------------------------------------------------------------
+# Mimics the parts of SmartApi.SmartConnect the executor uses so sessions and
+# order flow can be exercised without broker credentials. Set SMARTAPI_FAKE=1
+# to make bot_executor use it. FakeBroker.reject_next makes the exchange
+# reject that many of the next orders.
+
+
+class TokenException(Exception):
+    """Same name as SmartApi.smartExceptions.TokenException."""
+
+    def __init__(self, message, code=403):
+        super().__init__(message)
+        self.code = code
+
+
+def make_jwt(expires_at, subject="FAKE"):
+    def encode(part):
+        return base64.urlsafe_b64encode(json.dumps(part).encode()).decode().rstrip("=")
+
+    return ".".join([encode({"alg": "none"}), encode({"sub": subject, "exp": int(expires_at)}), "signature"])
+
+
+class FakeBroker:
+    """
+    Shared broker-side state: issued tokens, logins and received orders.
+    """
+
+    def __init__(self, token_lifetime=3600):
+        self.token_lifetime = token_lifetime
+        self.valid_tokens = set()
+        self.logins = 0
+        self.refreshes = 0
+        self.orders = []
+        self.fail_logins = 0
+        self.reject_next = 0
+        self._order_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def issue_token(self, subject):
+        token = make_jwt(time.time() + self.token_lifetime, subject)
+        with self._lock:
+            self.valid_tokens.add(token)
+        return token
+
+    def revoke_all(self):
+        """Simulate the broker expiring every session (e.g. the daily reset)."""
+        with self._lock:
+            self.valid_tokens.clear()
+
+    def check(self, token):
+        if token not in self.valid_tokens:
+            raise TokenException("Invalid Token")
+
+    def next_order_id(self):
+        with self._lock:
+            return f"FAKE{next(self._order_ids):08d}"
+
+
+class FakeSmartConnect:
+    broker = FakeBroker()
+
+    def __init__(self, api_key=None, **kwargs):
+        self.api_key = api_key
+        self.access_token = None
+        self.refresh_token = None
+        self.feed_token = None
+        self.userId = None
+
+    def generateSession(self, clientCode, password, totp):
+        broker = self.broker
+        with broker._lock:
+            broker.logins += 1
+            if broker.fail_logins:
+                broker.fail_logins -= 1
+                return {"status": False, "message": "Invalid totp", "errorcode": "AB1050", "data": None}
+        self.access_token = broker.issue_token(clientCode)
+        self.refresh_token = f"refresh-{clientCode}"
+        self.feed_token = f"feed-{clientCode}"
+        self.userId = clientCode
+        return {
+            "status": True,
+            "message": "SUCCESS",
+            "data": {
+                "clientcode": clientCode,
+                "jwtToken": "Bearer " + self.access_token,
+                "refreshToken": self.refresh_token,
+                "feedToken": self.feed_token,
+            },
+        }
+
+    def generateToken(self, refresh_token):
+        if refresh_token != self.refresh_token:
+            raise TokenException("Invalid refresh token")
+        self.broker.refreshes += 1
+        self.access_token = self.broker.issue_token(self.userId)
+        return {"status": True, "data": {"jwtToken": self.access_token, "feedToken": self.feed_token}}
+
+    def getfeedToken(self):
+        return self.feed_token
+
+    def placeOrder(self, orderparams):
+        broker = self.broker
+        broker.check(self.access_token)
+        order_id = broker.next_order_id()
+        with broker._lock:
+            status, text = "open", ""
+            if broker.reject_next:
+                broker.reject_next -= 1
+                status, text = "rejected", "RMS:Rule: Check circuit limit"
+            broker.orders.append(dict(orderparams, orderid=order_id, status=status, orderstatus=status, text=text))
+        return order_id
+
+    def orderBook(self):
+        self.broker.check(self.access_token)
+        with self.broker._lock:
+            orders = [dict(order) for order in self.broker.orders]
+        return {"status": True, "message": "SUCCESS", "data": orders or None}
+
+    def ltpData(self, exchange, tradingsymbol, symboltoken):
+        self.broker.check(self.access_token)
+        return {"status": True, "data": {"exchange": exchange, "tradingsymbol": tradingsymbol,
+                                         "symboltoken": symboltoken, "ltp": 0.0}}
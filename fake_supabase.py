@@ -0,0 +1,172 @@
+import json
+import os
+import threading
+import time
+
+# -----------------------------------------------------------------------------
+# Offline Supabase stand-in
+# -----------------------------------------------------------------------------
+# Mimics the parts of the supabase client the executor uses (table select /
+# eq / order / limit / insert / execute and storage download / info) so the
+# app and the order writer can be exercised without a project. Tables live
+# in memory, optionally seeded from SUPABASE_FAKE_DATA ({"table": [rows]}
+# JSON), and storage reads files under SUPABASE_FAKE_STORAGE. Set
+# SUPABASE_FAKE=1 to make bot_executor use it.
+#
+# FakeDatabase can simulate trouble: `down` fails every call, `fail_next`
+# fails that many calls, and `latency` delays each call.
+
+SUPABASE_FAKE_DATA = os.getenv("SUPABASE_FAKE_DATA")
+SUPABASE_FAKE_STORAGE = os.getenv(
+    "SUPABASE_FAKE_STORAGE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "strategies")
+)
+
+
+class APIError(Exception):
+    """Stands in for postgrest.exceptions.APIError."""
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+        self.count = None
+
+
+class FakeDatabase:
+    """
+    Shared in-memory tables plus failure injection.
+    """
+
+    def __init__(self, tables=None):
+        self.tables = {name: list(rows) for name, rows in (tables or {}).items()}
+        self.down = False
+        self.fail_next = 0
+        self.latency = 0.0
+        self.calls = 0
+        self.inserts = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_json(cls, path):
+        with open(path) as file:
+            return cls(json.load(file))
+
+    def call(self):
+        """
+        Account for one request; raises APIError while failing.
+        """
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+            if self.down:
+                raise APIError("Service unavailable")
+            if self.fail_next:
+                self.fail_next -= 1
+                raise APIError("Connection reset")
+
+    def rows(self, table):
+        with self._lock:
+            return list(self.tables.get(table, []))
+
+
+class FakeQuery:
+    def __init__(self, database, table):
+        self.database = database
+        self.table = table
+        self.columns = None
+        self.filters = []
+        self.ordering = None
+        self.count = None
+        self.new_rows = None
+
+    def select(self, *columns):
+        names = [name.strip() for column in columns for name in column.split(",")]
+        self.columns = None if not names or "*" in names else names
+        return self
+
+    def eq(self, column, value):
+        self.filters.append((column, value))
+        return self
+
+    def order(self, column, desc=False):
+        self.ordering = (column, desc)
+        return self
+
+    def limit(self, count):
+        self.count = count
+        return self
+
+    def insert(self, rows):
+        self.new_rows = [dict(row) for row in (rows if isinstance(rows, list) else [rows])]
+        return self
+
+    def execute(self):
+        database = self.database
+        database.call()
+        if self.new_rows is not None:
+            with database._lock:
+                database.tables.setdefault(self.table, []).extend(self.new_rows)
+                database.inserts += 1
+            return FakeResponse(self.new_rows)
+        rows = [row for row in database.rows(self.table)
+                if all(str(row.get(column)) == str(value) for column, value in self.filters)]
+        if self.ordering is not None:
+            column, desc = self.ordering
+            rows.sort(key=lambda row: (row.get(column) is None, str(row.get(column))), reverse=desc)
+        if self.count is not None:
+            rows = rows[:self.count]
+        if self.columns is not None:
+            rows = [{column: row.get(column) for column in self.columns} for row in rows]
+        return FakeResponse(rows)
+
+
+class FakeBucket:
+    def __init__(self, database, root):
+        self.database = database
+        self.root = root
+
+    def _path(self, path):
+        return os.path.join(self.root, os.path.normpath("/" + path).lstrip("/"))
+
+    def download(self, path):
+        self.database.call()
+        try:
+            with open(self._path(path), "rb") as file:
+                return file.read()
+        except OSError:
+            raise APIError(f"Object not found: {path}")
+
+    def info(self, path):
+        self.database.call()
+        try:
+            stat = os.stat(self._path(path))
+        except OSError:
+            raise APIError(f"Object not found: {path}")
+        return {"etag": f"{stat.st_mtime_ns:x}-{stat.st_size:x}", "size": stat.st_size}
+
+
+class FakeStorage:
+    def __init__(self, database, root):
+        self.database = database
+        self.root = root
+
+    def from_(self, bucket):
+        return FakeBucket(self.database, self.root)
+
+
+class FakeClient:
+    def __init__(self, database, storage_root=SUPABASE_FAKE_STORAGE):
+        self.database = database
+        self.storage = FakeStorage(database, storage_root)
+
+    def table(self, name):
+        return FakeQuery(self.database, name)
+
+
+def create_client(url=None, key=None):
+    """
+    Same call shape as supabase.create_client.
+    """
+    database = FakeDatabase.from_json(SUPABASE_FAKE_DATA) if SUPABASE_FAKE_DATA else FakeDatabase()
+    return FakeClient(database)
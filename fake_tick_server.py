@@ -0,0 +1,232 @@
+import argparse
+import bisect
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+from market_calendar import IST, nse
+from market_feed import EXCHANGE_TYPES, SUBSCRIBE, UNSUBSCRIBE, pack_tick
+
+# -----------------------------------------------------------------------------
+# Offline SmartAPI WebSocket stand-in
+# -----------------------------------------------------------------------------
+# Serves recorded ticks (the JSON lines MARKET_FEED_RECORD writes) or a
+# synthetic random walk over the SmartAPI WebSocket 2.0 protocol: header
+# check, subscribe / unsubscribe requests, "ping" -> "pong" and binary Quote
+# packets for the subscribed tokens only.
+#
+# Replay follows one market clock for the whole server: tick times are
+# played back `speed` times faster than recorded (0 for as fast as
+# possible) from the first subscription on, and a client that reconnects
+# continues where the market is, missing what was sent while it was away.
+# drop() cuts every connection to exercise reconnects.
+#
+#   python fake_tick_server.py --port 8765 --symbols RELIANCE-EQ,TCS-EQ
+#   MARKET_FEED_URL=ws://127.0.0.1:8765 gunicorn ... bot_executor:app
+
+REQUIRED_HEADERS = ("Authorization", "x-api-key", "x-client-code", "x-feed-token")
+
+
+def load_ticks(path):
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def synthetic_ticks(tokens, start=None, seconds=3600, per_second=2.0, seed=0, exchange="NSE"):
+    """
+    Random-walk Quote ticks for each token, `per_second` per token on
+    average, from `start` (the current time while the market is open, else
+    the last session's open) for `seconds`.
+    """
+    if start is None:
+        now = datetime.now(IST)
+        if nse.is_open(now):
+            start = now
+        else:
+            day = now.date() - timedelta(days=1)
+            while not nse.is_trading_day(day):
+                day -= timedelta(days=1)
+            start = nse.session(day)[0]
+    rng = random.Random(seed)
+    begin = int(start.timestamp() * 1000)
+    ticks = []
+    for index, token in enumerate(tokens):
+        price = 100.0 + 50 * index
+        volume = 0
+        moment = begin
+        while moment < begin + seconds * 1000:
+            moment += int(rng.expovariate(per_second) * 1000) + 1
+            price = max(1.0, price * (1 + rng.gauss(0, 0.0005)))
+            quantity = rng.randint(1, 500)
+            volume += quantity
+            ticks.append({"exchange_type": EXCHANGE_TYPES[exchange], "token": str(token), "time": moment,
+                          "ltp": int(round(price * 100)), "quantity": quantity, "volume": volume})
+    ticks.sort(key=lambda tick: tick["time"])
+    for sequence, tick in enumerate(ticks, 1):
+        tick["sequence"] = sequence
+    return ticks
+
+
+class FakeTickServer:
+    """
+    Threaded WebSocket server replaying ticks to subscribed clients.
+    """
+
+    def __init__(self, ticks, speed=1.0, host="127.0.0.1", port=0):
+        self.ticks = sorted(ticks, key=lambda tick: tick["time"])
+        self._times = [tick["time"] for tick in self.ticks]
+        self.speed = speed
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._connections = set()
+        self._started = None  # Wall time the market clock started
+        self._through = 0  # Ticks already played at full speed
+        self._replayed = threading.Event()
+        self.stats = {"connections": 0, "rejected": 0, "sent": 0, "subscribe_requests": 0, "pings": 0}
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}"
+
+    def start(self):
+        from websockets.sync.server import serve
+
+        self._server = serve(self._handle, self.host, self.port, process_request=self._check_headers,
+                             ping_interval=None)
+        self.port = self._server.socket.getsockname()[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-tick-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._thread.join(5)
+
+    def drop(self):
+        """
+        Close every client connection (clients should reconnect).
+        """
+        with self._lock:
+            connections = list(self._connections)
+        for connection in connections:
+            connection.close()
+
+    def wait_replayed(self, timeout=None):
+        return self._replayed.wait(timeout)
+
+    def _check_headers(self, connection, request):
+        if any(not request.headers.get(name) for name in REQUIRED_HEADERS):
+            self.stats["rejected"] += 1
+            return connection.respond(401, "Unauthorized\n")
+        return None
+
+    def _due(self, tick):
+        if not self.speed:
+            return 0.0
+        return self._started + (tick["time"] - self.ticks[0]["time"]) / 1000.0 / self.speed
+
+    def _position(self, now):
+        """
+        Index of the first tick not yet due on the market clock.
+        """
+        if not self.speed:
+            return self._through
+        recorded = self._times[0] + (now - self._started) * self.speed * 1000.0
+        return bisect.bisect_left(self._times, recorded)
+
+    def _handle(self, connection):
+        subscribed = set()
+        with self._lock:
+            self._connections.add(connection)
+            self.stats["connections"] += 1
+        try:
+            index = None
+            while True:
+                # Requests first, then ticks that are due
+                timeout = 0.0
+                if index is None or index >= len(self.ticks):
+                    timeout = 0.5
+                elif self.speed:
+                    timeout = max(0.0, self._due(self.ticks[index]) - time.time())
+                try:
+                    message = connection.recv(timeout=min(timeout, 0.5))
+                except TimeoutError:
+                    message = None
+                if message is not None:
+                    self._request(connection, message, subscribed)
+                    if index is None and subscribed:
+                        with self._lock:
+                            if self._started is None:
+                                self._started = time.time()
+                        index = self._position(time.time())
+                    continue
+                if index is None or index >= len(self.ticks):
+                    continue
+                while index < len(self.ticks) and self._due(self.ticks[index]) <= time.time():
+                    tick = self.ticks[index]
+                    index += 1
+                    self._through = max(self._through, index)
+                    if (tick["exchange_type"], str(tick["token"])) in subscribed:
+                        connection.send(pack_tick(tick))
+                        self.stats["sent"] += 1
+                    if not self.speed and index % 256 == 0:
+                        break  # Look at requests now and then while flooding
+                if index >= len(self.ticks):
+                    self._replayed.set()
+        except Exception:
+            pass  # Client went away or drop()
+        finally:
+            with self._lock:
+                self._connections.discard(connection)
+
+    def _request(self, connection, message, subscribed):
+        if message == "ping":
+            self.stats["pings"] += 1
+            connection.send("pong")
+            return
+        try:
+            request = json.loads(message)
+            action = request["action"]
+            tokens = {(entry["exchangeType"], str(token))
+                      for entry in request["params"]["tokenList"] for token in entry["tokens"]}
+        except (ValueError, KeyError, TypeError):
+            connection.send(json.dumps({"errorCode": "E1002", "errorMessage": "Invalid Request Payload"}))
+            return
+        self.stats["subscribe_requests"] += 1
+        if action == SUBSCRIBE:
+            subscribed |= tokens
+        elif action == UNSUBSCRIBE:
+            subscribed -= tokens
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ticks", help="JSON-lines file of recorded ticks (default: synthetic)")
+    parser.add_argument("--symbols", default="RELIANCE-EQ", help="Comma-separated symbols for synthetic ticks")
+    parser.add_argument("--seconds", type=int, default=3600, help="Length of the synthetic session")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed (0 for as fast as possible)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    if args.ticks:
+        ticks = load_ticks(args.ticks)
+    else:
+        from instruments import registry
+        registry.reload()
+        tokens = [registry.lookup(symbol.strip(), "NSE") for symbol in args.symbols.split(",")]
+        ticks = synthetic_ticks([token for token in tokens if token], seconds=args.seconds)
+    server = FakeTickServer(ticks, speed=args.speed, host=args.host, port=args.port).start()
+    print(f"Replaying {len(ticks)} ticks on {server.url}")
+    try:
+        while True:
+            time.sleep(5)
+            print(json.dumps(server.stats))
+    except KeyboardInterrupt:
+        server.stop()
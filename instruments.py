@@ -0,0 +1,204 @@
+import bisect
+import csv
+import difflib
+import os
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+# -----------------------------------------------------------------------------
+# Instrument master lookup
+# -----------------------------------------------------------------------------
+# instruments.csv holds ~120k rows. It is parsed once into an immutable index
+# and swapped in as a whole on reload, so lookups never touch the file and a
+# reader always sees either the old or the new snapshot, never a mix.
+
+INSTRUMENTS_FILE = os.getenv("INSTRUMENTS_FILE", "instruments.csv")
+
+Instrument = namedtuple("Instrument", ["symbol", "token", "exchange", "lot_size"])
+
+
+class InstrumentIndex:
+    """
+    Immutable snapshot of the instrument master.
+    """
+
+    def __init__(self, instruments, mtime=None, size=None):
+        self.mtime = mtime
+        self.size = size
+        self.by_symbol = {}
+        self.by_exchange = {}
+        for instrument in instruments:
+            # First occurrence wins, matching the old pandas lookup
+            self.by_symbol.setdefault(instrument.symbol, instrument)
+            if instrument.exchange:
+                self.by_exchange.setdefault((instrument.exchange, instrument.symbol), instrument)
+        self.sorted_keys = sorted((symbol.upper(), symbol) for symbol in self.by_symbol)
+
+    def __len__(self):
+        return len(self.by_symbol)
+
+    def get(self, symbol, exchange=None):
+        if exchange:
+            return self.by_exchange.get((exchange, symbol))
+        return self.by_symbol.get(symbol)
+
+    def search(self, query, limit=20):
+        """
+        Prefix matches first, then substring matches, then close fuzzy matches.
+        """
+        query = query.strip().upper()
+        if not query:
+            return []
+
+        results = []
+        seen = set()
+
+        def add(symbol):
+            if symbol not in seen:
+                seen.add(symbol)
+                results.append(self.by_symbol[symbol])
+            return len(results) >= limit
+
+        start = bisect.bisect_left(self.sorted_keys, (query,))
+        for key, symbol in self.sorted_keys[start:]:
+            if not key.startswith(query):
+                break
+            if add(symbol):
+                return results
+
+        for key, symbol in self.sorted_keys:
+            if query in key and add(symbol):
+                return results
+
+        # Fuzzy matching is restricted to symbols sharing the first letter to
+        # keep it cheap on the full master
+        start = bisect.bisect_left(self.sorted_keys, (query[0],))
+        end = bisect.bisect_left(self.sorted_keys, (chr(ord(query[0]) + 1),))
+        candidates = {key: symbol for key, symbol in self.sorted_keys[start:end]}
+        for key in difflib.get_close_matches(query, candidates, n=limit, cutoff=0.75):
+            if add(candidates[key]):
+                break
+        return results
+
+
+def read_instruments_csv(path):
+    """
+    Parse the instrument master CSV. Only symbol and token are required;
+    exchange and lot_size are picked up when present.
+    """
+    instruments = []
+    with open(path, newline="") as file:
+        reader = csv.DictReader(file)
+        for row in reader:
+            symbol = row.get("symbol")
+            token = row.get("token")
+            if not symbol or not token:
+                continue
+            lot_size = row.get("lot_size") or None
+            instruments.append(Instrument(
+                symbol,
+                token,
+                row.get("exchange") or None,
+                int(float(lot_size)) if lot_size else None,
+            ))
+    return instruments
+
+
+def sidecar_path(csv_path):
+    return os.path.splitext(csv_path)[0] + ".npy"
+
+
+def read_instruments_sidecar(path):
+    """
+    Read the fixed-width binary sidecar written by refresh_instruments.py.
+    Every row is read (the index needs them all); the gain over the CSV is
+    skipping text parsing, not I/O.
+    """
+    array = np.load(path, mmap_mode="r", allow_pickle=False)
+    return [
+        Instrument(symbol.decode(), token.decode(), exchange.decode() or None, int(lot_size) or None)
+        for symbol, token, exchange, lot_size in array.tolist()
+    ]
+
+
+class InstrumentRegistry:
+    """
+    Process-wide symbol -> token registry with hot reload.
+    """
+
+    def __init__(self, path=INSTRUMENTS_FILE):
+        self.path = path
+        self.index = InstrumentIndex([])
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._stop_watching = threading.Event()
+
+    def load(self):
+        stat = os.stat(self.path)
+        sidecar = sidecar_path(self.path)
+        try:
+            fresh_sidecar = os.stat(sidecar).st_mtime_ns >= stat.st_mtime_ns
+        except OSError:
+            fresh_sidecar = False
+        if fresh_sidecar:
+            instruments = read_instruments_sidecar(sidecar)
+        else:
+            instruments = read_instruments_csv(self.path)
+        return InstrumentIndex(instruments, mtime=stat.st_mtime_ns, size=stat.st_size)
+
+    def reload(self, force=False):
+        """
+        Rebuild the index if the file changed on disk. Returns True if a new
+        snapshot was swapped in.
+        """
+        with self._reload_lock:
+            try:
+                stat = os.stat(self.path)
+            except OSError:
+                return False
+            if not force and (stat.st_mtime_ns, stat.st_size) == (self.index.mtime, self.index.size):
+                return False
+            index = self.load()
+            self.index = index  # Single reference swap, readers never see a partial index
+            return True
+
+    def watch(self, interval=30):
+        """
+        Poll the file in a daemon thread and reload it when it changes.
+        """
+        if self._watcher is not None:
+            return
+
+        def run():
+            while not self._stop_watching.wait(interval):
+                try:
+                    self.reload()
+                except Exception as e:
+                    print(f"Instrument reload failed: {e}")
+
+        self._watcher = threading.Thread(target=run, name="instrument-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stop_watching.set()
+
+    def get(self, symbol, exchange=None):
+        return self.index.get(symbol, exchange)
+
+    def lookup(self, symbol, exchange=None):
+        instrument = self.index.get(symbol, exchange)
+        if instrument is None and exchange and not self.index.by_exchange:
+            # Older masters carry no exchange column
+            instrument = self.index.get(symbol)
+        return instrument.token if instrument else None
+
+    def search(self, query, limit=20):
+        return self.index.search(query, limit)
+
+    def __len__(self):
+        return len(self.index)
+
+
+registry = InstrumentRegistry()
@@ -0,0 +1,309 @@
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from market_calendar import BAR_MINUTES, nse
+
+# -----------------------------------------------------------------------------
+# Live bar aggregation
+# -----------------------------------------------------------------------------
+# Ticks from the market feed are folded into 1m/5m/15m/daily OHLCV bars per
+# symbol. Closed bars go into preallocated NumPy rings (LIVE_BAR_CAPACITY
+# bars per symbol and interval, oldest overwritten), so memory stays fixed
+# however long the feed runs. Intraday bars are aligned to the session open
+# like market_calendar's bar closes; daily bars are indexed at midnight IST
+# like Yahoo's.
+#
+# A bar closes when the first tick of a later bar arrives or, for quiet
+# symbols, once the exchange clock (the newest tick time plus the time since
+# it was received) is LIVE_BAR_GRACE seconds past its end. Ticks for a bar
+# that was already closed are counted as late and ignored.
+#
+# Only bars the feed saw from their start are kept: the bar in progress when
+# the feed connected, reconnected or began watching a symbol is dropped, as
+# are ticks outside the session. Listeners are called with (symbol,
+# interval, bar) for every kept bar.
+
+LIVE_INTERVALS = ("1m", "5m", "15m", "1d")
+LIVE_BAR_CAPACITY = int(os.getenv("LIVE_BAR_CAPACITY", "750"))  # Two sessions of 1m bars
+LIVE_BAR_GRACE = float(os.getenv("LIVE_BAR_GRACE", "2"))
+COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+SECOND_NS = 1_000_000_000
+DAY_NS = 86400 * SECOND_NS
+
+
+def to_ns(moment):
+    return round(moment.timestamp() * 1_000_000) * 1000
+
+
+class BarRing:
+    """
+    Closed bars of one symbol and interval plus the bar being formed.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.starts = np.zeros(capacity, dtype="<i8")  # Bar open time, UTC ns
+        self.ends = np.zeros(capacity, dtype="<i8")
+        self.values = np.zeros((capacity, len(COLUMNS)), dtype="<f8")
+        self.count = 0  # Bars ever stored; the newest is at (count - 1) % capacity
+        self.last_start = -1  # Start of the newest closed bar, kept or not
+        self.forming = None  # [start, end, open, high, low, close, volume, partial]
+
+    def push(self, forming):
+        slot = self.count % self.capacity
+        self.starts[slot] = forming[0]
+        self.ends[slot] = forming[1]
+        self.values[slot] = forming[2:7]
+        self.count += 1
+
+    def read(self, start_ns=None, end_ns=None):
+        """
+        (starts, values) of the stored bars starting in [start_ns, end_ns),
+        oldest first, as copies.
+        """
+        n = min(self.count, self.capacity)
+        order = (np.arange(n) + self.count - n) % self.capacity
+        starts = self.starts[order]
+        keep = np.ones(n, dtype=bool)
+        if start_ns is not None:
+            keep &= starts >= start_ns
+        if end_ns is not None:
+            keep &= starts < end_ns
+        return starts[keep], self.values[order[keep]]
+
+
+class _Series:
+    def __init__(self, intervals, capacity):
+        self.rings = {interval: BarRing(capacity) for interval in intervals}
+        self.since = None  # First tick time since tracking or reconnecting; earlier bars were not seen whole
+        self.last_volume = None  # Cumulative day volume of the previous tick
+
+
+class LiveBars:
+    """
+    Tick-to-bar aggregator for every watched symbol.
+    """
+
+    def __init__(self, intervals=LIVE_INTERVALS, capacity=LIVE_BAR_CAPACITY, calendar=nse, grace=LIVE_BAR_GRACE):
+        self.intervals = [interval for interval in intervals if interval in BAR_MINUTES]
+        self.capacity = capacity
+        self.calendar = calendar
+        self.grace_ns = int(grace * SECOND_NS)
+        self.offset_ns = int(calendar.tz.utcoffset(None).total_seconds()) * SECOND_NS
+        self._series = {}
+        self._sessions = {}  # Local day number -> (open, close, midnight) in UTC ns, or None
+        self._lock = threading.Lock()
+        self._clock = None  # (newest tick time, monotonic ns when it arrived)
+        self.listeners = []  # Called with (symbol, interval, bar); must not block
+        self.stats = {"ticks": 0, "bars": 0, "partial": 0, "late": 0, "outside_session": 0, "unknown": 0}
+
+    # -------------------------------------------------------------------------
+    # Symbols
+    # -------------------------------------------------------------------------
+    def track(self, symbol):
+        with self._lock:
+            if symbol not in self._series:
+                self._series[symbol] = _Series(self.intervals, self.capacity)
+
+    def untrack(self, symbol):
+        with self._lock:
+            self._series.pop(symbol, None)
+
+    def connected(self):
+        """
+        The feed (re)connected: ticks may have been missed up to now.
+        """
+        with self._lock:
+            for series in self._series.values():
+                series.since = None
+                series.last_volume = None
+                for ring in series.rings.values():
+                    if ring.forming is not None:
+                        ring.forming[7] = True
+
+    # -------------------------------------------------------------------------
+    # Clock and sessions
+    # -------------------------------------------------------------------------
+    def _now(self):
+        if self._clock is None:
+            return time.time_ns()
+        tick_time, received = self._clock
+        return tick_time + time.monotonic_ns() - received
+
+    def clock(self):
+        with self._lock:
+            return self._now()
+
+    def _session(self, ts):
+        day = (ts + self.offset_ns) // DAY_NS
+        if day not in self._sessions:
+            session = self.calendar.session(date(1970, 1, 1) + timedelta(days=int(day)))
+            midnight = day * DAY_NS - self.offset_ns
+            self._sessions[day] = None if session is None else (to_ns(session[0]), to_ns(session[1]), midnight)
+        return self._sessions[day]
+
+    # -------------------------------------------------------------------------
+    # Aggregation
+    # -------------------------------------------------------------------------
+    def on_tick(self, symbol, ts, price, day_volume=None, quantity=0):
+        """
+        Fold one trade (exchange time in UTC ns, price, cumulative day
+        volume if known, else the traded quantity) into the symbol's bars.
+        """
+        closed = []
+        with self._lock:
+            self.stats["ticks"] += 1
+            series = self._series.get(symbol)
+            if series is None:
+                self.stats["unknown"] += 1
+                return
+            if self._clock is None or ts > self._clock[0]:
+                self._clock = (ts, time.monotonic_ns())
+            session = self._session(ts)
+            if session is None or not session[0] <= ts < session[1]:
+                self.stats["outside_session"] += 1
+                return
+            if series.since is None:
+                series.since = ts
+            if day_volume is not None and series.last_volume is not None and day_volume >= series.last_volume:
+                volume = day_volume - series.last_volume
+            else:
+                volume = quantity
+            if day_volume is not None:
+                series.last_volume = day_volume
+
+            session_open, session_close, midnight = session
+            for interval, ring in series.rings.items():
+                minutes = BAR_MINUTES[interval]
+                if minutes is None:
+                    start, end = midnight, session_close
+                else:
+                    step = minutes * 60 * SECOND_NS
+                    start = session_open + (ts - session_open) // step * step
+                    end = min(start + step, session_close)
+                forming = ring.forming
+                if forming is not None and forming[0] == start:
+                    forming[3] = max(forming[3], price)
+                    forming[4] = min(forming[4], price)
+                    forming[5] = price
+                    forming[6] += volume
+                    continue
+                if start <= ring.last_start or (forming is not None and start < forming[0]):
+                    self.stats["late"] += 1
+                    continue
+                if forming is not None:
+                    self._close(symbol, interval, ring, closed)
+                ring.forming = [start, end, price, price, price, price, volume, start < series.since]
+        self._notify(closed)
+
+    def close_due(self):
+        """
+        Close bars whose end passed LIVE_BAR_GRACE ago on the exchange clock.
+        """
+        closed = []
+        with self._lock:
+            if self._clock is None:
+                return
+            now = self._now()
+            for symbol, series in self._series.items():
+                for interval, ring in series.rings.items():
+                    if ring.forming is not None and ring.forming[1] + self.grace_ns <= now:
+                        self._close(symbol, interval, ring, closed)
+        self._notify(closed)
+
+    def _close(self, symbol, interval, ring, closed):
+        forming = ring.forming
+        ring.forming = None
+        ring.last_start = forming[0]
+        if forming[7]:
+            self.stats["partial"] += 1
+            return
+        ring.push(forming)
+        self.stats["bars"] += 1
+        closed.append((symbol, interval, self._bar(forming)))
+
+    def _bar(self, forming):
+        start, end, open_, high, low, close, volume, _ = forming
+        return {
+            "start": datetime.fromtimestamp(start / SECOND_NS, timezone.utc).astimezone(self.calendar.tz).isoformat(),
+            "end": datetime.fromtimestamp(end / SECOND_NS, timezone.utc).astimezone(self.calendar.tz).isoformat(),
+            "open": open_, "high": high, "low": low, "close": close, "volume": volume,
+        }
+
+    def _notify(self, closed):
+        for symbol, interval, bar in closed:
+            for listener in self.listeners:
+                try:
+                    listener(symbol, interval, bar)
+                except Exception as e:
+                    print(f"Bar listener failed for {symbol} {interval}: {e}")
+
+    # -------------------------------------------------------------------------
+    # Reading
+    # -------------------------------------------------------------------------
+    def last_close(self, symbol, interval):
+        """
+        End of the newest kept bar as an aware datetime, or None.
+        """
+        with self._lock:
+            series = self._series.get(symbol)
+            ring = series.rings.get(interval) if series is not None else None
+            if ring is None or not ring.count:
+                return None
+            end = int(ring.ends[(ring.count - 1) % ring.capacity])
+        return datetime.fromtimestamp(end / SECOND_NS, timezone.utc)
+
+    def frame(self, symbol, interval, start=None, end=None, tz=None):
+        """
+        Kept bars starting on dates [start, end) as an OHLCV DataFrame, or None.
+        """
+        start_ns = to_ns(datetime.combine(start, datetime.min.time(), self.calendar.tz)) if start else None
+        end_ns = to_ns(datetime.combine(end, datetime.min.time(), self.calendar.tz)) if end else None
+        with self._lock:
+            series = self._series.get(symbol)
+            ring = series.rings.get(interval) if series is not None else None
+            if ring is None:
+                return None
+            starts, values = ring.read(start_ns, end_ns)
+        if not len(starts):
+            return None
+        index = pd.DatetimeIndex(starts.astype("datetime64[ns]"), name="Date").tz_localize("UTC")
+        return pd.DataFrame(values, index=index.tz_convert(tz or self.calendar.tz), columns=COLUMNS)
+
+    def extend(self, symbol, interval, df, start, end):
+        """
+        `df` (bars from the store) with the live bars of the same range
+        replacing or adding rows. Returns df itself when there are none.
+        """
+        tz = df.index.tz if df is not None and not df.empty else None
+        live = self.frame(symbol, interval, start, end, tz)
+        if live is None:
+            return df
+        if df is None or df.empty:
+            return live
+        live.index.name = df.index.name
+        live = live.reindex(columns=df.columns, fill_value=0.0)
+        for column in df.columns:
+            if column in COLUMNS:
+                live[column] = live[column].astype(df[column].dtype)
+        return pd.concat([df[~df.index.isin(live.index)], live]).sort_index()
+
+    def snapshot(self):
+        with self._lock:
+            forming = sum(ring.forming is not None for series in self._series.values()
+                          for ring in series.rings.values())
+            stored = sum(min(ring.count, ring.capacity) for series in self._series.values()
+                         for ring in series.rings.values())
+            return dict(
+                self.stats,
+                symbols=len(self._series),
+                intervals=self.intervals,
+                forming=forming,
+                stored_bars=stored,
+                clock=self._now() / SECOND_NS if self._clock is not None else None,
+            )
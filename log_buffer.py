@@ -0,0 +1,135 @@
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+# -----------------------------------------------------------------------------
+# In-memory log buffers
+# -----------------------------------------------------------------------------
+# Log lines go into a fixed-size global ring and, when they belong to a bot,
+# into that bot's own ring. Appends are O(1) and memory is bounded: rings
+# drop their oldest entries, and the buffers of the least recently logging
+# bots are dropped beyond LOG_MAX_BOTS.
+#
+# Every entry gets a sequence number from one process-wide counter, so a
+# poller passes the last number it saw as `since` and gets only newer
+# entries, from either ring. If entries after `since` were already dropped
+# the read says so ("truncated").
+#
+# Entries are plain log lines (event "log") or bot events such as "signal"
+# and "order" with a data dict. Listeners (the event bus) are called with
+# each entry as it is appended, in sequence order.
+
+LOG_CAPACITY = int(os.getenv("LOG_CAPACITY", "1000"))  # Global ring
+LOG_BOT_CAPACITY = int(os.getenv("LOG_BOT_CAPACITY", "200"))  # Per-bot ring
+LOG_MAX_BOTS = int(os.getenv("LOG_MAX_BOTS", "1000"))
+
+
+class LogRing:
+    """
+    Fixed-capacity ring of log entries ordered by sequence number.
+    """
+
+    def __init__(self, capacity):
+        self._entries = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self.dropped_through = 0  # Highest sequence number pushed out of the ring
+
+    def append(self, entry):
+        with self._lock:
+            if len(self._entries) == self._entries.maxlen:
+                self.dropped_through = self._entries[0]["seq"]
+            self._entries.append(entry)
+
+    def read(self, since=0, limit=None):
+        """
+        (entries with seq > since, oldest first, at most `limit` of the
+        newest ones; whether entries after `since` were dropped or left out).
+        """
+        with self._lock:
+            newer = []
+            truncated = since < self.dropped_through
+            for entry in reversed(self._entries):
+                if entry["seq"] <= since:
+                    break
+                if limit is not None and len(newer) >= limit:
+                    truncated = True
+                    break
+                newer.append(entry)
+        newer.reverse()
+        return newer, truncated
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class LogBook:
+    """
+    Global log ring plus one ring per bot.
+    """
+
+    def __init__(self, capacity=LOG_CAPACITY, bot_capacity=LOG_BOT_CAPACITY, max_bots=LOG_MAX_BOTS):
+        self.bot_capacity = bot_capacity
+        self.max_bots = max_bots
+        self._global = LogRing(capacity)
+        self._bots = OrderedDict()
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+        self.last_seq = 0
+        self.listeners = []  # Called with every new entry; must not block
+
+    def append(self, message, bot_id=None, event="log", data=None):
+        bot_key = str(bot_id) if bot_id is not None else None
+        # One lock around numbering, appending and notifying keeps everything in seq order
+        with self._lock:
+            seq = next(self._seq)
+            entry = {"seq": seq, "time": time.time(), "bot_id": bot_key, "event": event, "message": message}
+            if data is not None:
+                entry["data"] = data
+            self._global.append(entry)
+            if bot_key is not None:
+                ring = self._bots.get(bot_key)
+                if ring is None:
+                    ring = self._bots[bot_key] = LogRing(self.bot_capacity)
+                    while len(self._bots) > self.max_bots:
+                        self._bots.popitem(last=False)
+                else:
+                    self._bots.move_to_end(bot_key)
+                ring.append(entry)
+            self.last_seq = seq
+            for listener in self.listeners:
+                try:
+                    listener(entry)
+                except Exception as e:
+                    print(f"Log listener failed: {e}")
+        return entry
+
+    def read(self, bot_id=None, since=0, limit=None):
+        """
+        {"entries": [...] oldest first, "last_seq", "truncated", "reset"} of
+        one bot (or of everything), newer than `since`. A `since` ahead of
+        this process (the server restarted) reads from the start.
+        """
+        with self._lock:
+            ring = self._global if bot_id is None else self._bots.get(str(bot_id))
+            last_seq = self.last_seq
+        reset = since > last_seq
+        if reset:
+            since = 0
+        entries, truncated = ring.read(since, limit) if ring is not None else ([], False)
+        return {
+            "entries": entries,
+            "last_seq": entries[-1]["seq"] if entries else since,
+            "truncated": truncated,
+            "reset": reset,
+        }
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "last_seq": self.last_seq,
+                "entries": len(self._global),
+                "bots": len(self._bots),
+                "bot_entries": sum(len(ring) for ring in self._bots.values()),
+            }
@@ -0,0 +1,187 @@
+import csv
+import os
+from datetime import date, datetime, time, timedelta, timezone
+
+# -----------------------------------------------------------------------------
+# NSE trading calendar
+# -----------------------------------------------------------------------------
+# Regular equity session 09:15-15:30 IST, Monday to Friday, minus the
+# holidays listed in nse_holidays.csv (from the yearly NSE holiday circular;
+# add next year's dates when it is published). Works fully offline.
+#
+# Intraday bars are aligned to the session open (09:15, 09:20, ... for 5m)
+# and the last bar of the day ends at the close. A daily bar closes at 15:30.
+#
+# Bots act on a bar BAR_SETTLE_SECONDS after it closes, once the data feed
+# has published it. For the session's last bar (and a daily bar) that would
+# be after the close, when the broker rejects intraday orders, so that bar is
+# acted on BAR_PRE_CLOSE_SECONDS before the close instead, as it stands then.
+
+IST = timezone(timedelta(hours=5, minutes=30), "IST")
+MARKET_OPEN = time(9, 15)
+MARKET_CLOSE = time(15, 30)
+HOLIDAYS_FILE = os.getenv("NSE_HOLIDAYS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "nse_holidays.csv"))
+BAR_SETTLE_SECONDS = float(os.getenv("BAR_SETTLE_SECONDS", "30"))  # Wait for the data feed to publish a closed bar
+BAR_PRE_CLOSE_SECONDS = float(os.getenv("BAR_PRE_CLOSE_SECONDS", "60"))  # Act on the session's last bar this early
+
+# Bar length in minutes; None for one bar per session
+BAR_MINUTES = {
+    "1m": 1, "2m": 2, "5m": 5, "15m": 15, "30m": 30,
+    "60m": 60, "90m": 90, "1h": 60, "1d": None,
+}
+
+
+def read_holidays(path=HOLIDAYS_FILE):
+    """
+    Read date,description rows into {date: description}.
+    """
+    holidays = {}
+    try:
+        with open(path, newline="") as file:
+            for row in csv.DictReader(file):
+                holidays[date.fromisoformat(row["date"].strip())] = row.get("description", "")
+    except OSError as e:
+        print(f"Could not read holiday table {path}, only weekends are closed: {e}")
+    return holidays
+
+
+class MarketCalendar:
+    """
+    Sessions, holidays and bar close times for one exchange.
+    """
+
+    def __init__(self, holidays=None, open_time=MARKET_OPEN, close_time=MARKET_CLOSE, tz=IST):
+        self.holidays = dict(holidays or {})
+        self.open_time = open_time
+        self.close_time = close_time
+        self.tz = tz
+
+    @classmethod
+    def from_csv(cls, path=HOLIDAYS_FILE):
+        return cls(read_holidays(path))
+
+    def _local(self, moment):
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=self.tz)
+        return moment.astimezone(self.tz)
+
+    # -------------------------------------------------------------------------
+    # Sessions
+    # -------------------------------------------------------------------------
+    def is_trading_day(self, day):
+        return day.weekday() < 5 and day not in self.holidays
+
+    def session(self, day):
+        """
+        (open, close) of the session on day, or None on a closed day.
+        """
+        if not self.is_trading_day(day):
+            return None
+        return (datetime.combine(day, self.open_time, self.tz), datetime.combine(day, self.close_time, self.tz))
+
+    def trading_days(self, start):
+        """
+        Trading days from start onwards.
+        """
+        day = start
+        while True:
+            if self.is_trading_day(day):
+                yield day
+            day += timedelta(days=1)
+
+    def is_open(self, moment):
+        moment = self._local(moment)
+        session = self.session(moment.date())
+        return session is not None and session[0] <= moment < session[1]
+
+    def next_open(self, moment):
+        """
+        Start of the first session that begins at or after moment.
+        """
+        moment = self._local(moment)
+        for day in self.trading_days(moment.date()):
+            session_open = self.session(day)[0]
+            if session_open >= moment:
+                return session_open
+
+    # -------------------------------------------------------------------------
+    # Bars
+    # -------------------------------------------------------------------------
+    def bar_closes(self, day, interval):
+        """
+        Close times of the bars of interval on day.
+        """
+        session = self.session(day)
+        if session is None:
+            return []
+        minutes = BAR_MINUTES[interval]
+        if minutes is None:
+            return [session[1]]
+        closes = []
+        close = session[0]
+        while close < session[1]:
+            close = min(close + timedelta(minutes=minutes), session[1])
+            closes.append(close)
+        return closes
+
+    def bar_end(self, start, interval):
+        """
+        Close time of the bar of interval that opens at start.
+        """
+        start = self._local(start)
+        session = self.session(start.date())
+        close = session[1] if session is not None else datetime.combine(start.date(), self.close_time, self.tz)
+        minutes = BAR_MINUTES[interval]
+        if minutes is None:
+            return close
+        return min(start + timedelta(minutes=minutes), close)
+
+    def bar_due(self, close, settle=BAR_SETTLE_SECONDS, pre_close=BAR_PRE_CLOSE_SECONDS):
+        """
+        When a bar closing at close is acted on: settle seconds after it,
+        or pre_close seconds before the session close when that would be
+        at or after the close.
+        """
+        close = self._local(close)
+        session_close = datetime.combine(close.date(), self.close_time, self.tz)
+        due = close + timedelta(seconds=settle)
+        if close <= session_close <= due:
+            return session_close - timedelta(seconds=pre_close)
+        return due
+
+    def next_bar_close(self, moment, interval):
+        """
+        First bar close of interval strictly after moment.
+        """
+        moment = self._local(moment)
+        for day in self.trading_days(moment.date()):
+            for close in self.bar_closes(day, interval):
+                if close > moment:
+                    return close
+
+    def next_run(self, moment, interval, intrabar=False, poll=10.0, settle=BAR_SETTLE_SECONDS,
+                 pre_close=BAR_PRE_CLOSE_SECONDS):
+        """
+        When a bot trading interval bars should evaluate next.
+        Bar-close mode: when the next bar is due (bar_due), always before
+        the session close.
+        Intrabar mode: every poll seconds while the market is open.
+        """
+        if interval not in BAR_MINUTES:
+            raise ValueError(f"Unsupported bar interval: {interval}")
+        moment = self._local(moment)
+        if intrabar:
+            if self.is_open(moment):
+                return moment + timedelta(seconds=poll)
+            return self.next_open(moment)
+        # A bar that closed less than settle seconds ago is still due
+        after = moment - timedelta(seconds=settle)
+        for day in self.trading_days(after.date()):
+            for close in self.bar_closes(day, interval):
+                if close > after:
+                    due = self.bar_due(close, settle, pre_close)
+                    if due > moment:
+                        return due
+
+
+nse = MarketCalendar.from_csv()
@@ -0,0 +1,411 @@
+import fcntl
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+# -----------------------------------------------------------------------------
+# Shared market data layer
+# -----------------------------------------------------------------------------
+# Bars are cached on disk per (symbol, interval) as one append-only binary
+# file per column (int64 UTC nanoseconds for the index, float64 for values)
+# plus a small meta.json. Upstream is only asked for bars newer than the last
+# stored one; range queries are answered from memory-mapped column files.
+# meta["start"]/meta["end"] bound the dates already fetched; bars dated before
+# meta["end"] are final, anything from that day on is re-fetched when asked for.
+#
+#   <MARKET_DATA_DIR>/<interval>/<symbol>/index.i8
+#   <MARKET_DATA_DIR>/<interval>/<symbol>/<column>.f8
+#   <MARKET_DATA_DIR>/<interval>/<symbol>/meta.json
+
+MARKET_DATA_DIR = os.getenv("MARKET_DATA_DIR", "market_data_cache")
+MARKET_DATA_TTL = float(os.getenv("MARKET_DATA_TTL", "15"))
+DEFAULT_INTERVAL = "1d"
+
+
+def _safe_name(value):
+    return re.sub(r"[^A-Za-z0-9._-]", "_", value)
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+
+
+class BarStore:
+    """
+    On-disk columnar OHLCV cache with incremental append.
+    """
+
+    def __init__(self, root=MARKET_DATA_DIR, downloader=None):
+        self.root = root
+        self.downloader = downloader or download_bars
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    # -------------------------------------------------------------------------
+    # Storage
+    # -------------------------------------------------------------------------
+    def path(self, symbol, interval=DEFAULT_INTERVAL):
+        return os.path.join(self.root, _safe_name(interval), _safe_name(symbol))
+
+    @contextmanager
+    def lock(self, symbol, interval=DEFAULT_INTERVAL):
+        """
+        Serialize writers of one series across threads and processes.
+        """
+        key = (symbol, interval)
+        with self._locks_guard:
+            thread_lock = self._locks.setdefault(key, threading.Lock())
+        directory = self.path(symbol, interval)
+        os.makedirs(directory, exist_ok=True)
+        with thread_lock, open(os.path.join(directory, ".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield directory
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def meta(self, symbol, interval=DEFAULT_INTERVAL):
+        try:
+            with open(os.path.join(self.path(symbol, interval), "meta.json")) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, directory, meta):
+        tmp_path = os.path.join(directory, "meta.json.tmp")
+        with open(tmp_path, "w") as file:
+            json.dump(meta, file)
+        os.replace(tmp_path, os.path.join(directory, "meta.json"))
+
+    def _column_file(self, directory, column):
+        return os.path.join(directory, f"{_safe_name(column)}.f8")
+
+    def _map(self, path, dtype, rows):
+        if rows == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", shape=(rows,))
+
+    def _write(self, directory, meta, df, replace):
+        """
+        Append df after the stored bars, overwriting any stored bar at or after
+        df's first timestamp (the last bar of the day is still forming).
+        """
+        rows = 0 if replace else meta["rows"]
+        index_path = os.path.join(directory, "index.i8")
+        stamps = df.index.tz_convert("UTC").as_unit("ns").asi8 if df.index.tz else df.index.as_unit("ns").asi8
+
+        if rows and len(stamps):
+            stored = self._map(index_path, "<i8", rows)
+            rows = int(np.searchsorted(stored, stamps[0], side="left"))
+            del stored
+
+        files = [(index_path, stamps.astype("<i8"))]
+        for column in meta["columns"]:
+            values = df[column].to_numpy(dtype="<f8", na_value=np.nan) if column in df else np.full(len(df), np.nan)
+            files.append((self._column_file(directory, column), values))
+
+        for path, values in files:
+            width = values.dtype.itemsize
+            with open(path, "ab") as file:
+                file.truncate(rows * width)
+                file.seek(rows * width)
+                file.write(np.ascontiguousarray(values).tobytes())
+
+        meta["rows"] = rows + len(stamps)
+        self._write_meta(directory, meta)
+
+    def read(self, symbol, interval=DEFAULT_INTERVAL, start=None, end=None):
+        """
+        Read stored bars with start <= timestamp < end (dates in exchange time).
+        Returns None if nothing is stored for the series.
+        """
+        meta = self.meta(symbol, interval)
+        if meta is None:
+            return None
+        directory = self.path(symbol, interval)
+        rows = meta["rows"]
+        tz = meta.get("tz")
+
+        stamps = self._map(os.path.join(directory, "index.i8"), "<i8", rows)
+        lo, hi = 0, rows
+        if start is not None:
+            lo = int(np.searchsorted(stamps, pd.Timestamp(_to_date(start), tz=tz).value, side="left"))
+        if end is not None:
+            hi = int(np.searchsorted(stamps, pd.Timestamp(_to_date(end), tz=tz).value, side="left"))
+        hi = max(lo, hi)
+
+        index = pd.DatetimeIndex(np.array(stamps[lo:hi]).view("datetime64[ns]"), name=meta.get("index_name", "Date"))
+        index = index.tz_localize("UTC").tz_convert(tz) if tz else index
+        data = {
+            column: np.array(self._map(self._column_file(directory, column), "<f8", rows)[lo:hi])
+            for column in meta["columns"]
+        }
+        return pd.DataFrame(data, index=index, columns=meta["columns"])
+
+    # -------------------------------------------------------------------------
+    # Fetch-through
+    # -------------------------------------------------------------------------
+    def history(self, symbol, start, end, interval=DEFAULT_INTERVAL):
+        """
+        Return bars for [start, end), downloading only what the cache lacks.
+        Mirrors yf.Ticker(symbol).history(start=start, end=end).
+        """
+        start = _to_date(start)
+        end = _to_date(end) if end is not None else date.today() + timedelta(days=1)
+        today = date.today()
+
+        with self.lock(symbol, interval) as directory:
+            meta = self.meta(symbol, interval)
+            covered_start = _to_date(meta["start"]) if meta else None
+            covered_end = _to_date(meta["end"]) if meta else None
+
+            try:
+                if meta is None or start < covered_start:
+                    # Nothing stored, or the request reaches further back: rebuild
+                    fetch_end = max(end, covered_end) if covered_end else end
+                    df = self.downloader(symbol, start, fetch_end, interval)
+                    if df is not None:
+                        meta = self._new_meta(df, start, min(fetch_end, today))
+                        self._write(directory, meta, df, replace=True)
+                elif end > covered_end:
+                    # Only the tail: from the last stored bar, which may have been partial
+                    last = self._last_date(directory, meta)
+                    fetch_start = min(last, covered_end) if last else covered_end
+                    df = self.downloader(symbol, fetch_start, end, interval)
+                    if df is not None:
+                        self._write(directory, meta, df, replace=False)
+                    meta["end"] = str(max(covered_end, min(end, today)))
+                    self._write_meta(directory, meta)
+            except Exception as e:
+                if meta is None:
+                    raise
+                print(f"Market data refresh failed for {symbol}, serving cached bars: {e}")
+
+        return self.read(symbol, interval, start, end)
+
+    def _new_meta(self, df, start, end):
+        tz = str(df.index.tz) if df.index.tz is not None else None
+        return {
+            "columns": [str(column) for column in df.columns],
+            "index_name": df.index.name or "Date",
+            "tz": tz,
+            "rows": 0,
+            "start": str(start),
+            "end": str(end),
+        }
+
+    def _last_date(self, directory, meta):
+        rows = meta["rows"]
+        if not rows:
+            return None
+        stamps = self._map(os.path.join(directory, "index.i8"), "<i8", rows)
+        last = pd.Timestamp(int(stamps[-1]), tz="UTC")
+        return (last.tz_convert(meta["tz"]) if meta.get("tz") else last.tz_localize(None)).date()
+
+
+def download_bars(symbol, start, end, interval=DEFAULT_INTERVAL):
+    """
+    Download [start, end) from Yahoo Finance. Returns None when there is no data.
+    """
+    df = yf.Ticker(symbol).history(start=str(start), end=str(end), interval=interval)
+    if df is None or df.empty:
+        return None
+    return df.select_dtypes(include="number")
+
+
+store = BarStore()
+
+
+# -----------------------------------------------------------------------------
+# Request coalescing
+# -----------------------------------------------------------------------------
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Concurrent calls for the same key share one execution and its result.
+    Results are kept for `ttl` seconds so repeat reads within a bar do not go
+    upstream again. Failures are shared with the waiters but never cached.
+    """
+
+    def __init__(self, ttl=MARKET_DATA_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._results = {}
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+
+    def do(self, key, fn):
+        now = time.monotonic()
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None and cached[0] > now:
+                self.stats["hits"] += 1
+                return cached[1]
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.stats["misses"] += 1
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                call.value = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                    if call.error is None:
+                        self._store(key, call.value)
+                    else:
+                        self.stats["errors"] += 1
+                call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.value
+
+    def _store(self, key, value):
+        now = time.monotonic()
+        if len(self._results) > 1024:
+            self._results = {k: v for k, v in self._results.items() if v[0] > now}
+        self._results[key] = (now + self.ttl, value)
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, in_flight=len(self._calls), cached=len(self._results))
+
+
+flight = SingleFlight()
+
+
+# Set in strategy workers by shared_bars.attach_reader(): frames published
+# by the web process are served from shared memory before the store is asked
+shared_source = None
+
+# Set in the web process while the live market feed runs: closed bars built
+# from ticks replace or extend what the store has (live_bars.LiveBars.extend)
+live_source = None
+
+
+def get_history(symbol, start, end, interval=DEFAULT_INTERVAL):
+    """
+    Coalesced BarStore.history. Every caller gets its own copy because
+    strategies add columns to the frame they are handed.
+    """
+    start = _to_date(start)
+    end = _to_date(end) if end is not None else None
+    if shared_source is not None:
+        df = shared_source.read(symbol, interval, start, end)
+        if df is not None:
+            return df
+    df = flight.do((symbol, interval, start, end), lambda: store.history(symbol, start, end, interval))
+    if live_source is not None:
+        live = live_source.extend(symbol, interval, df, start, end)
+        if live is not df:
+            return live
+    return df.copy() if df is not None else None
+
+
+def stats():
+    return flight.snapshot()
+
+
+# -----------------------------------------------------------------------------
+# Drop-in replacements for the per-strategy fetch helpers
+# -----------------------------------------------------------------------------
+def fetch_historical_data(stock_symbol, start_date, end_date, interval=DEFAULT_INTERVAL):
+    """
+    Fetch OHLCV bars for [start_date, end_date] (inclusive) through the cache.
+    """
+    try:
+        end_date_plus_one = _to_date(end_date) + timedelta(days=1)
+        df = get_history(stock_symbol, start_date, end_date_plus_one, interval)
+        if df is None or df.empty:
+            print(f"⚠ No data found for {stock_symbol}. Check the symbol and date range.")
+            return None
+        return df
+    except Exception as e:
+        print(f"Error fetching data for {stock_symbol}: {e}")
+        return None
+
+
+class CachedTicker:
+    """
+    yf.Ticker stand-in whose start/end history() calls go through the store.
+    Anything else is forwarded to a real yf.Ticker.
+    """
+
+    def __init__(self, symbol):
+        self.ticker = symbol
+        self._ticker = None
+
+    def _real(self):
+        if self._ticker is None:
+            self._ticker = yf.Ticker(self.ticker)
+        return self._ticker
+
+    def history(self, *args, **kwargs):
+        interval = kwargs.pop("interval", DEFAULT_INTERVAL)
+        start = kwargs.pop("start", None)
+        end = kwargs.pop("end", None)
+        if args or kwargs or start is None:
+            return self._real().history(*args, start=start, end=end, interval=interval, **kwargs)
+        df = get_history(self.ticker, start, end, interval)
+        return df if df is not None else pd.DataFrame()
+
+    def __getattr__(self, name):
+        return getattr(self._real(), name)
+
+
+class CachedYFinance:
+    """
+    Module-like proxy for yfinance that hands out CachedTickers.
+    """
+
+    Ticker = CachedTicker
+
+    def __getattr__(self, name):
+        return getattr(yf, name)
+
+
+cached_yfinance = CachedYFinance()
+
+
+def patch_strategy_module(module):
+    """
+    Point a loaded strategy at the shared cache. Strategies call
+    yf.Ticker(...).history(start=..., end=...) from their own
+    fetch_historical_data, so swapping their yfinance reference is enough for
+    uploaded code to use the cache unchanged.
+    """
+    for name, value in list(vars(module).items()):
+        if value is yf:
+            setattr(module, name, cached_yfinance)
+    return module
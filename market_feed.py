@@ -0,0 +1,293 @@
+import json
+import os
+import struct
+import threading
+import time
+from collections import Counter
+
+from logzero import logger
+
+# -----------------------------------------------------------------------------
+# SmartAPI market data feed
+# -----------------------------------------------------------------------------
+# One WebSocket (SmartAPI WebSocket 2.0) carries the ticks of every symbol a
+# running bot watches. watch()/unwatch() keep a reference count per symbol;
+# the feed thread connects while anything is watched, subscribes in Quote
+# mode and sends the difference whenever the watched set changes, up to
+# MARKET_FEED_MAX_TOKENS tokens (the broker's per-session limit). Ticks go
+# straight to a LiveBars aggregator.
+#
+# The connection sends the text heartbeat every MARKET_FEED_HEARTBEAT
+# seconds, is dropped when nothing (ticks or "pong") arrived for
+# MARKET_FEED_STALE seconds, and reconnects with exponential backoff up to
+# MARKET_FEED_MAX_BACKOFF, asking credentials() for fresh headers each time.
+#
+# MARKET_FEED_RECORD names a JSON-lines file that received ticks are
+# appended to, in the format fake_tick_server.py replays.
+#
+# Binary tick layout (little endian): mode u8, exchange type u8, token
+# char[25] (NUL padded), sequence i64, exchange time i64 (epoch ms), LTP i64
+# (paise); Quote mode adds last traded qty, average price, day volume (i64),
+# total buy / sell qty (f64), day open, high, low, previous close (i64).
+
+MARKET_FEED = os.getenv("MARKET_FEED", "1") != "0"
+MARKET_FEED_URL = os.getenv("MARKET_FEED_URL", "wss://smartapisocket.angelone.in/smart-stream")
+MARKET_FEED_MAX_TOKENS = int(os.getenv("MARKET_FEED_MAX_TOKENS", "1000"))
+MARKET_FEED_HEARTBEAT = float(os.getenv("MARKET_FEED_HEARTBEAT", "10"))
+MARKET_FEED_STALE = float(os.getenv("MARKET_FEED_STALE", "30"))
+MARKET_FEED_MAX_BACKOFF = float(os.getenv("MARKET_FEED_MAX_BACKOFF", "60"))
+MARKET_FEED_RECORD = os.getenv("MARKET_FEED_RECORD")
+RECV_TIMEOUT = 0.5  # Seconds; bounds how late idle bars close and subscriptions change
+
+MODE_LTP, MODE_QUOTE = 1, 2
+SUBSCRIBE, UNSUBSCRIBE = 1, 0
+EXCHANGE_TYPES = {"NSE": 1, "NFO": 2, "BSE": 3, "BFO": 4, "MCX": 5, "NCX": 7, "CDS": 13}
+
+LTP_PACKET = struct.Struct("<BB25sqqq")
+QUOTE_PACKET = struct.Struct("<BB25sqqqqqqddqqqq")
+
+
+def parse_tick(message):
+    """
+    Dict of the fields of one binary tick, or None for anything else.
+    Prices stay in paise.
+    """
+    if len(message) < LTP_PACKET.size:
+        return None
+    if message[0] in (MODE_QUOTE, 3) and len(message) >= QUOTE_PACKET.size:
+        (mode, exchange_type, token, sequence, timestamp, ltp, quantity, average, volume, _buy, _sell,
+         _open, _high, _low, _close) = QUOTE_PACKET.unpack_from(message)
+    else:
+        mode, exchange_type, token, sequence, timestamp, ltp = LTP_PACKET.unpack_from(message)
+        quantity = volume = None
+    return {
+        "mode": mode,
+        "exchange_type": exchange_type,
+        "token": token.split(b"\x00", 1)[0].decode(),
+        "sequence": sequence,
+        "time": timestamp,
+        "ltp": ltp,
+        "quantity": quantity,
+        "volume": volume,
+    }
+
+
+def pack_tick(tick):
+    """
+    Binary message for a tick dict as returned by parse_tick.
+    """
+    token = tick["token"].encode()
+    if tick.get("volume") is None:
+        return LTP_PACKET.pack(MODE_LTP, tick["exchange_type"], token, tick.get("sequence", 0), tick["time"],
+                               tick["ltp"])
+    return QUOTE_PACKET.pack(MODE_QUOTE, tick["exchange_type"], token, tick.get("sequence", 0), tick["time"],
+                             tick["ltp"], tick.get("quantity") or 0, tick["ltp"], tick["volume"], 0.0, 0.0,
+                             0, 0, 0, 0)
+
+
+def subscription_message(action, tokens, mode=MODE_QUOTE):
+    """
+    Subscribe/unsubscribe request for {(exchange_type, token), ...}.
+    """
+    by_exchange = {}
+    for exchange_type, token in sorted(tokens):
+        by_exchange.setdefault(exchange_type, []).append(token)
+    return json.dumps({
+        "correlationID": "algotrade",
+        "action": action,
+        "params": {
+            "mode": mode,
+            "tokenList": [{"exchangeType": exchange_type, "tokens": tokens}
+                          for exchange_type, tokens in by_exchange.items()],
+        },
+    })
+
+
+class MarketFeed:
+    """
+    Ticks of the watched symbols from the SmartAPI WebSocket into LiveBars.
+    credentials() returns the connection headers.
+    """
+
+    def __init__(self, bars, credentials, url=MARKET_FEED_URL, max_tokens=MARKET_FEED_MAX_TOKENS,
+                 heartbeat=MARKET_FEED_HEARTBEAT, stale=MARKET_FEED_STALE, max_backoff=MARKET_FEED_MAX_BACKOFF,
+                 record_path=MARKET_FEED_RECORD):
+        self.bars = bars
+        self.credentials = credentials
+        self.url = url
+        self.max_tokens = max_tokens
+        self.heartbeat = heartbeat
+        self.stale = stale
+        self.max_backoff = max_backoff
+        self.record_path = record_path
+        self._lock = threading.Lock()
+        self._watchers = Counter()
+        self._keys = {}  # symbol -> (exchange_type, token)
+        self._symbols = {}  # (exchange_type, token) -> symbol
+        self._changed = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._record = None
+        self.connected = False
+        self.last_tick = None
+        self.stats = {"connects": 0, "disconnects": 0, "failures": 0, "messages": 0, "ticks": 0, "unknown": 0,
+                      "rejected_tokens": 0}
+
+    # -------------------------------------------------------------------------
+    # Symbols
+    # -------------------------------------------------------------------------
+    def watch(self, symbol, token, exchange="NSE"):
+        """
+        Stream ticks of symbol (the instrument token on exchange). Returns
+        False when the symbol cannot be added.
+        """
+        key = (EXCHANGE_TYPES[exchange], str(token))
+        with self._lock:
+            if symbol not in self._watchers:
+                if len(self._keys) >= self.max_tokens:
+                    self.stats["rejected_tokens"] += 1
+                    return False
+                self._keys[symbol] = key
+                self._symbols[key] = symbol
+                self.bars.track(symbol)
+            self._watchers[symbol] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="market-feed", daemon=True)
+                self._thread.start()
+        self._changed.set()
+        return True
+
+    def unwatch(self, symbol):
+        with self._lock:
+            if symbol not in self._watchers:
+                return
+            self._watchers[symbol] -= 1
+            if self._watchers[symbol] > 0:
+                return
+            del self._watchers[symbol]
+            self._symbols.pop(self._keys.pop(symbol), None)
+            self.bars.untrack(symbol)
+        self._changed.set()
+
+    def watching(self, symbol):
+        with self._lock:
+            return symbol in self._watchers
+
+    # -------------------------------------------------------------------------
+    # Feed thread
+    # -------------------------------------------------------------------------
+    def _run(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            with self._lock:
+                wanted = bool(self._keys)
+            if not wanted:
+                self._changed.wait(1.0)
+                self._changed.clear()
+                continue
+            started = time.monotonic()
+            idle = False
+            try:
+                idle = self._stream()
+            except Exception as e:
+                self.stats["failures"] += 1
+                logger.warning(f"Market feed disconnected: {e}")
+            if self.connected:
+                self.connected = False
+                self.stats["disconnects"] += 1
+            if idle:
+                backoff = 1.0
+                continue
+            if time.monotonic() - started > self.max_backoff:
+                backoff = 1.0  # The connection had been up for a while
+            if self._stop.wait(backoff):
+                break
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def _stream(self):
+        """
+        One connection. Returns True when it was closed because nothing is
+        watched any more.
+        """
+        from websockets.sync.client import connect
+
+        with connect(self.url, additional_headers=self.credentials(), open_timeout=10, max_queue=1024,
+                     ping_interval=None) as connection:
+            self.connected = True
+            self.stats["connects"] += 1
+            self.bars.connected()
+            logger.info(f"Market feed connected to {self.url}")
+            subscribed = set()
+            last_sent = last_received = time.monotonic()
+            while not self._stop.is_set():
+                with self._lock:
+                    wanted = set(self._symbols)
+                if not wanted:
+                    return True  # Disconnect until a bot needs the feed again
+                self._changed.clear()
+                if wanted != subscribed:
+                    if subscribed - wanted:
+                        connection.send(subscription_message(UNSUBSCRIBE, subscribed - wanted))
+                    if wanted - subscribed:
+                        connection.send(subscription_message(SUBSCRIBE, wanted - subscribed))
+                    subscribed = wanted
+                now = time.monotonic()
+                if now - last_sent >= self.heartbeat:
+                    connection.send("ping")
+                    last_sent = now
+                if now - last_received > self.stale:
+                    raise ConnectionError(f"No data for {self.stale:.0f}s")
+                try:
+                    message = connection.recv(timeout=RECV_TIMEOUT)
+                except TimeoutError:
+                    message = None
+                if message is not None:
+                    last_received = time.monotonic()
+                    self.stats["messages"] += 1
+                    if isinstance(message, bytes):
+                        self._on_tick(parse_tick(message))
+                    elif message != "pong":
+                        logger.warning(f"Market feed message: {message}")
+                self.bars.close_due()
+
+    def _on_tick(self, tick):
+        if tick is None:
+            return
+        symbol = self._symbols.get((tick["exchange_type"], tick["token"]))
+        if symbol is None:
+            self.stats["unknown"] += 1
+            return
+        self.stats["ticks"] += 1
+        self.last_tick = time.time()
+        self.bars.on_tick(symbol, tick["time"] * 1_000_000, tick["ltp"] / 100.0, tick["volume"],
+                          tick["quantity"] or 0)
+        if self.record_path:
+            self._write_record(tick)
+
+    def _write_record(self, tick):
+        try:
+            if self._record is None:
+                self._record = open(self.record_path, "a", buffering=1)
+            self._record.write(json.dumps(tick) + "\n")
+        except OSError as e:
+            print(f"Could not record ticks to {self.record_path}: {e}")
+            self.record_path = None
+
+    def close(self, timeout=5.0):
+        self._stop.set()
+        self._changed.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self._record is not None:
+            self._record.close()
+
+    def snapshot(self):
+        with self._lock:
+            symbols = len(self._watchers)
+        return dict(
+            self.stats,
+            enabled=True,
+            connected=self.connected,
+            symbols=symbols,
+            last_tick_age=round(time.time() - self.last_tick, 1) if self.last_tick is not None else None,
+        )
@@ -0,0 +1,278 @@
+import json
+import os
+import queue
+import threading
+import time
+
+# -----------------------------------------------------------------------------
+# Order persistence
+# -----------------------------------------------------------------------------
+# Executed orders are recorded off the trading path: place_order() only puts
+# the row on a bounded queue and one background thread writes them to the
+# database in multi-row inserts of up to ORDER_BATCH_SIZE rows, at most
+# ORDER_FLUSH_SECONDS after the first row of a batch arrived.
+#
+# A failed insert is retried ORDER_RETRIES times with exponential backoff.
+# If the database is still unavailable the batch is appended to a local
+# JSON-lines spool file (fsynced) and further batches go straight there
+# until the backoff (up to ORDER_MAX_BACKOFF) has passed; then the spool is
+# replayed in batches before anything newer. A replay that fails part way
+# leaves the unsent rows in the replay file, which goes before the spool on
+# the next attempt. A full queue also spills to the spool, so recording an
+# order never blocks or drops it. Delivery is at least once: a batch whose
+# insert succeeded but whose reply was lost is resent.
+
+ORDER_BATCH_SIZE = int(os.getenv("ORDER_BATCH_SIZE", "100"))
+ORDER_FLUSH_SECONDS = float(os.getenv("ORDER_FLUSH_SECONDS", "0.5"))
+ORDER_QUEUE_SIZE = int(os.getenv("ORDER_QUEUE_SIZE", "10000"))
+ORDER_RETRIES = int(os.getenv("ORDER_RETRIES", "3"))
+ORDER_MAX_BACKOFF = float(os.getenv("ORDER_MAX_BACKOFF", "60"))
+ORDER_SPOOL_PATH = os.getenv("ORDER_SPOOL_PATH", "order_spool.jsonl")
+IDLE_CHECK_SECONDS = 1.0  # How often an idle writer looks at the spool
+
+
+class OrderWriter:
+    """
+    Bounded queue + background batch writer with a disk spool.
+    insert(rows) writes a list of row dicts and raises on failure.
+    """
+
+    def __init__(self, insert, spool_path=ORDER_SPOOL_PATH, batch_size=ORDER_BATCH_SIZE,
+                 flush_seconds=ORDER_FLUSH_SECONDS, queue_size=ORDER_QUEUE_SIZE, retries=ORDER_RETRIES,
+                 base_backoff=0.5, max_backoff=ORDER_MAX_BACKOFF):
+        self.insert = insert
+        self.spool_path = spool_path
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.retries = retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._spool_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._backoff = base_backoff
+        self._retry_at = 0.0  # Monotonic time before which the database is not tried
+        self._batch = []  # Rows taken off the queue and not yet written or spooled
+        self.stats = {"submitted": 0, "written": 0, "batches": 0, "failed_inserts": 0, "spooled": 0,
+                      "replayed": 0, "overflow": 0, "lost": 0}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="order-writer", daemon=True)
+        self._thread.start()
+        return self
+
+    # -------------------------------------------------------------------------
+    # Producer side
+    # -------------------------------------------------------------------------
+    def submit(self, row):
+        """
+        Record one order row. Never blocks on the database.
+        """
+        self.stats["submitted"] += 1
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.stats["overflow"] += 1
+            self._spool_or_log([row])
+
+    # -------------------------------------------------------------------------
+    # Spool file
+    # -------------------------------------------------------------------------
+    def _replay_path(self):
+        return self.spool_path + ".replay"
+
+    def _spool(self, rows):
+        with self._spool_lock:
+            directory = os.path.dirname(self.spool_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.spool_path, "a") as file:
+                file.write("".join(json.dumps(row, default=str) + "\n" for row in rows))
+                file.flush()
+                os.fsync(file.fileno())
+            self.stats["spooled"] += len(rows)
+
+    def _spool_or_log(self, rows):
+        """
+        Spool rows from an error path; if even that fails (disk full, no
+        permission) the rows are printed so the log still has them, and the
+        writer carries on.
+        """
+        try:
+            self._spool(rows)
+        except Exception as e:
+            self.stats["lost"] += len(rows)
+            print(f"Could not spool {len(rows)} orders to {self.spool_path}: {e}")
+            for row in rows:
+                print(f"Unsaved order: {json.dumps(row, default=str)}")
+
+    def unwritten(self):
+        """
+        Rows not known to be in the database (spooled, the batch being
+        written, queued). Spooled rows may already have been written once.
+        """
+        with self._spool_lock:
+            rows = []
+            for path in (self._replay_path(), self.spool_path):
+                if os.path.exists(path):
+                    rows += self._read_spool(path)
+        rows += list(self._batch)
+        with self._queue.mutex:
+            rows += list(self._queue.queue)
+        return rows
+
+    def _spool_pending(self):
+        return os.path.exists(self.spool_path) or os.path.exists(self._replay_path())
+
+    def _read_spool(self, path):
+        rows = []
+        with open(path) as file:
+            for number, line in enumerate(file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    # A line cut short by a crash mid-write
+                    print(f"Skipping unreadable line {number} of order spool {path}")
+        return rows
+
+    def _replay(self):
+        """
+        Insert everything spooled, oldest first. Returns False if the database
+        failed again; what was not written stays in the replay file, ahead of
+        rows spooled since.
+        """
+        replay_path = self._replay_path()
+        while True:
+            with self._spool_lock:
+                if not os.path.exists(replay_path):
+                    if not os.path.exists(self.spool_path):
+                        return True
+                    os.replace(self.spool_path, replay_path)
+            rows = self._read_spool(replay_path)
+            for start in range(0, len(rows), self.batch_size):
+                batch = rows[start:start + self.batch_size]
+                try:
+                    self.insert(batch)
+                except Exception as e:
+                    print(f"Order spool replay failed, {len(rows) - start} rows kept: {e}")
+                    self.stats["failed_inserts"] += 1
+                    self._rewrite(replay_path, rows[start:])
+                    self._failed()
+                    return False
+                self.stats["replayed"] += len(batch)
+                self.stats["written"] += len(batch)
+                self.stats["batches"] += 1
+            os.remove(replay_path)
+            if rows:
+                print(f"Replayed {len(rows)} spooled orders")
+            # Rows spooled during the replay are older than anything still queued
+
+    def _rewrite(self, path, rows):
+        """
+        Replace path with rows (written aside, fsynced, then renamed).
+        """
+        temporary = path + ".tmp"
+        with open(temporary, "w") as file:
+            file.write("".join(json.dumps(row, default=str) + "\n" for row in rows))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, path)
+
+    # -------------------------------------------------------------------------
+    # Writer thread
+    # -------------------------------------------------------------------------
+    def _failed(self):
+        self._retry_at = time.monotonic() + self._backoff
+        self._backoff = min(self._backoff * 2, self.max_backoff)
+
+    def _succeeded(self):
+        self._backoff = self.base_backoff
+        self._retry_at = 0.0
+
+    def _collect(self):
+        """
+        Up to batch_size rows: waits for a first row, then for at most
+        flush_seconds more.
+        """
+        try:
+            batch = self._batch = [self._queue.get(timeout=IDLE_CHECK_SECONDS)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch, retries=None):
+        if time.monotonic() < self._retry_at or not self._replay():
+            # Database known to be down, or older spooled rows could not go first
+            self._spool(batch)
+            return
+        delay = self.base_backoff
+        for attempt in range(1 + (self.retries if retries is None else retries)):
+            if attempt:
+                if self._stop.wait(delay):
+                    break
+                delay *= 2
+            try:
+                self.insert(batch)
+            except Exception as e:
+                self.stats["failed_inserts"] += 1
+                print(f"Order insert of {len(batch)} rows failed (attempt {attempt + 1}): {e}")
+                continue
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+            self._succeeded()
+            return
+        self._spool(batch)
+        self._failed()
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect()
+            try:
+                if batch:
+                    self._write(batch)
+                elif self._spool_pending() and time.monotonic() >= self._retry_at:
+                    if self._replay():
+                        self._succeeded()
+            except Exception as e:
+                # Never lose the batch to an unexpected error (e.g. disk full on replay)
+                print(f"Order writer error: {e}")
+                if batch:
+                    self._spool_or_log(batch)
+            self._batch = []
+        # Shutting down: one quick attempt for what is left, then the spool
+        rest = []
+        while True:
+            try:
+                rest.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for start in range(0, len(rest), self.batch_size):
+            batch = rest[start:start + self.batch_size]
+            try:
+                self._write(batch, retries=0)
+            except Exception as e:
+                print(f"Order writer error: {e}")
+                self._spool_or_log(batch)
+
+    def close(self, timeout=10.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def snapshot(self):
+        return dict(
+            self.stats,
+            queued=self._queue.qsize(),
+            spool_pending=self._spool_pending(),
+            retry_in=round(max(0.0, self._retry_at - time.monotonic()), 2),
+        )
@@ -0,0 +1,229 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "strategies"))
+from signal_engine import latch_state  # noqa: E402
+
+# -----------------------------------------------------------------------------
+# Backtest evaluation
+# -----------------------------------------------------------------------------
+# Turns a strategy's Signal column into positions, trades and an equity curve
+# the way a bot would trade it: long `quantity` shares from a buy until the
+# next sell, flat otherwise, filling at the signal bar's close moved by
+# slippage and paying costs on every fill's value.
+#
+# Everything runs on (bars x symbols) arrays with whole-array operations, so
+# one call scores a single backtest, every symbol of a universe or every
+# parameter set of a sweep. Capital defaults to the value of `quantity`
+# shares at the first close, which makes returns independent of quantity.
+
+ORDER_QUANTITY = int(os.getenv("ORDER_QUANTITY", "50"))  # Shares per order, live bots and backtests
+BACKTEST_COST_BPS = float(os.getenv("BACKTEST_COST_BPS", "0"))  # Brokerage, taxes and fees per fill
+BACKTEST_SLIPPAGE_BPS = float(os.getenv("BACKTEST_SLIPPAGE_BPS", "0"))
+PERIODS_PER_YEAR = 252
+EQUITY_CURVE_POINTS = 500  # Upper bound for a requested downsampled curve
+METRICS = ("total_return_pct", "cagr_pct", "sharpe", "max_drawdown_pct", "win_rate_pct", "trades", "exposure_pct")
+
+
+def settings_from(data):
+    """
+    quantity / capital / cost_bps / slippage_bps of a request body, with
+    defaults for the ones not given (None counts as not given; an explicit
+    0 is rejected, not defaulted). Raises ValueError on bad values.
+    """
+    quantity = data.get("quantity")
+    capital = data.get("capital")
+    settings = {
+        "quantity": ORDER_QUANTITY if quantity is None else int(quantity),
+        "capital": None if capital is None else float(capital),
+        "cost_bps": float(data.get("cost_bps", BACKTEST_COST_BPS)),
+        "slippage_bps": float(data.get("slippage_bps", BACKTEST_SLIPPAGE_BPS)),
+    }
+    if settings["quantity"] <= 0 or (settings["capital"] is not None and settings["capital"] <= 0):
+        raise ValueError("quantity and capital must be positive")
+    if settings["cost_bps"] < 0 or settings["slippage_bps"] < 0:
+        raise ValueError("cost_bps and slippage_bps cannot be negative")
+    return settings
+
+
+def _filled(close):
+    """
+    Carry the last price over missing bars (and the first one back).
+    """
+    close = np.asarray(close, dtype=float)
+    if np.isfinite(close).all():
+        return close
+    return pd.DataFrame(close).ffill().bfill().fillna(0.0).to_numpy()
+
+
+def simulate(close, signal, quantity=ORDER_QUANTITY, capital=None, cost_bps=BACKTEST_COST_BPS,
+             slippage_bps=BACKTEST_SLIPPAGE_BPS):
+    """
+    Positions, fills and equity of (bars x symbols) close/signal arrays.
+    Returns a dict of (bars x symbols) arrays plus the capital per column.
+    """
+    close = _filled(close)
+    signal = np.nan_to_num(np.asarray(signal, dtype=float)).astype(np.int8)
+    shares = (latch_state(signal) == 1) * float(quantity)
+    traded = np.diff(shares, axis=0, prepend=0.0)  # + bought, - sold at the bar's close
+    fill = close * (1.0 + np.sign(traded) * slippage_bps / 1e4)
+    value = np.abs(traded) * fill
+    costs = value * cost_bps / 1e4
+    if capital is None:
+        capital = quantity * close[0]
+    capital = np.broadcast_to(np.asarray(capital, dtype=float), close.shape[1:]).copy()
+    cash = capital - np.cumsum(traded * fill + costs, axis=0)
+    return {
+        "close": close,
+        "shares": shares,
+        "traded": traded,
+        "fill": fill,
+        "value": value,
+        "costs": costs,
+        "equity": cash + shares * close,
+        "capital": capital,
+    }
+
+
+def round_trips(book):
+    """
+    Every trade as flat arrays ordered by column and time: column, entry
+    row, exit row (-1 while open) and P&L after costs (open trades marked
+    at the last close).
+    """
+    traded, fill, costs = book["traded"], book["fill"], book["costs"]
+    columns = traded.shape[1]
+    # Column-major so each column's fills come out in time order
+    entry_columns, entry_rows = np.nonzero(traded.T > 0)
+    exit_columns, exit_rows = np.nonzero(traded.T < 0)
+
+    # Positions go flat -> long -> flat, so a column's k-th exit closes its k-th entry
+    entry_counts = np.bincount(entry_columns, minlength=columns)
+    exit_counts = np.bincount(exit_columns, minlength=columns)
+    k = np.arange(len(entry_rows)) - (np.cumsum(entry_counts) - entry_counts)[entry_columns]
+    closed = k < exit_counts[entry_columns]
+    exit_at = np.full(len(entry_rows), -1)
+    exit_at[closed] = exit_rows[(np.cumsum(exit_counts) - exit_counts)[entry_columns[closed]] + k[closed]]
+
+    paid = traded[entry_rows, entry_columns] * fill[entry_rows, entry_columns] + costs[entry_rows, entry_columns]
+    last = len(traded) - 1
+    received = book["shares"][last, entry_columns] * book["close"][last, entry_columns]
+    out_rows, out_columns = exit_at[closed], entry_columns[closed]
+    received[closed] = -traded[out_rows, out_columns] * fill[out_rows, out_columns] - costs[out_rows, out_columns]
+    return entry_columns, entry_rows, exit_at, received - paid
+
+
+def metrics(book, dates=None, periods_per_year=PERIODS_PER_YEAR):
+    """
+    Summary figures per column of a simulate() result.
+    """
+    equity, capital = book["equity"], book["capital"]
+    bars, columns = equity.shape
+    if dates is not None and bars > 1:
+        dates = pd.DatetimeIndex(dates)
+        years = max((dates[-1] - dates[0]).days / 365.25, 1.0 / periods_per_year)
+    else:
+        years = max(bars, 1) / periods_per_year
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.diff(equity, axis=0) / equity[:-1]
+    returns = np.nan_to_num(returns, nan=0.0, posinf=0.0, neginf=0.0)
+    mean = returns.mean(axis=0) if bars > 1 else np.zeros(columns)
+    std = returns.std(axis=0) if bars > 1 else np.zeros(columns)
+    peak = np.maximum.accumulate(np.maximum(equity, 0.0), axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdown = np.nan_to_num(equity / peak - 1.0, nan=0.0).min(axis=0)
+
+    growth = equity[-1] / capital
+    cagr = np.where(growth > 0, np.power(np.maximum(growth, 1e-300), 1.0 / years) - 1.0, -1.0)
+    average_equity = np.abs(equity).mean(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        turnover = np.nan_to_num(book["value"].sum(axis=0) / average_equity / years, nan=0.0, posinf=0.0)
+    exposure = (book["shares"] != 0).mean(axis=0) if bars else np.zeros(columns)
+    costs = book["costs"].sum(axis=0)
+
+    trade_columns, _, exit_at, pnl = round_trips(book)
+    closed = exit_at >= 0
+    trades = np.bincount(trade_columns, minlength=columns)
+    closed_trades = np.bincount(trade_columns[closed], minlength=columns)
+    wins = np.bincount(trade_columns[closed & (pnl > 0)], minlength=columns)
+
+    return [
+        {
+            "total_return_pct": float((growth[i] - 1.0) * 100),
+            "cagr_pct": float(cagr[i] * 100),
+            "sharpe": float(mean[i] / std[i] * np.sqrt(periods_per_year)) if std[i] > 0 else 0.0,
+            "max_drawdown_pct": float(drawdown[i] * 100),
+            "win_rate_pct": float(wins[i] / closed_trades[i] * 100) if closed_trades[i] else 0.0,
+            "trades": int(trades[i]),
+            "exposure_pct": float(exposure[i] * 100),
+            "turnover": float(turnover[i]),
+            "costs": float(costs[i]),
+            "capital": float(capital[i]),
+            "final_equity": float(equity[-1, i]),
+        }
+        for i in range(columns)
+    ]
+
+
+def evaluate_matrix(close, signal, dates=None, periods_per_year=PERIODS_PER_YEAR, **settings):
+    """
+    metrics() of (bars x symbols) close and signal arrays, one dict per column.
+    """
+    close = np.asarray(close, dtype=float)
+    if len(close) == 0:
+        return [{metric: 0.0 for metric in METRICS} for _ in range(close.shape[1])]
+    return metrics(simulate(close, signal, **settings), dates, periods_per_year)
+
+
+def equity_curve(book, dates, points, column=0):
+    """
+    `points` evenly spaced (date, equity) samples plus the lowest point and
+    the last bar.
+    """
+    equity = book["equity"][:, column]
+    if len(equity) == 0 or points <= 0:
+        return []
+    rows = np.unique(np.concatenate([
+        np.linspace(0, len(equity) - 1, min(points, len(equity))).round().astype(int),
+        [int(equity.argmin()), len(equity) - 1],
+    ]))
+    return [{"date": str(dates[row])[:10] if dates is not None else int(row), "equity": round(float(equity[row]), 2)}
+            for row in rows]
+
+
+def evaluate(results, settings=None, periods_per_year=PERIODS_PER_YEAR, equity_points=0, include_trades=False):
+    """
+    Evaluate one backtest_strategy result frame (Close and Signal columns,
+    dates in a Date column or the index). Returns {"summary": ...} plus
+    "equity_curve" and "trades" when asked for.
+    """
+    settings = settings or {}
+    dates = results["Date"] if "Date" in results else results.index
+    dates = pd.DatetimeIndex(dates) if isinstance(dates, (pd.Series, pd.DatetimeIndex)) and len(dates) else None
+    close = results["Close"].to_numpy(dtype=float).reshape(-1, 1)
+    signal = results["Signal"].to_numpy(dtype=float).reshape(-1, 1)
+
+    if len(close) == 0:
+        return {"summary": {metric: 0.0 for metric in METRICS}}
+    book = simulate(close, signal, **settings)
+    evaluation = {"summary": metrics(book, dates, periods_per_year)[0]}
+    if equity_points:
+        evaluation["equity_curve"] = equity_curve(book, dates, min(int(equity_points), EQUITY_CURVE_POINTS))
+    if include_trades:
+        _, entry_rows, exit_at, pnl = round_trips(book)
+        label = (lambda row: str(dates[row])[:10]) if dates is not None else int
+        evaluation["trades"] = [
+            {
+                "entry_date": label(entry),
+                "entry_price": round(float(book["fill"][entry, 0]), 4),
+                "exit_date": label(exit_) if exit_ >= 0 else None,
+                "exit_price": round(float(book["fill"][exit_, 0]), 4) if exit_ >= 0 else None,
+                "pnl": round(float(value), 2),
+            }
+            for entry, exit_, value in zip(entry_rows.tolist(), exit_at.tolist(), pnl.tolist())
+        ]
+    return evaluation
@@ -0,0 +1,210 @@
+import argparse
+import codecs
+import csv
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from instruments import INSTRUMENTS_FILE, Instrument, read_instruments_csv, sidecar_path
+
+# -----------------------------------------------------------------------------
+# Instrument master refresh
+# -----------------------------------------------------------------------------
+# Streams Angel's OpenAPIScripMaster.json, deduplicates it on (exchange, symbol)
+# and atomically replaces instruments.csv plus a fixed-width binary sidecar
+# (instruments.npy) that can be memory-mapped by the executor.
+#
+#   python refresh_instruments.py
+#   python refresh_instruments.py --source scrip_master.json   # offline
+
+SCRIP_MASTER_URL = "https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json"
+CHUNK_SIZE = 1 << 16
+
+
+def iter_source_chunks(source):
+    """
+    Yield text chunks from a URL or a local file without loading it whole.
+    """
+    if source.startswith(("http://", "https://")):
+        import requests
+
+        with requests.get(source, stream=True, timeout=60) as response:
+            response.raise_for_status()
+            decoder = codecs.getincrementaldecoder("utf-8")()
+            for chunk in response.iter_content(CHUNK_SIZE):
+                yield decoder.decode(chunk)
+            yield decoder.decode(b"", final=True)
+    else:
+        with open(source, encoding="utf-8") as file:
+            while True:
+                chunk = file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+
+def iter_json_array(chunks):
+    """
+    Incrementally decode the objects of a top-level JSON array.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    started = False
+    for chunk in chunks:
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position >= len(buffer):
+                break
+            if not started:
+                if buffer[position] != "[":
+                    raise ValueError("Scrip master is not a JSON array")
+                started = True
+                position += 1
+                continue
+            if buffer[position] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break  # Object continues in the next chunk
+            yield item
+            position = end
+    if buffer[position:].strip():
+        raise ValueError("Truncated scrip master JSON")
+
+
+def parse_instruments(items):
+    """
+    Map scrip master records to Instruments, keeping the first record for
+    each (exchange, symbol).
+    """
+    seen = set()
+    for item in items:
+        symbol = item.get("symbol")
+        token = item.get("token")
+        if not symbol or not token:
+            continue
+        exchange = item.get("exch_seg") or None
+        key = (exchange, symbol)
+        if key in seen:
+            continue
+        seen.add(key)
+        lot_size = item.get("lotsize")
+        try:
+            lot_size = int(float(lot_size)) if lot_size not in (None, "") else None
+        except ValueError:
+            lot_size = None
+        yield Instrument(symbol, str(token), exchange, lot_size)
+
+
+def atomic_write(path, write, mode="w", **kwargs):
+    """
+    Write through a temporary file in the target directory, then rename over
+    the destination so readers never see a partial file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, mode, **kwargs) as file:
+            write(file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def write_csv(path, instruments):
+    def write(file):
+        writer = csv.writer(file)
+        writer.writerow(Instrument._fields)
+        for instrument in instruments:
+            writer.writerow(["" if value is None else value for value in instrument])
+
+    atomic_write(path, write, newline="")
+
+
+def to_columnar(instruments):
+    """
+    Pack instruments into a fixed-width structured array.
+    """
+    symbol_width = max((len(i.symbol.encode()) for i in instruments), default=1)
+    token_width = max((len(i.token.encode()) for i in instruments), default=1)
+    exchange_width = max((len((i.exchange or "").encode()) for i in instruments), default=1)
+    dtype = np.dtype([
+        ("symbol", f"S{symbol_width}"),
+        ("token", f"S{token_width}"),
+        ("exchange", f"S{max(exchange_width, 1)}"),
+        ("lot_size", "<i4"),
+    ])
+    array = np.empty(len(instruments), dtype=dtype)
+    array["symbol"] = [i.symbol.encode() for i in instruments]
+    array["token"] = [i.token.encode() for i in instruments]
+    array["exchange"] = [(i.exchange or "").encode() for i in instruments]
+    array["lot_size"] = [i.lot_size or 0 for i in instruments]
+    return array
+
+
+def write_sidecar(path, instruments):
+    array = to_columnar(instruments)
+    atomic_write(path, lambda file: np.save(file, array, allow_pickle=False), mode="wb")
+
+
+def diff_instruments(old, new):
+    """
+    Compare two snapshots on (exchange, symbol).
+    """
+    old_tokens = {(i.exchange, i.symbol): i.token for i in old}
+    new_tokens = {(i.exchange, i.symbol): i.token for i in new}
+    order = lambda key: (key[0] or "", key[1])
+    added = sorted((key for key in new_tokens if key not in old_tokens), key=order)
+    removed = sorted((key for key in old_tokens if key not in new_tokens), key=order)
+    changed = sorted((key for key in new_tokens if key in old_tokens and old_tokens[key] != new_tokens[key]), key=order)
+    return {"added": added, "removed": removed, "token_changed": changed}
+
+
+def refresh(source=SCRIP_MASTER_URL, csv_path=INSTRUMENTS_FILE):
+    """
+    Rebuild the instrument master from the scrip master and return the diff
+    against the previous snapshot.
+    """
+    new = list(parse_instruments(iter_json_array(iter_source_chunks(source))))
+    if not new:
+        raise ValueError(f"No instruments found in {source}")
+
+    old = read_instruments_csv(csv_path) if os.path.exists(csv_path) else []
+
+    # CSV first: a sidecar older than the CSV is treated as stale by the registry
+    write_csv(csv_path, new)
+    write_sidecar(sidecar_path(csv_path), new)
+    return new, diff_instruments(old, new)
+
+
+def format_key(key):
+    exchange, symbol = key
+    return f"{exchange}:{symbol}" if exchange else symbol
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh instruments.csv from the Angel scrip master.")
+    parser.add_argument("--source", default=SCRIP_MASTER_URL, help="URL or local path of OpenAPIScripMaster.json")
+    parser.add_argument("--output", default=INSTRUMENTS_FILE, help="Instrument CSV to replace")
+    parser.add_argument("--show", type=int, default=20, help="How many changed symbols to list per category")
+    args = parser.parse_args()
+
+    instruments, diff = refresh(args.source, args.output)
+    print(f"Instrument list refreshed: {len(instruments)} instruments written to {args.output}")
+    for category, keys in diff.items():
+        print(f"{category}: {len(keys)}")
+        for key in keys[:args.show]:
+            print(f"  {format_key(key)}")
+        if len(keys) > args.show:
+            print(f"  ... {len(keys) - args.show} more")
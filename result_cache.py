@@ -0,0 +1,213 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import market_data
+from market_calendar import IST
+
+# -----------------------------------------------------------------------------
+# Backtest result cache
+# -----------------------------------------------------------------------------
+# Backtest result frames are kept by
+#   (strategy content hash, symbol, start, end, params, interval, data version)
+# in an in-memory LRU bounded by frame size and, behind it, as pickles on
+# disk bounded by total file size (least recently used files go first).
+#
+# The data version of a range that ended before today is "final": its bars
+# will not change, so the entry is served for as long as it is cached. A
+# range reaching today is versioned by its bar count and latest bar after
+# the usual tail refresh, so a new bar or a moving last price gives a new
+# key and the stale result simply ages out.
+#
+#   <RESULT_CACHE_DIR>/<key>.pkl
+
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", "result_cache")
+RESULT_CACHE_MEMORY_MB = float(os.getenv("RESULT_CACHE_MEMORY_MB", "64"))
+RESULT_CACHE_DISK_MB = float(os.getenv("RESULT_CACHE_DISK_MB", "512"))
+
+
+def data_version(symbol, start_date, end_date, interval=market_data.DEFAULT_INTERVAL):
+    """
+    "final" for ranges that ended before today, otherwise a digest of the
+    range's bar count and latest bar. None when there are no bars.
+    """
+    end = market_data._to_date(end_date)
+    if end < datetime.now(IST).date():
+        return "final"
+    df = market_data.get_history(symbol, start_date, end + timedelta(days=1), interval)
+    if df is None or df.empty:
+        return None
+    last = df.iloc[-1]
+    latest = [len(df), int(df.index[-1].value)] + [float(value) for value in last.to_numpy(dtype=float, na_value=0.0)]
+    return hashlib.blake2b(json.dumps(latest).encode(), digest_size=8).hexdigest()
+
+
+def result_key(sha, symbol, start_date, end_date, params=None, version=None, interval=market_data.DEFAULT_INTERVAL):
+    fields = [sha, symbol, str(market_data._to_date(start_date)), str(market_data._to_date(end_date)),
+              params or {}, interval, version]
+    return hashlib.sha256(json.dumps(fields, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _frame_bytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class ResultCache:
+    """
+    Two-tier (memory, disk) cache of backtest result frames.
+    """
+
+    def __init__(self, cache_dir=RESULT_CACHE_DIR, memory_bytes=RESULT_CACHE_MEMORY_MB * 1024 * 1024,
+                 disk_bytes=RESULT_CACHE_DISK_MB * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._lock = threading.Lock()
+        self._frames = OrderedDict()  # key -> (frame, size)
+        self._size = 0
+        self._flight = market_data.SingleFlight(ttl=0)  # Identical concurrent misses run once
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "disk_evictions": 0}
+
+    # -------------------------------------------------------------------------
+    # Memory tier
+    # -------------------------------------------------------------------------
+    def _remember(self, key, df):
+        size = _frame_bytes(df)
+        if size > self.memory_bytes:
+            return
+        with self._lock:
+            previous = self._frames.pop(key, None)
+            if previous is not None:
+                self._size -= previous[1]
+            self._frames[key] = (df, size)
+            self._size += size
+            while self._size > self.memory_bytes:
+                _, (_, evicted) = self._frames.popitem(last=False)
+                self._size -= evicted
+                self.stats["evictions"] += 1
+
+    # -------------------------------------------------------------------------
+    # Disk tier
+    # -------------------------------------------------------------------------
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".pkl")
+
+    def _read_disk(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                df = pickle.load(file)
+            os.utime(path)  # Recently used: evicted last
+            return df
+        except (OSError, EOFError, pickle.UnpicklingError) as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"Dropping unreadable cached result {key}: {e}")
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            return None
+
+    def _write_disk(self, key, df):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._path(key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as file:
+                pickle.dump(df, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+            self._prune_disk()
+        except OSError as e:
+            print(f"Could not write cached result {key}: {e}")
+
+    def _prune_disk(self):
+        """
+        Remove least recently used files until the directory fits disk_bytes.
+        """
+        entries = []
+        with os.scandir(self.cache_dir) as scan:
+            for entry in scan:
+                if entry.name.endswith(".pkl"):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.remove(path)
+                self.stats["disk_evictions"] += 1
+            except OSError:
+                pass
+            total -= size
+
+    # -------------------------------------------------------------------------
+    # Lookup
+    # -------------------------------------------------------------------------
+    def get(self, key):
+        """
+        The cached frame for key (a copy), or None.
+        """
+        with self._lock:
+            cached = self._frames.get(key)
+            if cached is not None:
+                self._frames.move_to_end(key)
+                self.stats["hits"] += 1
+                return cached[0].copy()
+        df = self._read_disk(key)
+        if df is None:
+            return None
+        self.stats["disk_hits"] += 1
+        self._remember(key, df)
+        return df.copy()
+
+    def put(self, key, df):
+        self._remember(key, df)
+        self._write_disk(key, df)
+        self.stats["stores"] += 1
+
+    def get_or_compute(self, key, compute):
+        """
+        Return (frame, cached). compute() runs once for concurrent misses of
+        the same key; None results and exceptions are not cached.
+        """
+        df = self.get(key)
+        if df is not None:
+            return df, True
+
+        def run():
+            self.stats["misses"] += 1
+            df = compute()
+            if df is not None and len(df):
+                self.put(key, df)
+            return df
+
+        df = self._flight.do(key, run)
+        return (df.copy() if df is not None else None), False
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self._size = 0
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for name in names:
+            if name.endswith(".pkl"):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, entries=len(self._frames), memory_mb=round(self._size / 1024 / 1024, 2))
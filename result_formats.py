@@ -0,0 +1,108 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+# -----------------------------------------------------------------------------
+# Backtest result encodings
+# -----------------------------------------------------------------------------
+# /backtest can return its per-bar frame as
+#   records  [{column: value, ...}, ...] (the original format, NaN as 0)
+#   columns  {"columns": [...], "rows": n, "data": {column: [values]}}
+#   ndjson   a header object line, then one JSON array per row, streamed in
+#            chunks so memory and time to first byte stay flat with range
+#   arrow    an Arrow IPC stream (needs pyarrow); the header goes into the
+#            schema metadata under "backtest"
+# Outside records, NaN becomes null and dates are ISO 8601 strings.
+
+FORMATS = ("records", "columns", "ndjson", "arrow")
+NDJSON_MIME = "application/x-ndjson"
+ARROW_MIME = "application/vnd.apache.arrow.stream"
+STREAM_CHUNK_ROWS = 2000
+
+
+def arrow_available():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def result_frame(df, columns=None):
+    """
+    The frame to send: the index as a column unless it is a plain row
+    number, then only the requested columns (in that order).
+    """
+    df = df.reset_index(drop=isinstance(df.index, pd.RangeIndex))
+    if columns:
+        unknown = [column for column in columns if column not in df.columns]
+        if unknown:
+            raise ValueError(f"Unknown columns {unknown}; results have {list(df.columns)}")
+        df = df[list(columns)]
+    return df
+
+
+def rounded(df, decimals=None):
+    """
+    df with its float columns rounded to decimals (None leaves it as is).
+    """
+    if decimals is None:
+        return df
+    floats = df.select_dtypes("float").columns
+    return df.round({column: decimals for column in floats})
+
+
+def _values(series, decimals=None):
+    """
+    JSON-ready list of one column.
+    """
+    if isinstance(series.dtype, pd.DatetimeTZDtype) or series.dtype.kind == "M":
+        return [None if value is pd.NaT else value.isoformat() for value in series]
+    if series.dtype.kind == "f":
+        values = series.to_numpy()
+        if decimals is not None:
+            values = values.round(decimals)
+        finite = np.isfinite(values)
+        values = values.tolist()
+        if not finite.all():
+            values = [value if ok else None for value, ok in zip(values, finite.tolist())]
+        return values
+    if series.dtype.kind in "iub":
+        return series.to_numpy().tolist()
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def columnar(df, decimals=None):
+    return {
+        "columns": [str(column) for column in df.columns],
+        "rows": len(df),
+        "data": {str(column): _values(df[column], decimals) for column in df.columns},
+    }
+
+
+def ndjson_lines(df, decimals=None, head=None, chunk_rows=STREAM_CHUNK_ROWS):
+    """
+    Yield the header line, then the rows in chunks of chunk_rows lines.
+    """
+    header = dict(head or {}, columns=[str(column) for column in df.columns], rows=len(df))
+    yield json.dumps(header) + "\n"
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        columns = [_values(chunk[column], decimals) for column in chunk.columns]
+        yield "".join(json.dumps(row) + "\n" for row in zip(*columns))
+
+
+def arrow_ipc(df, head=None, decimals=None):
+    """
+    Arrow IPC stream bytes of df, with head as JSON schema metadata.
+    """
+    import pyarrow as pa
+
+    df = rounded(df, decimals)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata(dict(table.schema.metadata or {}, backtest=json.dumps(head or {})))
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,339 @@
+import json
+import os
+import struct
+import threading
+from collections import Counter
+from datetime import date, timedelta
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+import market_data
+from market_data import _safe_name, _to_date
+
+# -----------------------------------------------------------------------------
+# Shared-memory bar frames
+# -----------------------------------------------------------------------------
+# The web process publishes the bars of every watched (symbol, interval) into
+# a POSIX shared memory segment; strategy worker processes map the segment
+# and build DataFrames over it without copying or unpickling anything.
+#
+# Segment layout (little endian):
+#   0     magic "BARS", layout u16, state u16, version u64, rows u64,
+#         capacity u64, meta length u64
+#   64    meta JSON: columns, tz, index_name, start, end (dates covered)
+#   1024  index int64[capacity] (UTC ns), then float64[capacity] per column
+#
+# Published rows are never modified. New bars are written after the last row
+# and become visible when rows and version are bumped (version is odd while
+# a write is in progress). Anything else - a revised forming bar, a longer
+# history, a full segment - builds a new segment under the same name and
+# flags the old one SUPERSEDED, so readers holding views of it keep a
+# consistent frame and reattach on their next read.
+
+PREFIX_ENV = "SHARED_BARS_PREFIX"
+MAGIC = b"BARS"
+LAYOUT = 1
+HEADER = struct.Struct("<4sHHQQQQ")
+META_OFFSET = 64
+DATA_OFFSET = 1024
+LIVE, SUPERSEDED, CLOSED = 0, 1, 2
+
+
+def segment_name(prefix, symbol, interval):
+    return f"{prefix}_{_safe_name(interval)}_{_safe_name(symbol)}"
+
+
+class _Mapping(shared_memory.SharedMemory):
+    """
+    A reader's mapping. Never closed explicitly: numpy arrays keep a
+    reference to the buffer without pinning it, so close() would unmap memory
+    under live frames. The mapping goes away with the last array using it.
+    """
+
+    def __del__(self):
+        pass
+
+
+def _attach(name):
+    """
+    Map an existing segment without registering it with this process's
+    resource tracker, which would unlink it when the reader exits.
+    """
+    try:
+        return _Mapping(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        pass
+    shm = _Mapping(name=name)
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+    return shm
+
+
+def _stamps(df):
+    index = df.index
+    return (index.tz_convert("UTC") if index.tz is not None else index).as_unit("ns").asi8
+
+
+class Segment:
+    """
+    Writer side of one (symbol, interval) segment.
+    """
+
+    def __init__(self, name, columns, tz, index_name, capacity):
+        self.name = name
+        self.columns = list(columns)
+        self.capacity = capacity
+        self.meta = {"columns": self.columns, "tz": tz, "index_name": index_name}
+        size = DATA_OFFSET + 8 * capacity * (1 + len(self.columns))
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left over from a crashed process with the same pid
+            stale = _attach(name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.version = 0
+        self.rows = 0
+        self.index = self._array(0, "<i8")
+        self.values = [self._array(i + 1, "<f8") for i in range(len(self.columns))]
+
+    def _array(self, slot, dtype):
+        return np.ndarray((self.capacity,), dtype=dtype, buffer=self.shm.buf, offset=DATA_OFFSET + 8 * self.capacity * slot)
+
+    def _write_header(self, state=LIVE):
+        meta = json.dumps(self.meta).encode()
+        if len(meta) > DATA_OFFSET - META_OFFSET:
+            raise ValueError(f"Too many columns to publish {self.name}")
+        self.shm.buf[META_OFFSET:META_OFFSET + len(meta)] = meta
+        HEADER.pack_into(self.shm.buf, 0, MAGIC, LAYOUT, state, self.version, self.rows, self.capacity, len(meta))
+
+    def append(self, stamps, df, start, end):
+        """
+        Write rows after the published ones and bump the version.
+        """
+        n = len(stamps)
+        self.version += 1  # Odd: readers retry
+        self._write_header()
+        self.index[self.rows:self.rows + n] = stamps
+        for column, values in zip(self.columns, self.values):
+            values[self.rows:self.rows + n] = df[column].to_numpy(dtype="<f8", na_value=np.nan)
+        self.rows += n
+        self.meta["start"], self.meta["end"] = str(start), str(end)
+        self.version += 1
+        self._write_header()
+
+    def retire(self, state):
+        self.version += 1
+        self._write_header(state)
+        del self.index, self.values
+        self.shm.close()
+
+
+class SharedBarPublisher:
+    """
+    Keeps watched series published in shared memory (web process side).
+    """
+
+    def __init__(self, prefix=None):
+        self.prefix = prefix or f"bars{os.getpid()}"
+        os.environ[PREFIX_ENV] = self.prefix  # Inherited by strategy workers
+        self._lock = threading.Lock()
+        self._segments = {}
+        self._watchers = Counter()
+        self.stats = {"appends": 0, "rebuilds": 0, "unchanged": 0}
+
+    def watch(self, symbol, interval=market_data.DEFAULT_INTERVAL):
+        with self._lock:
+            self._watchers[(symbol, interval)] += 1
+
+    def unwatch(self, symbol, interval=market_data.DEFAULT_INTERVAL):
+        """
+        Drop one watcher; the segment is removed with the last one.
+        """
+        key = (symbol, interval)
+        with self._lock:
+            self._watchers[key] -= 1
+            if self._watchers[key] > 0:
+                return
+            del self._watchers[key]
+            segment = self._segments.pop(key, None)
+            if segment is not None:
+                segment.retire(CLOSED)
+                segment.shm.unlink()
+
+    def refresh(self, symbol, interval, lookback_days):
+        """
+        Bring the segment up to date with the bar cache (bars of the last
+        lookback_days through today).
+        """
+        start = date.today() - timedelta(days=lookback_days)
+        end = date.today() + timedelta(days=1)
+        df = market_data.get_history(symbol, start, end, interval)
+        if df is not None and not df.empty:
+            self.publish(symbol, interval, df, start, end)
+
+    def publish(self, symbol, interval, df, start, end):
+        key = (symbol, interval)
+        stamps = _stamps(df)
+        with self._lock:
+            if key not in self._watchers:
+                return
+            segment = self._segments.get(key)
+            if segment is None or not self._appendable(segment, df, stamps, start):
+                self._rebuild(key, symbol, interval, df, stamps, start, end)
+                return
+            last = segment.index[segment.rows - 1]
+            new = stamps > last
+            if not new.any():
+                if str(end) != segment.meta.get("end"):
+                    segment.append(stamps[:0], df.iloc[:0], segment.meta["start"], end)
+                self.stats["unchanged"] += 1
+                return
+            if segment.rows + int(new.sum()) > segment.capacity:
+                self._rebuild(key, symbol, interval, df, stamps, start, end)
+                return
+            segment.append(stamps[new], df[new], segment.meta["start"], end)
+            self.stats["appends"] += 1
+
+    def _appendable(self, segment, df, stamps, start):
+        """
+        True when df only adds bars: same columns, no earlier start, and the
+        last published bar is unchanged.
+        """
+        if list(df.columns) != segment.columns or start < _to_date(segment.meta["start"]):
+            return False
+        if segment.rows == 0:
+            return True
+        last = segment.index[segment.rows - 1]
+        position = int(np.searchsorted(stamps, last))
+        if position >= len(stamps) or stamps[position] != last:
+            return stamps[0] > last if len(stamps) else True
+        published = np.array([values[segment.rows - 1] for values in segment.values])
+        current = df.iloc[position].to_numpy(dtype="<f8", na_value=np.nan)
+        return np.array_equal(published, current, equal_nan=True)
+
+    def _rebuild(self, key, symbol, interval, df, stamps, start, end):
+        old = self._segments.pop(key, None)
+        if old is not None:
+            old.retire(SUPERSEDED)
+            old.shm.unlink()
+        capacity = max(2 * len(stamps), 256)
+        segment = Segment(segment_name(self.prefix, symbol, interval), df.columns, str(df.index.tz) if df.index.tz else None,
+                          df.index.name or "Date", capacity)
+        segment.append(stamps, df, start, end)
+        self._segments[key] = segment
+        self.stats["rebuilds"] += 1
+
+    def close(self):
+        with self._lock:
+            for segment in self._segments.values():
+                segment.retire(CLOSED)
+                segment.shm.unlink()
+            self._segments.clear()
+            self._watchers.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, segments=len(self._segments),
+                        bytes=sum(segment.shm.size for segment in self._segments.values()))
+
+
+class SharedBarReader:
+    """
+    Maps published segments as read-only DataFrames (worker side).
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._frames = {}  # (symbol, interval) -> (shm, version, frame)
+        self.stats = {"hits": 0, "misses": 0, "attaches": 0}
+
+    def _header(self, shm):
+        for _ in range(1000):
+            magic, layout, state, version, rows, capacity, meta_length = HEADER.unpack_from(shm.buf, 0)
+            if magic != MAGIC or layout != LAYOUT:
+                return None
+            if version % 2:
+                continue
+            meta = json.loads(bytes(shm.buf[META_OFFSET:META_OFFSET + meta_length]))
+            if HEADER.unpack_from(shm.buf, 0)[3] == version:
+                return state, version, rows, capacity, meta
+        return None
+
+    def _frame(self, symbol, interval):
+        key = (symbol, interval)
+        cached = self._frames.get(key)
+        shm = cached[0] if cached else None
+        header = self._header(shm) if shm is not None else None
+        if header is None or header[0] != LIVE:
+            # Not attached yet, or the publisher moved on to a new segment
+            self._frames.pop(key, None)
+            try:
+                shm = _attach(segment_name(self.prefix, symbol, interval))
+            except FileNotFoundError:
+                return None
+            self.stats["attaches"] += 1
+            header = self._header(shm)
+            if header is None or header[0] != LIVE:
+                return None
+            cached = None
+
+        state, version, rows, capacity, meta = header
+        if cached is not None and cached[1] == version:
+            return cached[2]
+
+        stamps = np.ndarray((rows,), dtype="<i8", buffer=shm.buf, offset=DATA_OFFSET)
+        # All value columns as one (columns, rows) strided view: pandas keeps
+        # it as a single block instead of consolidating into a copy
+        values = np.ndarray((len(meta["columns"]), rows), dtype="<f8", buffer=shm.buf,
+                            offset=DATA_OFFSET + 8 * capacity, strides=(8 * capacity, 8))
+        stamps.flags.writeable = False
+        values.flags.writeable = False
+
+        index = pd.DatetimeIndex(stamps.view("datetime64[ns]"), name=meta["index_name"])
+        if meta["tz"]:
+            index = index.tz_localize("UTC").tz_convert(meta["tz"])
+        frame = pd.DataFrame(values.T, index=index, columns=meta["columns"], copy=False)
+        frame.attrs["shared_bars"] = {"start": meta["start"], "end": meta["end"]}
+        self._frames[key] = (shm, version, frame)
+        return frame
+
+    def read(self, symbol, interval, start, end):
+        """
+        Bars for [start, end) if the published segment covers that range,
+        otherwise None (the caller falls back to the bar store).
+        """
+        with self._lock:
+            frame = self._frame(symbol, interval)
+        if frame is None:
+            self.stats["misses"] += 1
+            return None
+        covered = frame.attrs["shared_bars"]
+        end = end if end is not None else date.today() + timedelta(days=1)
+        if _to_date(start) < _to_date(covered["start"]) or _to_date(end) > _to_date(covered["end"]):
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        tz = frame.index.tz
+        lo = frame.index.searchsorted(pd.Timestamp(_to_date(start), tz=tz))
+        hi = frame.index.searchsorted(pd.Timestamp(_to_date(end), tz=tz))
+        # Copy-on-write: callers may add or assign columns without touching shared memory
+        return frame.iloc[lo:hi].copy(deep=False)
+
+
+def attach_reader():
+    """
+    In a strategy worker, serve market_data.get_history from the segments
+    published by the parent process.
+    """
+    prefix = os.getenv(PREFIX_ENV)
+    if prefix:
+        market_data.shared_source = SharedBarReader(prefix)
+    return market_data.shared_source
@@ -1,6 +1,6 @@
 "use client";
 import { supabase } from "@/lib/supabaseClient";
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 
 type Bot = {
 	id: number;
@@ -15,6 +15,10 @@ export default function BotsPage() {
 	const [activeBotIds, setActiveBotIds] = useState<number[]>([]);
 	const [logs, setLogs] = useState<{ [key: number]: string[] }>({});
 	const [orders, setOrders] = useState<any[]>([]);
+	// Last event sequence number seen per bot, so a reopened stream only sends what is new
+	const lastSeq = useRef<{ [key: number]: number }>({});
+	// Bumped to reopen the stream after a gap or a dropped subscription
+	const [streamEpoch, setStreamEpoch] = useState(0);
 
 	useEffect(() => {
 		async function fetchBots() {
@@ -103,19 +107,57 @@ export default function BotsPage() {
 		return () => clearInterval(interval);
 	}, []);
 
-	// Fetch logs every 5 seconds
+	// Logs, signal changes and orders of the active bots, pushed by the server
 	useEffect(() => {
-		const fetchLogs = async () => {
-			for (const botId of activeBotIds) {
-				const res = await fetch(`/api/bot-logs?bot_id=${botId}`);
-				const data = await res.json();
-				setLogs((prev) => ({ ...prev, [botId]: data.logs || [] }));
+		if (activeBotIds.length === 0) {
+			return;
+		}
+		const params = new URLSearchParams({ bot_id: activeBotIds.join(",") });
+		// Resume where the bots were; a bot not streamed yet needs its recent
+		// history, so then open without since like the first time
+		const seen = activeBotIds.map((id) => lastSeq.current[id]);
+		if (seen.every((seq) => seq !== undefined)) {
+			params.set("since", String(Math.min(...seen)));
+		}
+		// EventSource reconnects by itself and resumes from the last event id
+		const source = new EventSource(`/api/bot-events?${params}`);
+		const onEvent = (event: MessageEvent) => {
+			const entry = JSON.parse(event.data);
+			if (entry.seq <= (lastSeq.current[entry.bot_id] ?? 0)) {
+				return; // Already shown
 			}
+			lastSeq.current[entry.bot_id] = entry.seq;
+			const time = new Date(entry.time * 1000).toLocaleString();
+			setLogs((prev) => ({
+				...prev,
+				[entry.bot_id]: [`[${time}] ${entry.message}`, ...(prev[entry.bot_id] || [])].slice(0, 200),
+			}));
 		};
-
-		const interval = setInterval(fetchLogs, 100);
-		return () => clearInterval(interval);
-	}, [activeBotIds]);
+		for (const type of ["log", "signal", "order"]) {
+			source.addEventListener(type, onEvent);
+		}
+		// Entries after since are gone: clear the view and reload the recent history
+		source.addEventListener("gap", () => {
+			source.close();
+			for (const id of activeBotIds) {
+				delete lastSeq.current[id];
+			}
+			setLogs((prev) => {
+				const cleared = { ...prev };
+				for (const id of activeBotIds) {
+					cleared[id] = [];
+				}
+				return cleared;
+			});
+			setStreamEpoch((epoch) => epoch + 1);
+		});
+		// The server dropped us for falling behind: reopen now and replay what was missed
+		source.addEventListener("dropped", () => {
+			source.close();
+			setStreamEpoch((epoch) => epoch + 1);
+		});
+		return () => source.close();
+	}, [activeBotIds, streamEpoch]);
 
 	return (
 		<div className="min-h-screen text-gray-100 bg-gray-900 p-6 mt-[-35px]">
@@ -2,15 +2,19 @@ import { NextResponse } from "next/server";
 
 export async function POST(req: Request) {
   try {
-    const { strategy_id, stock_symbol, start_date, end_date } = await req.json();
+    // Pass the whole request on (format, columns, round, rows, settings, ...)
+    const body = await req.json();
 
     const res = await fetch("https://algotrading-saas.onrender.com/backtest", {
       method: "POST",
       headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ strategy_id, stock_symbol, start_date, end_date }),
+      body: JSON.stringify(body),
+    });
+    // Stream the response through as is so NDJSON / Arrow results are not buffered
+    return new Response(res.body, {
+      status: res.status,
+      headers: { "Content-Type": res.headers.get("Content-Type") ?? "application/json" },
     });
-    const data = await res.json();
-    return NextResponse.json(data);
   } catch (error) {
     return NextResponse.json({ success: false, error: `Failed to backtest::${error}` }, { status: 500 });
   }
@@ -0,0 +1,42 @@
+import { NextRequest, NextResponse } from "next/server";
+
+export const dynamic = "force-dynamic";
+
+// Relays the Flask /events stream (server-sent events) without buffering
+export async function GET(req: NextRequest) {
+  const { searchParams } = new URL(req.url);
+  const botId = searchParams.get("bot_id");
+  if (!botId) {
+    return NextResponse.json({ error: "Missing bot_id" }, { status: 400 });
+  }
+
+  const params = new URLSearchParams({ bot_id: botId });
+  const since = searchParams.get("since");
+  if (since) {
+    params.set("since", since);
+  }
+  const headers: Record<string, string> = {};
+  const lastEventId = req.headers.get("Last-Event-ID");
+  if (lastEventId) {
+    headers["Last-Event-ID"] = lastEventId;
+  }
+
+  try {
+    const res = await fetch(`https://algotrading-saas.onrender.com/events?${params}`, {
+      headers,
+      signal: req.signal,
+    });
+    if (!res.ok || !res.body) {
+      return NextResponse.json({ error: "Failed to open event stream" }, { status: res.status || 502 });
+    }
+    return new Response(res.body, {
+      headers: {
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache, no-transform",
+        Connection: "keep-alive",
+      },
+    });
+  } catch (error) {
+    return NextResponse.json({ error: "Internal Server Error" }, { status: 500 });
+  }
+}
@@ -8,7 +8,12 @@ export async function GET(req: NextRequest) {
   }
 
   try {
-    const res = await fetch(`https://algotrading-saas.onrender.com/logs`);
+    const params = new URLSearchParams({ bot_id: botId });
+    const since = searchParams.get("since");
+    if (since) {
+      params.set("since", since);
+    }
+    const res = await fetch(`https://algotrading-saas.onrender.com/logs?${params}`);
 
     if (!res.ok) {
       return NextResponse.json({ error: "Failed to fetch logs" }, { status: res.status });
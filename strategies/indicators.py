@@ -0,0 +1,252 @@
+import math
+from collections import deque
+
+import numpy as np
+
+# -----------------------------------------------------------------------------
+# Streaming indicators
+# -----------------------------------------------------------------------------
+# Stateful versions of the indicators used in strategies/, updated in O(1) per
+# bar. Each one matches the pandas expression it replaces (noted in the class
+# docstring), including the NaN warm-up. Call seed(history) once with past
+# values, then update(...) for every new bar.
+
+NAN = float("nan")
+
+
+def _is_nan(value):
+    return value != value
+
+
+class Indicator:
+    value = NAN
+
+    def update(self, *values):
+        raise NotImplementedError
+
+    def seed(self, *columns):
+        """
+        Feed a history through update() and return the outputs as an array.
+        """
+        columns = [np.asarray(column, dtype=float).tolist() for column in columns]
+        return np.array([self.update(*row) for row in zip(*columns)], dtype=float)
+
+
+class SMA(Indicator):
+    """series.rolling(period).mean() via a running sum."""
+
+    def __init__(self, period, min_periods=None):
+        self.period = period
+        self.min_periods = period if min_periods is None else min_periods
+        self.window = deque()
+        self.total = 0.0
+        self.count = 0  # Non-NaN values in the window
+        self.updates = 0
+
+    def update(self, x):
+        self.window.append(x)
+        if not _is_nan(x):
+            self.total += x
+            self.count += 1
+        if len(self.window) > self.period:
+            old = self.window.popleft()
+            if not _is_nan(old):
+                self.total -= old
+                self.count -= 1
+        self.updates += 1
+        if self.updates % (64 * self.period) == 0:
+            # Re-sum now and then so floating point error cannot accumulate
+            self.total = math.fsum(v for v in self.window if not _is_nan(v))
+        self.value = self.total / self.count if self.count >= max(self.min_periods, 1) else NAN
+        return self.value
+
+
+class EMA(Indicator):
+    """series.ewm(span=..., alpha=..., adjust=...).mean() with ignore_na=False."""
+
+    def __init__(self, span=None, alpha=None, adjust=True):
+        if alpha is None:
+            alpha = 2.0 / (span + 1.0)
+        self.alpha = alpha
+        self.adjust = adjust
+        self.weighted = NAN
+        self.old_weight = 1.0
+        self.started = False
+
+    def update(self, x):
+        if not self.started:
+            self.started = True
+            self.weighted = x
+            self.value = x
+            return x
+
+        new_weight = 1.0 if self.adjust else self.alpha
+        is_observation = not _is_nan(x)
+        if not _is_nan(self.weighted):
+            self.old_weight *= 1.0 - self.alpha
+            if is_observation:
+                if self.weighted != x:
+                    self.weighted = (self.old_weight * self.weighted + new_weight * x) / (self.old_weight + new_weight)
+                if self.adjust:
+                    self.old_weight += new_weight
+                else:
+                    self.old_weight = 1.0
+        elif is_observation:
+            self.weighted = x
+        self.value = self.weighted
+        return self.value
+
+
+class Wilder(EMA):
+    """Wilder smoothing: series.ewm(alpha=1/period, adjust=False).mean()."""
+
+    def __init__(self, period):
+        super().__init__(alpha=1.0 / period, adjust=False)
+
+
+class RSI(Indicator):
+    """
+    calculate_rsi in strategies/rsi.py: rolling means of gains and losses.
+    Pass smoothing="wilder" for the classic Wilder RSI instead.
+    """
+
+    def __init__(self, period=14, smoothing="sma"):
+        if smoothing == "wilder":
+            self.gain, self.loss = Wilder(period), Wilder(period)
+        else:
+            self.gain, self.loss = SMA(period), SMA(period)
+        self.previous = NAN
+
+    def update(self, close):
+        delta = close - self.previous
+        self.previous = close
+        # delta.where(delta > 0, 0): a NaN delta becomes 0 like in pandas
+        gain = self.gain.update(delta if delta > 0 else 0.0)
+        loss = self.loss.update(-delta if delta < 0 else 0.0)
+        if _is_nan(gain) or _is_nan(loss) or (gain == 0 and loss == 0):
+            self.value = NAN
+        elif loss == 0:
+            self.value = 100.0
+        else:
+            self.value = 100.0 - 100.0 / (1.0 + gain / loss)
+        return self.value
+
+
+class TrueRange(Indicator):
+    """max(high - low, |high - prev close|, |low - prev close|), NaN-skipping."""
+
+    def __init__(self):
+        self.previous_close = NAN
+
+    def update(self, high, low, close):
+        candidates = [high - low, abs(high - self.previous_close), abs(low - self.previous_close)]
+        candidates = [value for value in candidates if not _is_nan(value)]
+        self.previous_close = close
+        self.value = max(candidates) if candidates else NAN
+        return self.value
+
+
+class ATR(Indicator):
+    """
+    Average true range.
+    smoothing="ewm": tr.ewm(alpha=1/period).mean()                      (keltner_channel.py)
+    smoothing="sma": tr.rolling(window=period, min_periods=1).mean()    (super_trend.py)
+    """
+
+    def __init__(self, period=14, smoothing="ewm"):
+        self.true_range = TrueRange()
+        if smoothing == "sma":
+            self.average = SMA(period, min_periods=1)
+        else:
+            self.average = EMA(alpha=1.0 / period)
+
+    def update(self, high, low, close):
+        self.value = self.average.update(self.true_range.update(high, low, close))
+        return self.value
+
+
+class _RollingExtreme(Indicator):
+    """Rolling min/max over a monotonic deque of (index, value)."""
+
+    def __init__(self, period):
+        self.period = period
+        self.candidates = deque()
+        self.nans = deque()
+        self.index = 0
+
+    def _better(self, a, b):
+        raise NotImplementedError
+
+    def update(self, x):
+        i = self.index
+        self.index += 1
+        if _is_nan(x):
+            self.nans.append(i)
+        else:
+            while self.candidates and not self._better(self.candidates[-1][1], x):
+                self.candidates.pop()
+            self.candidates.append((i, x))
+        start = i - self.period + 1
+        while self.candidates and self.candidates[0][0] < start:
+            self.candidates.popleft()
+        while self.nans and self.nans[0] < start:
+            self.nans.popleft()
+        if start < 0 or self.nans or not self.candidates:
+            self.value = NAN
+        else:
+            self.value = self.candidates[0][1]
+        return self.value
+
+
+class RollingMin(_RollingExtreme):
+    """series.rolling(period).min()"""
+
+    def _better(self, a, b):
+        return a < b
+
+
+class RollingMax(_RollingExtreme):
+    """series.rolling(period).max()"""
+
+    def _better(self, a, b):
+        return a > b
+
+
+class ROC(Indicator):
+    """series.pct_change(n) * 100"""
+
+    def __init__(self, n):
+        self.n = n
+        self.window = deque(maxlen=n + 1)
+
+    def update(self, x):
+        self.window.append(x)
+        if len(self.window) <= self.n:
+            self.value = NAN
+        else:
+            base = self.window[0]
+            if base == 0:
+                self.value = NAN if x == 0 or _is_nan(x) else math.copysign(math.inf, x)
+            else:
+                self.value = (x / base - 1.0) * 100
+        return self.value
+
+
+class MACD(Indicator):
+    """
+    calculate_macd in strategies/stochastic_oscilator.py (adjust=False EMAs).
+    value is the MACD line; signal and histogram are kept alongside.
+    """
+
+    def __init__(self, fast=12, slow=26, smooth=9):
+        self.fast = EMA(span=fast, adjust=False)
+        self.slow = EMA(span=slow, adjust=False)
+        self.signal_line = EMA(span=smooth, adjust=False)
+        self.signal = NAN
+        self.histogram = NAN
+
+    def update(self, close):
+        self.value = self.fast.update(close) - self.slow.update(close)
+        self.signal = self.signal_line.update(self.value)
+        self.histogram = self.value - self.signal
+        return self.value
@@ -1,6 +1,8 @@
+import numpy as np
 import pandas as pd
 import yfinance as yf
 from datetime import datetime, timedelta
+from signal_engine import signal_from_conditions
 
 # -----------------------------------------------------------------------------
 # Function to fetch real historical stock data from Yahoo Finance
@@ -31,21 +33,25 @@ def calculate_keltner_channels(df, kc_lookback=20, multiplier=2, atr_lookback=10
     """
     Compute Keltner Channels (upper, middle, and lower bands).
     """
-    tr1 = df['High'] - df['Low']
-    tr2 = abs(df['High'] - df['Close'].shift(1))
-    tr3 = abs(df['Low'] - df['Close'].shift(1))
-    tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
+    df['KC_Middle'], df['KC_Upper'], df['KC_Lower'] = keltner_bands(
+        df['High'], df['Low'], df['Close'], kc_lookback, multiplier, atr_lookback)
+    return df
+
+def keltner_bands(high, low, close, kc_lookback=20, multiplier=2, atr_lookback=10):
+    """
+    (middle, upper, lower) bands of Series, or of (dates x symbols) frames.
+    """
+    tr1 = high - low
+    tr2 = abs(high - close.shift(1))
+    tr3 = abs(low - close.shift(1))
+    tr = np.fmax(np.fmax(tr1, tr2), tr3)  # Row max that skips NaN, per column
     
     atr = tr.ewm(alpha=1/atr_lookback).mean()
-    kc_middle = df['Close'].ewm(span=kc_lookback).mean()
+    kc_middle = close.ewm(span=kc_lookback).mean()
     kc_upper = kc_middle + (multiplier * atr)
     kc_lower = kc_middle - (multiplier * atr)
     
-    df['KC_Middle'] = kc_middle
-    df['KC_Upper'] = kc_upper
-    df['KC_Lower'] = kc_lower
-    
-    return df
+    return kc_middle, kc_upper, kc_lower
 
 # -----------------------------------------------------------------------------
 # Function to implement the Keltner Channel strategy
@@ -56,19 +62,26 @@ def implement_kc_strategy(df):
     - Buy when price crosses above lower band
     - Sell when price crosses below upper band
     """
-    df['Signal'] = 0
-    for i in range(1, len(df)):
-        if df['Close'].iloc[i - 1] < df['KC_Lower'].iloc[i - 1] and df['Close'].iloc[i] > df['Close'].iloc[i - 1]:
-            df.at[df.index[i], 'Signal'] = 1  # Buy signal
-        elif df['Close'].iloc[i - 1] > df['KC_Upper'].iloc[i - 1] and df['Close'].iloc[i] < df['Close'].iloc[i - 1]:
-            df.at[df.index[i], 'Signal'] = -1  # Sell signal
-
+    df['Signal'] = kc_signal(df['Close'], df['KC_Lower'], df['KC_Upper'])
     return df
 
+def kc_signal(close, kc_lower, kc_upper):
+    """
+    Signal array of the rules above; 2-D for (dates x symbols) frames.
+    """
+    prev_close = close.shift(1).to_numpy()
+    prev_lower = kc_lower.shift(1).to_numpy()
+    prev_upper = kc_upper.shift(1).to_numpy()
+    close = close.to_numpy()
+
+    buy = (prev_close < prev_lower) & (close > prev_close)  # Buy signal
+    sell = (prev_close > prev_upper) & (close < prev_close)  # Sell signal
+    return signal_from_conditions(buy, sell)
+
 # -----------------------------------------------------------------------------
 # Backtesting Function
 # -----------------------------------------------------------------------------
-def backtest_strategy(stock_symbol, start_date, end_date):
+def backtest_strategy(stock_symbol, start_date, end_date, kc_lookback=20, multiplier=2, atr_lookback=10):
     """
     Perform backtesting using the Keltner Channel strategy.
     """
@@ -77,7 +90,7 @@ def backtest_strategy(stock_symbol, start_date, end_date):
         return None  # Return None if data couldn't be fetched
     print("Data fetched successfully", df.tail(1))
 
-    df = calculate_keltner_channels(df)
+    df = calculate_keltner_channels(df, kc_lookback=kc_lookback, multiplier=multiplier, atr_lookback=atr_lookback)
     print("Keltner Channels calculated successfully")
     
     df = implement_kc_strategy(df)
@@ -85,6 +98,17 @@ def backtest_strategy(stock_symbol, start_date, end_date):
     df = df.reset_index()
     return df[['Signal', 'Close', 'KC_Lower', 'KC_Upper', 'Date']]
 
+# -----------------------------------------------------------------------------
+# Universe backtest (all symbols of a (dates x symbols) panel at once)
+# -----------------------------------------------------------------------------
+def backtest_universe(panel, kc_lookback=20, multiplier=2, atr_lookback=10):
+    """
+    Signal of backtest_strategy for every column of panel['Close'].
+    """
+    close = panel['Close']
+    _, kc_upper, kc_lower = keltner_bands(panel['High'], panel['Low'], close, kc_lookback, multiplier, atr_lookback)
+    return pd.DataFrame(kc_signal(close, kc_lower, kc_upper), index=close.index, columns=close.columns)
+
 # -----------------------------------------------------------------------------
 # Example execution (for debugging/testing)
 # -----------------------------------------------------------------------------
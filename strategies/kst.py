@@ -1,6 +1,7 @@
 import pandas as pd
 import yfinance as yf
 from datetime import datetime, timedelta
+from signal_engine import signal_from_conditions
 
 # -----------------------------------------------------------------------------
 # Function to fetch real historical stock data from Yahoo Finance
@@ -46,14 +47,19 @@ def calculate_kst(df, sma1, sma2, sma3, sma4, roc1, roc2, roc3, roc4, signal):
     df = calculate_roc(df, roc3)
     df = calculate_roc(df, roc4)
 
-    df['KST'] = (df[f'ROC_{roc1}'].rolling(sma1).mean() * 1 +
-                 df[f'ROC_{roc2}'].rolling(sma2).mean() * 2 +
-                 df[f'ROC_{roc3}'].rolling(sma3).mean() * 3 +
-                 df[f'ROC_{roc4}'].rolling(sma4).mean() * 4)
-    
+    df['KST'] = kst_line(df[f'ROC_{roc1}'], df[f'ROC_{roc2}'], df[f'ROC_{roc3}'], df[f'ROC_{roc4}'], sma1, sma2, sma3, sma4)
     df['Signal_Line'] = df['KST'].rolling(signal).mean()
     return df
 
+def kst_line(r1, r2, r3, r4, sma1, sma2, sma3, sma4):
+    """
+    Weighted sum of smoothed ROCs; Series or (dates x symbols) frames.
+    """
+    return (r1.rolling(sma1).mean() * 1 +
+            r2.rolling(sma2).mean() * 2 +
+            r3.rolling(sma3).mean() * 3 +
+            r4.rolling(sma4).mean() * 4)
+
 # -----------------------------------------------------------------------------
 # Function to Implement KST Crossover Trading Strategy
 # -----------------------------------------------------------------------------
@@ -61,20 +67,22 @@ def implement_kst_strategy(df):
     """
     Generate buy and sell signals based on KST and signal line crossovers.
     """
-    df['Signal'] = 0
-    
-    # Buy when KST crosses above the signal line
-    df.loc[(df['KST'].shift(1) < df['Signal_Line'].shift(1)) & (df['KST'] > df['Signal_Line']), 'Signal'] = 1
-    
-    # Sell when KST crosses below the signal line
-    df.loc[(df['KST'].shift(1) > df['Signal_Line'].shift(1)) & (df['KST'] < df['Signal_Line']), 'Signal'] = -1
-    
+    df['Signal'] = kst_signal(df['KST'], df['Signal_Line'])
     return df
 
+def kst_signal(kst, signal_line):
+    """
+    Signal array of the crossovers; 2-D for (dates x symbols) frames.
+    """
+    buy = ((kst.shift(1) < signal_line.shift(1)) & (kst > signal_line)).to_numpy()  # Crosses above
+    sell = ((kst.shift(1) > signal_line.shift(1)) & (kst < signal_line)).to_numpy()  # Crosses below
+    return signal_from_conditions(buy, sell)
+
 # -----------------------------------------------------------------------------
 # Backtesting Function
 # -----------------------------------------------------------------------------
-def backtest_strategy(stock_symbol, start_date, end_date):
+def backtest_strategy(stock_symbol, start_date, end_date, sma1=10, sma2=10, sma3=10, sma4=15,
+                      roc1=10, roc2=15, roc3=20, roc4=30, signal=9):
     """
     Perform backtesting using the KST-based strategy.
     """
@@ -87,7 +95,7 @@ def backtest_strategy(stock_symbol, start_date, end_date):
     df = df.reset_index()
 
     # Calculate KST indicator
-    df = calculate_kst(df, sma1=10, sma2=10, sma3=10, sma4=15, roc1=10, roc2=15, roc3=20, roc4=30, signal=9)
+    df = calculate_kst(df, sma1=sma1, sma2=sma2, sma3=sma3, sma4=sma4, roc1=roc1, roc2=roc2, roc3=roc3, roc4=roc4, signal=signal)
     print("KST indicator calculated successfully")
 
     # Generate buy/sell signals
@@ -96,6 +104,19 @@ def backtest_strategy(stock_symbol, start_date, end_date):
 
     return df[['Date', 'Close', 'KST', 'Signal_Line', 'Signal']]
 
+# -----------------------------------------------------------------------------
+# Universe backtest (all symbols of a (dates x symbols) panel at once)
+# -----------------------------------------------------------------------------
+def backtest_universe(panel, sma1=10, sma2=10, sma3=10, sma4=15, roc1=10, roc2=15, roc3=20, roc4=30, signal=9):
+    """
+    Signal of backtest_strategy for every column of panel['Close'].
+    """
+    close = panel['Close']
+    rocs = [close.pct_change(n) * 100 for n in (roc1, roc2, roc3, roc4)]
+    kst = kst_line(*rocs, sma1, sma2, sma3, sma4)
+    signal_line = kst.rolling(signal).mean()
+    return pd.DataFrame(kst_signal(kst, signal_line), index=close.index, columns=close.columns)
+
 # -----------------------------------------------------------------------------
 # Example execution (for debugging/testing)
 # -----------------------------------------------------------------------------
@@ -1,6 +1,8 @@
 import pandas as pd
 import yfinance as yf
 from datetime import datetime, timedelta
+from indicators import RSI
+from signal_engine import signal_from_conditions
 
 # -----------------------------------------------------------------------------
 # Function to fetch real historical stock data from Yahoo Finance
@@ -31,13 +33,28 @@ def calculate_rsi(df, period=14):
     """
     Compute the Relative Strength Index (RSI) based on the given period.
     """
-    delta = df['Close'].diff()
+    df['RSI'] = rsi_values(df['Close'], period)
+    return df
+
+def rsi_values(close, period=14):
+    """
+    RSI of a close Series, or of every column of a (dates x symbols) frame.
+    """
+    delta = close.diff()
     gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
     loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
     
     rs = gain / loss
-    df['RSI'] = 100 - (100 / (1 + rs))
-    return df
+    return 100 - (100 / (1 + rs))
+
+def rsi_signal(values, oversold_threshold=30, overbought_threshold=70):
+    """
+    Signal array of the thresholds (sell wins if they overlap); 2-D for
+    (dates x symbols) frames.
+    """
+    sell = (values > overbought_threshold).to_numpy()
+    buy = (values < oversold_threshold).to_numpy() & ~sell
+    return signal_from_conditions(buy, sell)
 
 # -----------------------------------------------------------------------------
 # Backtesting Function
@@ -61,14 +78,49 @@ def backtest_strategy(stock_symbol, start_date, end_date, rsi_period=14, oversol
     print("RSI calculated successfully")
     
     # Generate buy (1) / sell (-1) signals
-    df['Signal'] = 0
-    df.loc[df['RSI'] < oversold_threshold, 'Signal'] = 1  # Buy signal
-    df.loc[df['RSI'] > overbought_threshold, 'Signal'] = -1  # Sell signal
+    df['Signal'] = rsi_signal(df['RSI'], oversold_threshold, overbought_threshold)
     df = df.fillna(0)
     print("Signals generated successfully")
 
     return df
 
+# -----------------------------------------------------------------------------
+# Universe backtest (all symbols of a (dates x symbols) panel at once)
+# -----------------------------------------------------------------------------
+def backtest_universe(panel, rsi_period=14, oversold_threshold=30, overbought_threshold=70):
+    """
+    Signal of backtest_strategy for every column of panel['Close'].
+    """
+    values = rsi_values(panel['Close'], rsi_period)
+    return pd.DataFrame(rsi_signal(values, oversold_threshold, overbought_threshold),
+                        index=values.index, columns=values.columns)
+
+# -----------------------------------------------------------------------------
+# Incremental interface for live bots (one bar per call)
+# -----------------------------------------------------------------------------
+rsi = None
+
+def on_start(history, rsi_period=14):
+    """
+    Warm up the RSI on past bars.
+    """
+    global rsi
+    rsi = RSI(rsi_period)
+    rsi.seed(history['Close'])
+
+def on_bar(bar, oversold_threshold=30, overbought_threshold=70):
+    """
+    Same rule as backtest_strategy for the newest bar.
+    """
+    if rsi is None:
+        on_start(pd.DataFrame(columns=['Close']))
+    value = rsi.update(bar['Close'])
+    if value > overbought_threshold:
+        return -1  # Sell signal (wins if the thresholds overlap, as in rsi_signal)
+    if value < oversold_threshold:
+        return 1  # Buy signal
+    return 0
+
 # -----------------------------------------------------------------------------
 # Example execution (for debugging/testing)
 # -----------------------------------------------------------------------------
@@ -0,0 +1,54 @@
+import numpy as np
+
+# -----------------------------------------------------------------------------
+# Signal generation helpers
+# -----------------------------------------------------------------------------
+# Strategies describe their rules as boolean entry/exit arrays (one element
+# per bar, NaN comparisons already False) and turn them into signals here with
+# whole-array operations instead of row loops.
+
+
+def signal_from_conditions(entry, exit):
+    """
+    1 where entry is true, -1 where exit is true, 0 otherwise.
+    Entry wins when both are true on the same bar. Works element-wise, so
+    (bars x symbols) conditions give a (bars x symbols) signal.
+    """
+    entry = np.asarray(entry, dtype=bool)
+    exit = np.asarray(exit, dtype=bool)
+    signal = np.zeros(entry.shape, dtype=np.int8)
+    signal[exit] = -1
+    signal[entry] = 1
+    return signal
+
+
+def latch_state(signal, initial=0):
+    """
+    Carry the last non-zero signal forward: the position held after each bar.
+    A 2-D (bars x symbols) signal is latched column by column.
+    """
+    signal = np.asarray(signal)
+    if len(signal) == 0:
+        return np.zeros(signal.shape, dtype=np.int8)
+    bars = np.arange(len(signal)).reshape((-1,) + (1,) * (signal.ndim - 1))
+    positions = np.where(signal != 0, bars, -1)
+    np.maximum.accumulate(positions, axis=0, out=positions)
+    latched = np.take_along_axis(signal, np.maximum(positions, 0), axis=0)
+    state = np.where(positions >= 0, latched, initial)
+    return state.astype(np.int8)
+
+
+def latched_entries(signal, initial=0):
+    """
+    Bars where a signal changes the held position ("only buy if not already
+    long"). Returns (state, buy_marks, sell_marks).
+    """
+    signal = np.asarray(signal)
+    state = latch_state(signal, initial)
+    previous = np.empty_like(state)
+    if len(state):
+        previous[0] = initial
+        previous[1:] = state[:-1]
+    buy_marks = (signal == 1) & (previous != 1)
+    sell_marks = (signal == -1) & (previous != -1)
+    return state, buy_marks, sell_marks
@@ -1,7 +1,9 @@
+import numpy as np
 import pandas as pd
 import yfinance as yf
 import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
+from signal_engine import latched_entries, signal_from_conditions
 
 plt.style.use('fivethirtyeight')
 plt.rcParams['figure.figsize'] = (20,10)
@@ -37,13 +39,18 @@ def calculate_stochastic_oscillator(df, k_lookback=14, d_lookback=3):
     %K = (Close - Lowest Low) / (Highest High - Lowest Low) * 100
     %D = 3-day moving average of %K
     """
-    df['Lowest_Low'] = df['Low'].rolling(window=k_lookback).min()
-    df['Highest_High'] = df['High'].rolling(window=k_lookback).max()
-    
-    df['%K'] = ((df['Close'] - df['Lowest_Low']) / (df['Highest_High'] - df['Lowest_Low'])) * 100
-    df['%D'] = df['%K'].rolling(window=d_lookback).mean()
+    df['%K'], df['%D'] = stochastic_lines(df['High'], df['Low'], df['Close'], k_lookback, d_lookback)
+    return df
+
+def stochastic_lines(high, low, close, k_lookback=14, d_lookback=3):
+    """
+    (%K, %D) of Series, or of (dates x symbols) frames.
+    """
+    lowest_low = low.rolling(window=k_lookback).min()
+    highest_high = high.rolling(window=k_lookback).max()
     
-    return df.drop(columns=['Lowest_Low', 'Highest_High'])
+    k = ((close - lowest_low) / (highest_high - lowest_low)) * 100
+    return k, k.rolling(window=d_lookback).mean()
 
 # -----------------------------------------------------------------------------
 # Function to calculate MACD
@@ -52,64 +59,72 @@ def calculate_macd(df, slow=26, fast=12, smooth=9):
     """
     Compute the Moving Average Convergence Divergence (MACD) indicator.
     """
-    df['MACD'] = df['Close'].ewm(span=fast, adjust=False).mean() - df['Close'].ewm(span=slow, adjust=False).mean()
-    df['MACD_Signal'] = df['MACD'].ewm(span=smooth, adjust=False).mean()
+    df['MACD'], df['MACD_Signal'] = macd_lines(df['Close'], slow, fast, smooth)
     df['MACD_Hist'] = df['MACD'] - df['MACD_Signal']
     
     return df
 
+def macd_lines(close, slow=26, fast=12, smooth=9):
+    """
+    (MACD, signal line) of a Series, or of a (dates x symbols) frame.
+    """
+    macd = close.ewm(span=fast, adjust=False).mean() - close.ewm(span=slow, adjust=False).mean()
+    return macd, macd.ewm(span=smooth, adjust=False).mean()
+
 # -----------------------------------------------------------------------------
 # Backtesting: Stochastic Oscillator + MACD Trading Strategy
 # -----------------------------------------------------------------------------
-def backtest_strategy(stock_symbol, start_date, end_date):
+def backtest_strategy(stock_symbol, start_date, end_date, k_lookback=14, d_lookback=3, slow=26, fast=12, smooth=9,
+                      oversold=30, overbought=70, macd_threshold=2):
     """
     Perform backtesting using a Stochastic Oscillator + MACD trading strategy.
     - Buy when %K < 30, %D < 30, MACD < -2, and MACD Signal < -2
     - Sell when %K > 70, %D > 70, MACD > 2, and MACD Signal > 2
+    (defaults; the levels are parameters)
     """
     df = fetch_historical_data(stock_symbol, start_date, end_date)
     if df is None:
         return None
     
-    df = calculate_stochastic_oscillator(df)
-    df = calculate_macd(df)
-    
-    # Initialize strategy variables
-    buy_price, sell_price, signals = [], [], []
-    signal = 0  # 1 = buy, -1 = sell, 0 = hold
-
-    for i in range(len(df)):
-        if df['%K'][i] < 30 and df['%D'][i] < 30 and df['MACD'][i] < -2 and df['MACD_Signal'][i] < -2:
-            if signal != 1:
-                buy_price.append(df['Close'][i])
-                sell_price.append(None)
-                signal = 1
-            else:
-                buy_price.append(None)
-                sell_price.append(None)
-            signals.append(signal)
-        
-        elif df['%K'][i] > 70 and df['%D'][i] > 70 and df['MACD'][i] > 2 and df['MACD_Signal'][i] > 2:
-            if signal != -1:
-                buy_price.append(None)
-                sell_price.append(df['Close'][i])
-                signal = -1
-            else:
-                buy_price.append(None)
-                sell_price.append(None)
-            signals.append(signal)
-        
-        else:
-            buy_price.append(None)
-            sell_price.append(None)
-            signals.append(0)
+    df = calculate_stochastic_oscillator(df, k_lookback=k_lookback, d_lookback=d_lookback)
+    df = calculate_macd(df, slow=slow, fast=fast, smooth=smooth)
     
+    # Buy/sell conditions per bar, then latch so a buy is only marked when not already long
+    signals = stochastic_macd_signal(df['%K'], df['%D'], df['MACD'], df['MACD_Signal'], oversold, overbought, macd_threshold)
+    _, buy_marks, sell_marks = latched_entries(signals)
+
+    close = df['Close'].to_numpy()
+    buy_price = np.where(buy_marks, close, np.nan)
+    sell_price = np.where(sell_marks, close, np.nan)
+
     df['Buy_Signal'] = buy_price
     df['Sell_Signal'] = sell_price
     df['Signal'] = signals
     df = df.reset_index()
     return df[['Date', 'Close', '%K', '%D', 'MACD', 'MACD_Signal', 'MACD_Hist', 'Buy_Signal', 'Sell_Signal', 'Signal']]
 
+def stochastic_macd_signal(k, d, macd, macd_signal, oversold=30, overbought=70, macd_threshold=2):
+    """
+    Signal array of the rules above; 2-D for (dates x symbols) frames.
+    """
+    buy = ((k < oversold) & (d < oversold) & (macd < -macd_threshold) & (macd_signal < -macd_threshold)).to_numpy()
+    sell = ((k > overbought) & (d > overbought) & (macd > macd_threshold) & (macd_signal > macd_threshold)).to_numpy()
+    return signal_from_conditions(buy, sell)
+
+# -----------------------------------------------------------------------------
+# Universe backtest (all symbols of a (dates x symbols) panel at once)
+# -----------------------------------------------------------------------------
+def backtest_universe(panel, k_lookback=14, d_lookback=3, slow=26, fast=12, smooth=9,
+                      oversold=30, overbought=70, macd_threshold=2):
+    """
+    Signal of backtest_strategy for every column of panel['Close'].
+    """
+    close = panel['Close']
+    k, d = stochastic_lines(panel['High'], panel['Low'], close, k_lookback, d_lookback)
+    macd, macd_signal = macd_lines(close, slow, fast, smooth)
+    signals = stochastic_macd_signal(k, d, macd, macd_signal, oversold, overbought, macd_threshold)
+    return pd.DataFrame(signals, index=close.index, columns=close.columns)
+
 # -----------------------------------------------------------------------------
 # Plot MACD Indicator
 # -----------------------------------------------------------------------------
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 import yfinance as yf
 from datetime import datetime, timedelta
@@ -45,24 +46,47 @@ def calculate_supertrend(df, lookback=10, multiplier=3):
     upper_band = hl_avg + (multiplier * atr)
     lower_band = hl_avg - (multiplier * atr)
     
-    # Initialize Supertrend and Uptrend/Downtrend arrays
-    supertrend = pd.Series(index=df.index)
-    
-    for i in range(len(df)):
-        if i == 0:
-            supertrend.iloc[i] = 0  # Default initialization
-        elif supertrend.iloc[i-1] == upper_band.iloc[i-1] and close.iloc[i] < upper_band.iloc[i]:
-            supertrend.iloc[i] = upper_band.iloc[i]
-        elif supertrend.iloc[i-1] == upper_band.iloc[i-1] and close.iloc[i] > upper_band.iloc[i]:
-            supertrend.iloc[i] = lower_band.iloc[i]
-        elif supertrend.iloc[i-1] == lower_band.iloc[i-1] and close.iloc[i] > lower_band.iloc[i]:
-            supertrend.iloc[i] = lower_band.iloc[i]
-        elif supertrend.iloc[i-1] == lower_band.iloc[i-1] and close.iloc[i] < lower_band.iloc[i]:
-            supertrend.iloc[i] = upper_band.iloc[i]
-    
-    df['Supertrend'] = supertrend
+    # Run the band recursion over plain arrays
+    df['Supertrend'] = supertrend_scan(close.to_numpy(), upper_band.to_numpy(), lower_band.to_numpy())
     return df
 
+# -----------------------------------------------------------------------------
+# Supertrend band recursion
+# -----------------------------------------------------------------------------
+def supertrend_scan(close, upper_band, lower_band, seed=0.0):
+    """
+    Array scan of the Supertrend band switching rules:
+    - on the upper band: stay while close < upper, flip to lower when close > upper
+    - on the lower band: stay while close > lower, flip to upper when close < lower
+    Any other case (no band matched, or close exactly on the band) leaves NaN,
+    and a NaN state never matches a band again, so the scan stops there.
+    """
+    n = len(close)
+    result = [float("nan")] * n
+    if n == 0:
+        return np.array(result)
+
+    close = np.asarray(close, dtype=float).tolist()
+    upper = np.asarray(upper_band, dtype=float).tolist()
+    lower = np.asarray(lower_band, dtype=float).tolist()
+
+    prev = result[0] = seed
+    for i in range(1, n):
+        c, up, lo = close[i], upper[i], lower[i]
+        if prev == upper[i - 1] and c < up:
+            prev = up
+        elif prev == upper[i - 1] and c > up:
+            prev = lo
+        elif prev == lower[i - 1] and c > lo:
+            prev = lo
+        elif prev == lower[i - 1] and c < lo:
+            prev = up
+        else:
+            break
+        result[i] = prev
+
+    return np.array(result)
+
 # -----------------------------------------------------------------------------
 # Backtesting Function for Supertrend Strategy
 # -----------------------------------------------------------------------------
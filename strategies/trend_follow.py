@@ -1,6 +1,8 @@
 import pandas as pd
 import yfinance as yf
 from datetime import datetime, timedelta
+from indicators import SMA
+from signal_engine import signal_from_conditions
 
 # -----------------------------------------------------------------------------
 # Function to fetch real historical stock data from Yahoo Finance
@@ -35,10 +37,17 @@ def calculate_moving_averages(df, short_window=10, long_window=30):
     df['SMA_Long'] = df['Close'].rolling(window=long_window).mean()
     return df
 
+def crossover_signal(sma_short, sma_long):
+    """
+    1 while the short SMA is above the long one, -1 while below; 2-D for
+    (dates x symbols) frames.
+    """
+    return signal_from_conditions((sma_short > sma_long).to_numpy(), (sma_short < sma_long).to_numpy())
+
 # -----------------------------------------------------------------------------
 # Backtesting Function
 # -----------------------------------------------------------------------------
-def backtest_strategy(stock_symbol, start_date, end_date):
+def backtest_strategy(stock_symbol, start_date, end_date, short_window=10, long_window=30):
     """
     Perform backtesting using an SMA crossover strategy:
     - Buy signal when short-term SMA crosses above long-term SMA.
@@ -53,18 +62,57 @@ def backtest_strategy(stock_symbol, start_date, end_date):
     df = df.reset_index()
     
     # Calculate moving averages
-    df = calculate_moving_averages(df)
+    df = calculate_moving_averages(df, short_window=short_window, long_window=long_window)
     print("Moving averages calculated successfully")
     
     # Generate buy (1) / sell (-1) signals
-    df['Signal'] = 0
-    df.loc[df['SMA_Short'] > df['SMA_Long'], 'Signal'] = 1  # Buy signal
-    df.loc[df['SMA_Short'] < df['SMA_Long'], 'Signal'] = -1  # Sell signal
+    df['Signal'] = crossover_signal(df['SMA_Short'], df['SMA_Long'])
     df = df.fillna(0)
     print("Signals generated successfully")
 
     return df
 
+# -----------------------------------------------------------------------------
+# Universe backtest (all symbols of a (dates x symbols) panel at once)
+# -----------------------------------------------------------------------------
+def backtest_universe(panel, short_window=10, long_window=30):
+    """
+    Signal of backtest_strategy for every column of panel['Close'].
+    """
+    close = panel['Close']
+    short = close.rolling(window=short_window).mean()
+    long = close.rolling(window=long_window).mean()
+    return pd.DataFrame(crossover_signal(short, long), index=close.index, columns=close.columns)
+
+# -----------------------------------------------------------------------------
+# Incremental interface for live bots (one bar per call)
+# -----------------------------------------------------------------------------
+sma_short = None
+sma_long = None
+
+def on_start(history, short_window=10, long_window=30):
+    """
+    Warm up the moving averages on past bars.
+    """
+    global sma_short, sma_long
+    sma_short, sma_long = SMA(short_window), SMA(long_window)
+    sma_short.seed(history['Close'])
+    sma_long.seed(history['Close'])
+
+def on_bar(bar):
+    """
+    Same rule as backtest_strategy for the newest bar.
+    """
+    if sma_short is None:
+        on_start(pd.DataFrame(columns=['Close']))
+    short = sma_short.update(bar['Close'])
+    long = sma_long.update(bar['Close'])
+    if short > long:
+        return 1  # Buy signal
+    if short < long:
+        return -1  # Sell signal
+    return 0
+
 # -----------------------------------------------------------------------------
 # Example execution (for debugging/testing)
 # -----------------------------------------------------------------------------
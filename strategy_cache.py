@@ -0,0 +1,252 @@
+import hashlib
+import importlib.util
+import json
+import marshal
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# -----------------------------------------------------------------------------
+# Strategy module cache
+# -----------------------------------------------------------------------------
+# Uploaded strategies are cached by storage path and content hash:
+#   - path -> (sha256, storage version, last check) in memory and index.json
+#   - sha256 -> source bytes and marshalled code object on disk
+#   - sha256 -> code object in an in-memory LRU
+# A path is trusted for STRATEGY_REVALIDATE_SECONDS; after that its storage
+# metadata is compared before the cached code is reused. Every load still
+# executes the code into a fresh module so bots never share module state.
+#
+# Storage calls run outside the cache lock, one at a time per path: callers
+# for other paths (or with a fresh entry) never wait behind a slow request,
+# and concurrent callers for the same path share one check.
+
+STRATEGY_CACHE_DIR = os.getenv("STRATEGY_CACHE_DIR", "strategy_cache")
+STRATEGY_REVALIDATE_SECONDS = float(os.getenv("STRATEGY_REVALIDATE_SECONDS", "60"))
+CODE_SUFFIX = f".{sys.implementation.cache_tag}.code"
+
+
+def module_from_code(code, file_path, sha=None):
+    """
+    Execute a compiled strategy into a new module named after its path.
+    """
+    module_name = file_path.replace(".py", "")
+    spec = importlib.util.spec_from_loader(module_name, loader=None)
+    module = importlib.util.module_from_spec(spec)
+    module.__strategy_hash__ = sha
+    exec(code, module.__dict__)
+    return module
+
+
+class StrategyCache:
+    """
+    Path + content-hash keyed cache of compiled strategy code.
+    """
+
+    def __init__(self, fetch_source, fetch_version=None, cache_dir=STRATEGY_CACHE_DIR,
+                 capacity=32, disk_capacity=256, revalidate_after=STRATEGY_REVALIDATE_SECONDS):
+        self.fetch_source = fetch_source
+        self.fetch_version = fetch_version
+        self.cache_dir = cache_dir
+        self.capacity = capacity
+        self.disk_capacity = disk_capacity
+        self.revalidate_after = revalidate_after
+        self._lock = threading.RLock()
+        self._path_locks = {}  # file_path -> lock held while its storage is checked
+        self._codes = OrderedDict()
+        self._paths = self._read_index()
+        self.stats = {"hits": 0, "revalidated": 0, "fetches": 0, "compiles": 0, "disk_hits": 0}
+
+    # -------------------------------------------------------------------------
+    # Disk tier
+    # -------------------------------------------------------------------------
+    def _index_path(self):
+        return os.path.join(self.cache_dir, "index.json")
+
+    def _read_index(self):
+        try:
+            with open(self._index_path()) as file:
+                entries = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        for entry in entries.values():
+            entry["checked_at"] = 0.0  # Revalidate everything after a restart
+        return entries
+
+    def _write_index(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self._index_path() + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(self._paths, file)
+        os.replace(tmp_path, self._index_path())
+
+    def _write_file(self, name, data):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = os.path.join(self.cache_dir, name)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+
+    def _read_file(self, name):
+        try:
+            with open(os.path.join(self.cache_dir, name), "rb") as file:
+                return file.read()
+        except OSError:
+            return None
+
+    def _prune_disk(self):
+        try:
+            names = [name for name in os.listdir(self.cache_dir) if name.endswith(".py")]
+        except OSError:
+            return
+        if len(names) <= self.disk_capacity:
+            return
+        live = {entry["sha"] for entry in self._paths.values()}
+        names.sort(key=lambda name: os.path.getmtime(os.path.join(self.cache_dir, name)))
+        for name in names[:len(names) - self.disk_capacity]:
+            sha = name[:-3]
+            if sha in live:
+                continue
+            for stale in (name, sha + CODE_SUFFIX):
+                try:
+                    os.remove(os.path.join(self.cache_dir, stale))
+                except OSError:
+                    pass
+
+    # -------------------------------------------------------------------------
+    # Lookup
+    # -------------------------------------------------------------------------
+    def _fresh(self, file_path):
+        """
+        The hash of file_path if it was checked recently enough, else None.
+        """
+        with self._lock:
+            entry = self._paths.get(file_path)
+            if entry is not None and time.time() - entry["checked_at"] < self.revalidate_after:
+                self.stats["hits"] += 1
+                return entry["sha"]
+            return None
+
+    def _resolve(self, file_path):
+        """
+        Return the content hash for file_path, fetching the source only when
+        the cached copy is missing or the storage object changed.
+        """
+        sha = self._fresh(file_path)
+        if sha is not None:
+            return sha
+        with self._lock:
+            path_lock = self._path_locks.setdefault(file_path, threading.Lock())
+        with path_lock:
+            # Whoever held the path lock before us may just have checked it
+            sha = self._fresh(file_path)
+            if sha is not None:
+                return sha
+            return self._check(file_path)
+
+    def _check(self, file_path):
+        """
+        Compare file_path with storage (network calls, no cache lock held).
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._paths.get(file_path)
+            entry = dict(entry) if entry is not None else None
+
+        # Read the version before the content so a concurrent upload can only
+        # make the recorded version older than the bytes, never newer
+        version = None
+        if self.fetch_version is not None:
+            try:
+                version = self.fetch_version(file_path)
+            except Exception as e:
+                print(f"Could not check strategy version for {file_path}: {e}")
+        if (entry is not None and version is not None and version == entry.get("version")
+                and self._has_source(entry["sha"])):
+            with self._lock:
+                current = self._paths.get(file_path)
+                if current is not None and current["sha"] == entry["sha"]:
+                    current["checked_at"] = now
+                self.stats["revalidated"] += 1
+            return entry["sha"]
+
+        source = self.fetch_source(file_path)
+        if source is None:
+            if entry is not None and self._has_source(entry["sha"]):
+                print(f"Using cached copy of {file_path}")
+                return entry["sha"]
+            return None
+
+        sha = hashlib.sha256(source).hexdigest()
+        with self._lock:
+            self.stats["fetches"] += 1
+            if not self._has_source(sha):
+                self._write_file(sha + ".py", source)
+                self._prune_disk()
+            self._paths[file_path] = {"sha": sha, "version": version, "checked_at": now}
+            self._write_index()
+        return sha
+
+    def _has_source(self, sha):
+        return sha in self._codes or os.path.exists(os.path.join(self.cache_dir, sha + ".py"))
+
+    def _code(self, sha, file_path):
+        code = self._codes.get(sha)
+        if code is not None:
+            self._codes.move_to_end(sha)
+            return code
+
+        data = self._read_file(sha + CODE_SUFFIX)
+        if data is not None:
+            code = marshal.loads(data)
+            self.stats["disk_hits"] += 1
+        else:
+            source = self._read_file(sha + ".py")
+            if source is None:
+                return None
+            code = compile(source.decode("utf-8"), file_path, "exec")
+            self._write_file(sha + CODE_SUFFIX, marshal.dumps(code))
+            self.stats["compiles"] += 1
+
+        self._codes[sha] = code
+        while len(self._codes) > self.capacity:
+            self._codes.popitem(last=False)
+        return code
+
+    def get_code(self, file_path):
+        """
+        Return (sha256, code object) for a strategy, or (None, None).
+        """
+        sha = self._resolve(file_path)
+        if sha is None:
+            return None, None
+        with self._lock:
+            return sha, self._code(sha, file_path)
+
+    def load(self, file_path):
+        """
+        Execute the cached code of file_path into a new module.
+        """
+        sha, code = self.get_code(file_path)
+        if code is None:
+            return None
+        return module_from_code(code, file_path, sha)
+
+    def invalidate(self, file_path=None):
+        """
+        Force the next load of file_path (or of every path) to check storage.
+        """
+        with self._lock:
+            paths = [file_path] if file_path else list(self._paths)
+            for path in paths:
+                entry = self._paths.get(path)
+                if entry is not None:
+                    entry["checked_at"] = 0.0
+                    entry["version"] = None
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, paths=len(self._paths), compiled=len(self._codes))
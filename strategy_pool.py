@@ -0,0 +1,500 @@
+import argparse
+import marshal
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Connection
+
+# -----------------------------------------------------------------------------
+# Strategy worker processes
+# -----------------------------------------------------------------------------
+# Strategies run in a small pool of separate Python processes so a slow
+# pandas loop only holds its own GIL, and a strategy that hangs, leaks or
+# crashes takes down a worker instead of the gunicorn process.
+#
+#   - Each worker is `python strategy_pool.py --fd N`, talking pickled
+#     messages over a socketpair. It imports pandas/yfinance/market_data once
+#     and keeps compiled strategies by content hash, so code is shipped to a
+#     worker only the first time it needs it.
+#   - A call that exceeds its timeout kills the worker; a worker that dies is
+#     respawned on next use. Both surface as StrategyError to the caller.
+#   - Workers get an address-space limit (STRATEGY_WORKER_MEMORY_MB over what
+#     the imports use) and are recycled after STRATEGY_WORKER_MAX_TASKS.
+#   - Bars of watched symbols are read from shared memory published by the
+#     web process (shared_bars), falling back to the on-disk bar store.
+#   - Live bots are pinned to one worker, which keeps their StrategyRunner
+#     (and incremental on_bar state) between evaluations. If that worker is
+#     replaced the runner is rebuilt and replays its lookback.
+#
+# STRATEGY_PROCESSES=0 runs the same code inline, without isolation.
+
+STRATEGY_PROCESSES = int(os.getenv("STRATEGY_PROCESSES", "2"))
+STRATEGY_TIMEOUT = float(os.getenv("STRATEGY_TIMEOUT", "60"))
+STRATEGY_BACKTEST_TIMEOUT = float(os.getenv("STRATEGY_BACKTEST_TIMEOUT", "300"))
+STRATEGY_WORKER_MEMORY_MB = int(os.getenv("STRATEGY_WORKER_MEMORY_MB", "1024"))
+STRATEGY_WORKER_MAX_TASKS = int(os.getenv("STRATEGY_WORKER_MAX_TASKS", "1000"))
+WORKER_START_TIMEOUT = 120.0
+CANCEL_POLL_SECONDS = 0.2  # How often a cancellable call checks its cancel event
+MODULE_CACHE_SIZE = 16
+
+
+class StrategyError(Exception):
+    pass
+
+
+class StrategyTimeout(StrategyError):
+    pass
+
+
+class StrategyCrashed(StrategyError):
+    pass
+
+
+class StrategyCancelled(StrategyError):
+    pass
+
+
+# -----------------------------------------------------------------------------
+# Worker side
+# -----------------------------------------------------------------------------
+class WorkerState:
+    """
+    Compiled strategies, backtest modules and per-bot runners of one worker.
+    """
+
+    def __init__(self):
+        self.codes = {}
+        self.modules = OrderedDict()
+        self.runners = {}
+
+    def handle(self, op, args):
+        code = args.pop("code", None)
+        if code is not None:
+            self.codes[args["sha"]] = marshal.loads(code)
+        return getattr(self, "op_" + op)(**args)
+
+    def _module(self, sha, file_path):
+        from market_data import patch_strategy_module
+        from strategy_cache import module_from_code
+
+        module = module_from_code(self.codes[sha], file_path, sha)
+        patch_strategy_module(module)
+        return module
+
+    def op_backtest(self, sha, file_path, symbol, start_date, end_date, params=None):
+        module = self.modules.get(sha)
+        if module is None:
+            module = self.modules[sha] = self._module(sha, file_path)
+            while len(self.modules) > MODULE_CACHE_SIZE:
+                self.modules.popitem(last=False)
+        else:
+            self.modules.move_to_end(sha)
+        return module.backtest_strategy(symbol, start_date, end_date, **(params or {}))
+
+    def op_evaluate(self, key, sha, file_path, symbol, interval):
+        from strategy_runner import StrategyRunner
+
+        current = self.runners.get(key)
+        if current is None or current[0] != sha:
+            # New bot, replaced worker or updated strategy: start over
+            current = self.runners[key] = (sha, StrategyRunner(self._module(sha, file_path), symbol, interval=interval))
+        runner = current[1]
+        return runner.evaluate(), runner.incremental
+
+    def op_forget(self, key):
+        self.runners.pop(key, None)
+
+    def op_parameters(self, sha, file_path):
+        from sweep import strategy_parameters
+
+        return strategy_parameters(self._module(sha, file_path))
+
+    def op_sweep(self, sha, file_path, symbol, start_date, end_date, combinations, settings=None):
+        from sweep import run_combinations
+
+        # A module of its own: the sweep patches its data source and indicators
+        return run_combinations(self._module(sha, file_path), symbol, start_date, end_date, combinations, settings)
+
+    def op_universe(self, sha, file_path, symbols, start_date, end_date, params, settings=None):
+        from universe import run_universe
+
+        return run_universe(self._module(sha, file_path), symbols, start_date, end_date, params, settings)
+
+
+def limit_memory(megabytes):
+    """
+    Cap the address space at what is mapped now plus megabytes.
+    """
+    try:
+        import resource
+        with open("/proc/self/statm") as file:
+            mapped = int(file.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+        limit = mapped + megabytes * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, OSError, ValueError) as e:
+        print(f"Could not set strategy worker memory limit: {e}")
+
+
+def worker_main(fd, memory_mb):
+    conn = Connection(fd)
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "strategies"))
+    import pandas  # noqa: F401  (preload the heavy imports before the limit)
+    import market_data  # noqa: F401
+    import shared_bars
+    import strategy_runner  # noqa: F401
+
+    shared_bars.attach_reader()
+
+    if memory_mb > 0:
+        limit_memory(memory_mb)
+    state = WorkerState()
+    conn.send(("ready", os.getpid()))
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return
+        if message is None:
+            return
+        op, args = message
+        try:
+            conn.send(("ok", state.handle(op, args)))
+        except MemoryError:
+            # State may be half-built; answer and let the pool start a fresh worker
+            conn.send(("fatal", "MemoryError: strategy exceeded the worker memory limit"))
+            return
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+# -----------------------------------------------------------------------------
+# Pool side
+# -----------------------------------------------------------------------------
+class Worker:
+    def __init__(self, memory_mb):
+        parent_sock, child_sock = socket.socketpair()
+        env = dict(os.environ, OMP_NUM_THREADS="1", OPENBLAS_NUM_THREADS="1", MKL_NUM_THREADS="1")
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--fd", str(child_sock.fileno()), "--memory-mb", str(memory_mb)],
+            pass_fds=(child_sock.fileno(),),
+            env=env,
+        )
+        child_sock.close()
+        self.conn = Connection(parent_sock.detach())
+        self.shas = set()
+        self.tasks = 0
+        if not self.conn.poll(WORKER_START_TIMEOUT):
+            self.kill()
+            raise StrategyError("Strategy worker did not start")
+        try:
+            self.conn.recv()
+        except (EOFError, OSError):
+            self.kill()
+            raise StrategyCrashed(f"Strategy worker failed to start ({describe_exit(self.process.wait())})")
+
+    def kill(self):
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        self.conn.close()
+
+    def close(self):
+        try:
+            self.conn.send(None)
+            self.process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+        self.kill()
+
+
+def describe_exit(returncode):
+    if returncode is None:
+        return "still running"
+    if returncode < 0:
+        try:
+            name = signal.Signals(-returncode).name
+        except ValueError:
+            name = str(-returncode)
+        return f"killed by {name}"
+    return f"exit code {returncode}"
+
+
+class StrategyPool:
+    """
+    Runs backtests and live bot evaluations in isolated worker processes.
+    get_code(file_path) -> (sha, code object), e.g. StrategyCache.get_code.
+    """
+
+    def __init__(self, get_code, processes=STRATEGY_PROCESSES, timeout=STRATEGY_TIMEOUT,
+                 backtest_timeout=STRATEGY_BACKTEST_TIMEOUT, memory_mb=STRATEGY_WORKER_MEMORY_MB,
+                 max_tasks=STRATEGY_WORKER_MAX_TASKS):
+        self.get_code = get_code
+        self.processes = processes
+        self.timeout = timeout
+        self.backtest_timeout = backtest_timeout
+        self.memory_mb = memory_mb
+        self.max_tasks = max_tasks
+        self._cond = threading.Condition()
+        self._workers = [None] * processes
+        self._idle = set(range(processes))
+        self._pins = {}
+        self._inline = WorkerState() if processes <= 0 else None
+        self.stats = {"tasks": 0, "errors": 0, "timeouts": 0, "crashes": 0, "recycled": 0, "started": 0, "cancelled": 0}
+
+    # -------------------------------------------------------------------------
+    # Worker slots
+    # -------------------------------------------------------------------------
+    def _acquire(self, index=None):
+        with self._cond:
+            while True:
+                if index is None and self._idle:
+                    # Prefer a worker that is already running
+                    running = [i for i in self._idle if self._workers[i] is not None]
+                    chosen = min(running or self._idle)
+                    break
+                if index is not None and index in self._idle:
+                    chosen = index
+                    break
+                self._cond.wait()
+            self._idle.discard(chosen)
+            return chosen
+
+    def _release(self, index):
+        with self._cond:
+            self._idle.add(index)
+            self._cond.notify_all()
+
+    def _pin(self, key):
+        with self._cond:
+            index = self._pins.get(key)
+            if index is None:
+                load = [0] * self.processes
+                for pinned in self._pins.values():
+                    load[pinned] += 1
+                index = self._pins[key] = load.index(min(load))
+            return index
+
+    def _discard(self, index, reason):
+        worker, self._workers[index] = self._workers[index], None
+        if worker is not None:
+            worker.kill()
+        with self._cond:
+            self.stats[reason] += 1
+
+    # -------------------------------------------------------------------------
+    # Calls
+    # -------------------------------------------------------------------------
+    def _wait_reply(self, worker, timeout, cancel):
+        """
+        Wait for the worker's reply. Returns "ready", "timeout" or "cancelled".
+        """
+        if cancel is None:
+            return "ready" if worker.conn.poll(timeout) else "timeout"
+        deadline = time.monotonic() + timeout
+        while True:
+            if cancel.is_set():
+                return "cancelled"
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return "timeout"
+            if worker.conn.poll(min(remaining, CANCEL_POLL_SECONDS)):
+                return "ready"
+
+    def _call(self, op, args, file_path=None, index=None, timeout=None, cancel=None):
+        """
+        Run op in a worker. cancel: optional threading.Event; setting it
+        kills the worker running the call and raises StrategyCancelled.
+        """
+        code = None
+        if file_path is not None:
+            sha, code = self.get_code(file_path)
+            if code is None:
+                raise StrategyError(f"Failed to load strategy {file_path}")
+            args = dict(args, sha=sha, file_path=file_path)
+
+        if self._inline is not None:
+            if code is not None and args["sha"] not in self._inline.codes:
+                self._inline.codes[args["sha"]] = code
+            self.stats["tasks"] += 1
+            return self._inline.handle(op, args)
+
+        index = self._acquire(index)
+        try:
+            worker = self._workers[index]
+            if worker is None or worker.process.poll() is not None:
+                worker = self._workers[index] = Worker(self.memory_mb)
+                with self._cond:
+                    self.stats["started"] += 1
+            if code is not None and args["sha"] not in worker.shas:
+                args["code"] = marshal.dumps(code)
+
+            try:
+                worker.conn.send((op, args))
+                waited = self._wait_reply(worker, timeout, cancel)
+                if waited == "cancelled":
+                    self._discard(index, "cancelled")
+                    raise StrategyCancelled(f"Strategy {op} was cancelled, worker restarted")
+                if waited == "timeout":
+                    self._discard(index, "timeouts")
+                    raise StrategyTimeout(f"Strategy {op} took longer than {timeout:.0f}s, worker restarted")
+                reply = worker.conn.recv()
+            except (EOFError, OSError):
+                returncode = worker.process.wait()
+                self._discard(index, "crashes")
+                raise StrategyCrashed(f"Strategy worker crashed ({describe_exit(returncode)})")
+
+            if "sha" in args:
+                worker.shas.add(args["sha"])
+            worker.tasks += 1
+            with self._cond:
+                self.stats["tasks"] += 1
+            status, value = reply
+            if status == "fatal" or worker.tasks >= self.max_tasks:
+                self._discard(index, "recycled")
+            if status != "ok":
+                with self._cond:
+                    self.stats["errors"] += 1
+                raise StrategyError(value)
+            return value
+        finally:
+            self._release(index)
+
+    def backtest(self, file_path, symbol, start_date, end_date, params=None, timeout=None, cancel=None):
+        """
+        backtest_strategy(symbol, start_date, end_date, **params) in any free worker.
+        """
+        return self._call(
+            "backtest",
+            {"symbol": symbol, "start_date": start_date, "end_date": end_date, "params": params or {}},
+            file_path=file_path,
+            timeout=timeout or self.backtest_timeout,
+            cancel=cancel,
+        )
+
+    def evaluate(self, key, file_path, symbol, interval, timeout=None):
+        """
+        One StrategyRunner.evaluate() for bot key on its pinned worker.
+        Returns (evaluation, incremental).
+        """
+        return self._call(
+            "evaluate",
+            {"key": key, "symbol": symbol, "interval": interval},
+            file_path=file_path,
+            index=None if self._inline is not None else self._pin(key),
+            timeout=timeout or self.timeout,
+        )
+
+    def forget(self, key):
+        """
+        Drop the runner state of a stopped bot.
+        """
+        if self._inline is not None:
+            self._inline.op_forget(key)
+            return
+        with self._cond:
+            index = self._pins.pop(key, None)
+        if index is not None and self._workers[index] is not None:
+            try:
+                self._call("forget", {"key": key}, index=index, timeout=self.timeout)
+            except StrategyError as e:
+                print(f"Could not release strategy state of {key}: {e}")
+
+    def parameters(self, file_path, timeout=None):
+        """
+        Tunable keyword arguments of the strategy's backtest_strategy.
+        """
+        return self._call("parameters", {}, file_path=file_path, timeout=timeout or self.timeout)
+
+    def sweep(self, file_path, symbol, start_date, end_date, combinations, settings=None, timeout=None,
+              chunks_per_worker=4):
+        """
+        Backtest every parameter combination, spread over all workers in
+        chunks. Returns one row per combination (metrics or "error").
+        settings: quantity, capital, costs and slippage (see performance).
+        """
+        workers = max(1, self.processes)
+        size = max(1, -(-len(combinations) // (workers * chunks_per_worker)))
+        chunks = [combinations[i:i + size] for i in range(0, len(combinations), size)]
+        args = {"symbol": symbol, "start_date": start_date, "end_date": end_date, "settings": settings}
+
+        def run(chunk):
+            try:
+                return self._call("sweep", dict(args, combinations=chunk), file_path=file_path,
+                                  timeout=timeout or self.backtest_timeout)
+            except StrategyError as e:
+                return [{"params": params, "error": str(e)} for params in chunk]
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sweep") as executor:
+            return [row for rows in executor.map(run, chunks) for row in rows]
+
+    def universe(self, file_path, symbols, start_date, end_date, params=None, settings=None, timeout=None):
+        """
+        Backtest one parameter set over many symbols: one contiguous chunk
+        of symbols per worker, each vectorized across its chunk. Returns
+        one summary row per symbol, in order.
+        """
+        workers = max(1, min(self.processes, len(symbols)))
+        size = max(1, -(-len(symbols) // workers))
+        chunks = [symbols[i:i + size] for i in range(0, len(symbols), size)]
+        args = {"start_date": start_date, "end_date": end_date, "params": params or {}, "settings": settings}
+
+        def run(chunk):
+            try:
+                return self._call("universe", dict(args, symbols=chunk), file_path=file_path,
+                                  timeout=timeout or self.backtest_timeout)
+            except StrategyError as e:
+                return [{"symbol": symbol, "error": str(e)} for symbol in chunk]
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="universe") as executor:
+            return [row for rows in executor.map(run, chunks) for row in rows]
+
+    def runner(self, key, file_path, symbol, interval):
+        return RemoteRunner(self, key, file_path, symbol, interval)
+
+    def snapshot(self):
+        with self._cond:
+            alive = sum(1 for worker in self._workers if worker is not None and worker.process.poll() is None)
+            return dict(self.stats, processes=self.processes, alive=alive,
+                        busy=self.processes - len(self._idle), pinned=len(self._pins))
+
+    def shutdown(self):
+        for index in range(self.processes):
+            index = self._acquire(index)
+            worker, self._workers[index] = self._workers[index], None
+            if worker is not None:
+                worker.close()
+
+
+class RemoteRunner:
+    """
+    StrategyRunner look-alike whose evaluate() runs in the pool.
+    """
+
+    def __init__(self, pool, key, file_path, symbol, interval):
+        self.pool = pool
+        self.key = key
+        self.file_path = file_path
+        self.symbol = symbol
+        self.interval = interval
+        self.incremental = False
+
+    def evaluate(self):
+        evaluation, self.incremental = self.pool.evaluate(self.key, self.file_path, self.symbol, self.interval)
+        return evaluation
+
+    def close(self):
+        self.pool.forget(self.key)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Strategy worker process (started by StrategyPool)")
+    parser.add_argument("--fd", type=int, required=True)
+    parser.add_argument("--memory-mb", type=int, default=STRATEGY_WORKER_MEMORY_MB)
+    args = parser.parse_args()
+    worker_main(args.fd, args.memory_mb)
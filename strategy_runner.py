@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta
+
+import market_data
+from market_calendar import BAR_MINUTES, IST, nse
+
+# -----------------------------------------------------------------------------
+# Strategy evaluation for live bots
+# -----------------------------------------------------------------------------
+# A strategy can optionally implement the incremental interface:
+#
+#   def on_start(history): ...            # DataFrame of past OHLCV bars
+#   def on_bar(bar): return signal        # bar is a Series (Open/High/Low/Close/...)
+#                                         # named by its timestamp; 1 buy, -1 sell, 0 hold
+#
+# When it does, the runner replays the lookback window once and afterwards
+# only hands over bars it has not delivered yet, so each evaluation costs one
+# bar of work. Otherwise it falls back to backtest_strategy over the window
+# and reads the last row, as before.
+#
+# Yahoo's newest row is usually a bar that is still forming. on_bar only
+# ever sees closed bars: a last row whose close time (market_calendar) is
+# still ahead is held back until the next evaluation after it closed, so its
+# final values are the ones delivered. The exception is the session's last
+# bar (and a daily bar), which is delivered as it stands from
+# BAR_PRE_CLOSE_SECONDS before the close so its order can still be placed.
+
+LOOKBACK_DAYS = 60
+# yfinance only serves intraday bars this far back
+MAX_LOOKBACK_DAYS = {"1m": 6, "2m": 59, "5m": 59, "15m": 59, "30m": 59, "90m": 59}
+
+
+def lookback_for(interval, lookback_days=LOOKBACK_DAYS):
+    return min(lookback_days, MAX_LOOKBACK_DAYS.get(interval, lookback_days))
+
+
+class StrategyRunner:
+    """
+    Evaluates one strategy module for one symbol on each bot tick.
+    """
+
+    def __init__(self, strategy_module, symbol, lookback_days=LOOKBACK_DAYS, interval=market_data.DEFAULT_INTERVAL):
+        self.module = strategy_module
+        self.symbol = symbol
+        self.lookback_days = lookback_for(interval, lookback_days)
+        self.interval = interval
+        self.incremental = callable(getattr(strategy_module, "on_bar", None))
+        self.last_bar_time = None
+
+    def evaluate(self):
+        """
+        Return (signal, close) for the newest bar, or None when there is
+        nothing new to act on.
+        """
+        if self.incremental:
+            return self._evaluate_incremental()
+        return self._evaluate_backtest()
+
+    def _evaluate_backtest(self):
+        results = self.module.backtest_strategy(
+            self.symbol,
+            (datetime.today() - timedelta(days=self.lookback_days)).strftime("%Y-%m-%d"),
+            datetime.now().strftime("%Y-%m-%d"),
+        )
+        if results is None or results.empty:
+            return None
+        return results["Signal"].iloc[-1], results["Close"].iloc[-1]
+
+    def _evaluate_incremental(self):
+        today = datetime.today()
+        if self.last_bar_time is None:
+            start = today - timedelta(days=self.lookback_days)
+        else:
+            start = self.last_bar_time.to_pydatetime()
+        bars = market_data.fetch_historical_data(
+            self.symbol, start.strftime("%Y-%m-%d"), today.strftime("%Y-%m-%d"), self.interval
+        )
+        if bars is None or bars.empty:
+            return None
+        bars = self._closed(bars)
+        if bars.empty:
+            return None
+
+        if self.last_bar_time is None:
+            on_start = getattr(self.module, "on_start", None)
+            if callable(on_start):
+                on_start(bars.iloc[:-1])
+            new_bars = bars.iloc[-1:]
+        else:
+            new_bars = bars[bars.index > self.last_bar_time]
+        if new_bars.empty:
+            return None
+
+        signal = 0
+        for _, bar in new_bars.iterrows():
+            signal = self.module.on_bar(bar)
+        self.last_bar_time = new_bars.index[-1]
+        return signal, new_bars["Close"].iloc[-1]
+
+    def _closed(self, bars):
+        """
+        bars without a last row that is still forming (and not yet due).
+        """
+        if self.interval not in BAR_MINUTES:
+            return bars
+        end = nse.bar_end(bars.index[-1].to_pydatetime(), self.interval)
+        if nse.bar_due(end, settle=0) > datetime.now(IST):
+            return bars.iloc[:-1]
+        return bars
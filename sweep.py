@@ -0,0 +1,356 @@
+import argparse
+import contextlib
+import hashlib
+import inspect
+import io
+import itertools
+import math
+import os
+import random
+import sys
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "strategies"))
+import market_data  # noqa: E402
+from performance import METRICS, PERIODS_PER_YEAR, evaluate  # noqa: E402
+
+# -----------------------------------------------------------------------------
+# Parameter sweeps
+# -----------------------------------------------------------------------------
+# Runs backtest_strategy(symbol, start, end, **params) for every combination
+# of a grid and/or random samples of parameter ranges, and ranks the results.
+# Tunable parameters are the keyword arguments of backtest_strategy.
+#
+# Inside a worker, one sweep chunk:
+#   - downloads nothing twice: the strategy's yf.Ticker(...).history() calls
+#     are answered from frames loaded once per chunk;
+#   - reuses indicators: module functions named calculate_* are memoized on
+#     their arguments and a fingerprint of the input frame, so e.g. the RSI
+#     of one period is computed once for every threshold pair. These
+#     functions must only add columns (the convention in strategies/);
+#   - silences the strategy's progress prints (a module-level print that
+#     never formats its arguments; repr() of a frame costs more than the
+#     backtest itself).
+# Chunks are spread over a StrategyPool of worker processes.
+
+SWEEP_PROCESSES = int(os.getenv("SWEEP_PROCESSES", str(os.cpu_count() or 1)))
+SWEEP_MAX_COMBINATIONS = int(os.getenv("SWEEP_MAX_COMBINATIONS", "20000"))
+MEMO_SIZE = 512
+
+
+# -----------------------------------------------------------------------------
+# Parameter spaces
+# -----------------------------------------------------------------------------
+def strategy_parameters(module):
+    """
+    Tunable parameters of a strategy: keyword arguments of backtest_strategy
+    after (symbol, start_date, end_date), with their defaults.
+    """
+    signature = inspect.signature(module.backtest_strategy)
+    parameters = list(signature.parameters.values())[3:]
+    return {
+        parameter.name: parameter.default
+        for parameter in parameters
+        if parameter.default is not inspect.Parameter.empty
+    }
+
+
+def _values(spec):
+    """
+    [v1, v2, ...] or {"min": a, "max": b, "step": s} -> list of values.
+    """
+    if isinstance(spec, dict):
+        low, high, step = spec["min"], spec["max"], spec.get("step", 1)
+        if step <= 0:
+            raise ValueError("step must be positive")
+        count = int(math.floor((high - low) / step + 1e-9)) + 1
+        values = [low + i * step for i in range(count)]
+        if all(isinstance(value, int) for value in (low, high, step)):
+            return values
+        return [round(value, 10) for value in values]
+    if isinstance(spec, (list, tuple)):
+        return list(spec)
+    return [spec]
+
+
+def expand_grid(grid):
+    """
+    {name: values or range} -> list of parameter dicts (cartesian product).
+    """
+    if not grid:
+        return []
+    names = list(grid)
+    return [dict(zip(names, combo)) for combo in itertools.product(*(_values(grid[name]) for name in names))]
+
+
+def sample_random(ranges, samples, seed=None):
+    """
+    Draw parameter dicts: lists are choices, {"min", "max"} ranges are
+    uniform (integers when both bounds are integers).
+    """
+    rng = random.Random(seed)
+    combos = []
+    for _ in range(samples):
+        combo = {}
+        for name, spec in ranges.items():
+            if isinstance(spec, dict) and "step" not in spec:
+                low, high = spec["min"], spec["max"]
+                if isinstance(low, int) and isinstance(high, int):
+                    combo[name] = rng.randint(low, high)
+                else:
+                    combo[name] = rng.uniform(low, high)
+            else:
+                combo[name] = rng.choice(_values(spec))
+        combos.append(combo)
+    return combos
+
+
+def build_combinations(grid=None, ranges=None, samples=0, seed=None, parameters=None):
+    """
+    Grid and random combinations, de-duplicated, checked against the
+    strategy's parameters and SWEEP_MAX_COMBINATIONS.
+    """
+    combos = expand_grid(grid or {})
+    if samples:
+        combos += sample_random(ranges or {}, samples, seed)
+    if parameters is not None:
+        unknown = sorted({name for combo in combos for name in combo} - set(parameters))
+        if unknown:
+            raise ValueError(f"Unknown parameters {unknown}; strategy accepts {sorted(parameters)}")
+    unique = list({tuple(sorted(combo.items())): combo for combo in combos}.values())
+    if not unique:
+        raise ValueError("No parameter combinations given")
+    if len(unique) > SWEEP_MAX_COMBINATIONS:
+        raise ValueError(f"{len(unique)} combinations exceeds the limit of {SWEEP_MAX_COMBINATIONS}")
+    return unique
+
+
+# -----------------------------------------------------------------------------
+# Data and indicator reuse
+# -----------------------------------------------------------------------------
+class _PreloadedTicker(market_data.CachedTicker):
+    def __init__(self, symbol, frames):
+        super().__init__(symbol)
+        self.frames = frames
+
+    def history(self, *args, **kwargs):
+        if args or set(kwargs) - {"start", "end", "interval"} or kwargs.get("start") is None:
+            return super().history(*args, **kwargs)
+        key = (self.ticker, str(kwargs["start"]), str(kwargs.get("end")), kwargs.get("interval", market_data.DEFAULT_INTERVAL))
+        if key not in self.frames:
+            self.frames[key] = super().history(**kwargs)
+        return self.frames[key].copy()
+
+
+class PreloadedYFinance(market_data.CachedYFinance):
+    """
+    yfinance stand-in that loads each (symbol, range) once per sweep chunk.
+    """
+
+    def __init__(self):
+        self.frames = {}
+
+    def Ticker(self, symbol):
+        return _PreloadedTicker(symbol, self.frames)
+
+
+def _fingerprint(value):
+    if isinstance(value, pd.DataFrame):
+        return ("frame", _fingerprint(value.index), tuple(_fingerprint(value[column]) for column in value.columns))
+    if isinstance(value, (pd.Series, pd.Index)):
+        if isinstance(value.dtype, pd.DatetimeTZDtype) or value.dtype.kind == "M":
+            values = value.array.asi8 if hasattr(value.array, "asi8") else value.to_numpy().view("i8")
+        elif value.dtype == object:
+            values = pd.util.hash_pandas_object(value, index=False).to_numpy()
+        else:
+            values = value.to_numpy()
+        digest = hashlib.blake2b(np.ascontiguousarray(values).tobytes(), digest_size=16).digest()
+        return ("series", getattr(value, "name", None), str(value.dtype), len(value), digest)
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return repr(value)
+
+
+def memoize_indicators(module, memo):
+    """
+    Wrap the module's calculate_* functions with a shared result cache.
+    """
+    for name, function in list(vars(module).items()):
+        if name.startswith("calculate_") and inspect.isfunction(function):
+            setattr(module, name, _memoized(name, function, memo))
+    return module
+
+
+def _memoized(name, function, memo):
+    def wrapper(*args, **kwargs):
+        key = (name, tuple(_fingerprint(arg) for arg in args),
+               tuple(sorted((k, _fingerprint(v)) for k, v in kwargs.items())))
+        frame = args[0] if args and isinstance(args[0], pd.DataFrame) else None
+        cached = memo.get(key)
+        if cached is not None:
+            memo.move_to_end(key)
+            kind, value = cached
+            if kind == "changed":
+                changed, dropped = value
+                for column, values in changed.items():
+                    frame[column] = values.copy()
+                frame.drop(columns=dropped, inplace=True)
+                return frame
+            return value.copy() if hasattr(value, "copy") else value
+
+        result = function(*args, **kwargs)
+        if frame is not None and result is frame:
+            # The frame was updated in place: remember every column added,
+            # overwritten or dropped (the key holds the input's fingerprints)
+            index, columns = key[1][0][1], key[1][0][2]
+            if _fingerprint(frame.index) != index:
+                return result  # Rows changed; replaying columns cannot reproduce that
+            before = {fingerprint[1]: fingerprint for fingerprint in columns}
+            changed = {column: frame[column].to_numpy(copy=True) for column in frame.columns
+                       if column not in before or _fingerprint(frame[column]) != before[column]}
+            dropped = [column for column in before if column not in frame.columns]
+            memo[key] = ("changed", (changed, dropped))
+        else:
+            memo[key] = ("value", result.copy() if hasattr(result, "copy") else result)
+        while len(memo) > MEMO_SIZE:
+            memo.popitem(last=False)
+        return result
+
+    wrapper.__wrapped__ = function
+    return wrapper
+
+
+# -----------------------------------------------------------------------------
+# Scoring
+# -----------------------------------------------------------------------------
+def _quiet(*args, **kwargs):
+    pass
+
+
+def run_combinations(module, symbol, start_date, end_date, combinations, settings=None,
+                     periods_per_year=PERIODS_PER_YEAR):
+    """
+    Backtest and score each combination in this process (settings: quantity,
+    capital, costs and slippage for performance.evaluate). The module is
+    patched in place (preloaded data, memoized indicators).
+    """
+    yfinance = PreloadedYFinance()
+    for name, value in list(vars(module).items()):
+        if value is market_data.yf or value is market_data.cached_yfinance:
+            setattr(module, name, yfinance)
+    memoize_indicators(module, OrderedDict())
+    module.print = _quiet
+
+    rows = []
+    for params in combinations:
+        row = {"params": params}
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                results = module.backtest_strategy(symbol, start_date, end_date, **params)
+            if results is None or len(results) == 0:
+                row["error"] = "No backtest results"
+            else:
+                row.update(evaluate(results, settings, periods_per_year)["summary"])
+        except Exception as e:
+            row["error"] = f"{type(e).__name__}: {e}"
+        rows.append(row)
+    return rows
+
+
+def rank(rows, metric="sharpe", top=None):
+    """
+    Sort by metric, best first (every metric is higher-is-better; drawdowns
+    are negative). Failed combinations go last.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric {metric}; choose from {list(METRICS)}")
+    ranked = sorted(rows, key=lambda row: ("error" in row, -row.get(metric, 0.0)))
+    return ranked[:top] if top else ranked
+
+
+def results_table(rows):
+    """
+    Flatten ranked rows into a DataFrame: one column per parameter and metric.
+    """
+    return pd.DataFrame([dict(row["params"], **{k: v for k, v in row.items() if k != "params"}) for row in rows])
+
+
+# -----------------------------------------------------------------------------
+# Command line
+# -----------------------------------------------------------------------------
+def _parse_spec(text):
+    """
+    "7,14,21" -> list, "5:30:5" -> range, "5:30" -> range for random search.
+    """
+    def number(value):
+        value = value.strip()
+        try:
+            return int(value)
+        except ValueError:
+            return float(value)
+
+    if ":" in text:
+        parts = [number(part) for part in text.split(":")]
+        spec = {"min": parts[0], "max": parts[1]}
+        if len(parts) > 2:
+            spec["step"] = parts[2]
+        return spec
+    return [number(part) for part in text.split(",")]
+
+
+def _parse_assignments(items):
+    specs = {}
+    for item in items or []:
+        name, _, text = item.partition("=")
+        specs[name.strip()] = _parse_spec(text)
+    return specs
+
+
+def _local_code(path):
+    with open(path, "rb") as file:
+        source = file.read()
+    return hashlib.sha256(source).hexdigest(), compile(source, path, "exec")
+
+
+if __name__ == "__main__":
+    from performance import BACKTEST_COST_BPS, BACKTEST_SLIPPAGE_BPS, settings_from
+    from strategy_pool import StrategyPool
+
+    parser = argparse.ArgumentParser(description="Grid / random parameter search for a strategy file")
+    parser.add_argument("strategy", help="Path to a strategy .py file")
+    parser.add_argument("symbol", help="Ticker, e.g. RELIANCE.NS")
+    parser.add_argument("start_date")
+    parser.add_argument("end_date")
+    parser.add_argument("--grid", action="append", help="name=v1,v2,... or name=min:max:step")
+    parser.add_argument("--range", action="append", help="name=min:max or name=v1,v2,... for --random")
+    parser.add_argument("--random", type=int, default=0, help="Number of random samples")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--metric", default="sharpe", choices=METRICS)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--processes", type=int, default=SWEEP_PROCESSES)
+    parser.add_argument("--quantity", type=int)
+    parser.add_argument("--capital", type=float)
+    parser.add_argument("--cost-bps", type=float, default=BACKTEST_COST_BPS)
+    parser.add_argument("--slippage-bps", type=float, default=BACKTEST_SLIPPAGE_BPS)
+    args = parser.parse_args()
+    settings = settings_from(vars(args))
+
+    pool = StrategyPool(_local_code, processes=args.processes)
+    try:
+        parameters = pool.parameters(args.strategy)
+        print(f"Parameters: {parameters}")
+        combos = build_combinations(_parse_assignments(args.grid), _parse_assignments(args.range),
+                                    args.random, args.seed, parameters)
+        started = time.perf_counter()
+        rows = pool.sweep(args.strategy, args.symbol, args.start_date, args.end_date, combos, settings)
+        elapsed = time.perf_counter() - started
+        print(f"{len(combos)} combinations in {elapsed:.2f}s ({args.processes or 1} processes)")
+        print(results_table(rank(rows, args.metric, args.top)).to_string(index=False))
+    finally:
+        pool.shutdown()
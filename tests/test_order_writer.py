@@ -0,0 +1,160 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from fake_supabase import FakeClient, FakeDatabase  # noqa: E402
+from order_writer import OrderWriter  # noqa: E402
+
+# -----------------------------------------------------------------------------
+# OrderWriter against the offline Supabase stand-in
+# -----------------------------------------------------------------------------
+# python -m pytest tests  (or python -m unittest discover tests)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+class OrderWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.spool_path = os.path.join(self.directory, "order_spool.jsonl")
+        self.database = FakeDatabase()
+        self.client = FakeClient(self.database)
+        self.writers = []
+
+    def tearDown(self):
+        for writer in self.writers:
+            writer.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def writer(self, **options):
+        options = dict({"batch_size": 10, "flush_seconds": 0.05, "retries": 2, "base_backoff": 0.01,
+                        "max_backoff": 0.04}, **options)
+        writer = OrderWriter(lambda rows: self.client.table("bot_orders").insert(rows).execute(),
+                             spool_path=self.spool_path, **options)
+        self.writers.append(writer)
+        return writer
+
+    def written(self):
+        return [row["n"] for row in self.database.rows("bot_orders")]
+
+    def spooled(self):
+        rows = []
+        for path in (self.spool_path + ".replay", self.spool_path):
+            if os.path.exists(path):
+                with open(path) as file:
+                    rows += [json.loads(line)["n"] for line in file if line.strip()]
+        return rows
+
+    def test_rows_are_written_in_batches(self):
+        writer = self.writer()
+        for n in range(25):
+            writer.submit({"n": n})
+        writer.start()
+        self.assertTrue(wait_for(lambda: writer.stats["written"] == 25))
+        self.assertEqual(self.written(), list(range(25)))
+        self.assertEqual(self.database.inserts, 3)
+        self.assertEqual(writer.stats["batches"], 3)
+
+    def test_failed_insert_is_retried(self):
+        writer = self.writer()
+        self.database.fail_next = 2
+        writer.start()
+        writer.submit({"n": 0})
+        self.assertTrue(wait_for(lambda: writer.stats["written"] == 1))
+        self.assertEqual(writer.stats["failed_inserts"], 2)
+        self.assertEqual(writer.stats["spooled"], 0)
+        self.assertEqual(self.database.calls, 3)
+
+    def test_backoff_doubles_up_to_the_limit(self):
+        writer = self.writer(retries=0)
+        self.database.down = True
+        for n in range(4):
+            writer._retry_at = 0.0  # Let every batch try the database
+            writer._write([{"n": n}])
+        self.assertEqual(writer._backoff, 0.04)
+        self.assertGreater(writer._retry_at, time.monotonic())
+        self.assertEqual(self.spooled(), [0, 1, 2, 3])
+
+    def test_outage_spools_without_calling_the_database(self):
+        writer = self.writer(retries=0, base_backoff=5.0, max_backoff=5.0)
+        self.database.down = True
+        writer._write([{"n": 0}])
+        calls = self.database.calls
+        writer._write([{"n": 1}])  # Inside the backoff: straight to the spool
+        self.assertEqual(self.database.calls, calls)
+        self.assertEqual(self.spooled(), [0, 1])
+        self.assertEqual(self.written(), [])
+
+    def test_spool_is_replayed_before_newer_rows(self):
+        writer = self.writer(retries=0)
+        self.database.down = True
+        writer._write([{"n": 0}, {"n": 1}])
+        writer._write([{"n": 2}])
+        self.database.down = False
+        writer._retry_at = 0.0
+        writer._write([{"n": 3}])
+        self.assertEqual(self.written(), [0, 1, 2, 3])
+        self.assertEqual(writer.stats["replayed"], 3)
+        self.assertEqual(self.spooled(), [])
+
+    def test_partial_replay_keeps_unsent_rows_first(self):
+        writer = self.writer(batch_size=2)
+        writer._spool([{"n": n} for n in range(5)])
+        insert = writer.insert
+        attempts = []
+
+        def flaky(rows):
+            attempts.append(rows)
+            if len(attempts) == 2:
+                writer._spool([{"n": 5}])  # Arrives while the replay is running
+                raise RuntimeError("Connection reset")
+            insert(rows)
+
+        writer.insert = flaky
+        self.assertFalse(writer._replay())
+        self.assertEqual(self.spooled(), [2, 3, 4, 5])
+        writer.insert = insert
+        self.assertTrue(writer._replay())
+        self.assertEqual(self.written(), [0, 1, 2, 3, 4, 5])
+
+    def test_full_queue_spills_to_the_spool(self):
+        writer = self.writer(queue_size=2)
+        for n in range(5):
+            writer.submit({"n": n})
+        self.assertEqual(writer.stats["overflow"], 3)
+        self.assertEqual(self.spooled(), [2, 3, 4])
+        writer.start()
+        self.assertTrue(wait_for(lambda: writer.stats["written"] == 5))
+        self.assertEqual(sorted(self.written()), list(range(5)))
+        self.assertEqual(self.spooled(), [])
+
+    def test_unwritable_spool_does_not_stop_the_writer(self):
+        writer = self.writer(retries=0)
+        writer.spool_path = os.path.join(self.directory, "missing", "file", "spool.jsonl")
+        os.makedirs(os.path.dirname(os.path.dirname(writer.spool_path)))
+        open(os.path.dirname(writer.spool_path), "w").close()  # A file where the directory should be
+        self.database.down = True
+        writer.start()
+        writer.submit({"n": 0})
+        self.assertTrue(wait_for(lambda: writer.stats["lost"] == 1))
+        self.database.down = False
+        writer._retry_at = 0.0
+        writer.submit({"n": 1})
+        self.assertTrue(wait_for(lambda: writer.stats["written"] == 1))
+        self.assertTrue(writer._thread.is_alive())
+
+
+if __name__ == "__main__":
+    unittest.main()
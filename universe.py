@@ -0,0 +1,178 @@
+import contextlib
+import hashlib
+import io
+import os
+import sys
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "strategies"))
+import market_data  # noqa: E402
+from performance import METRICS, PERIODS_PER_YEAR, evaluate, evaluate_matrix  # noqa: E402
+from sweep import _quiet  # noqa: E402
+
+# -----------------------------------------------------------------------------
+# Universe backtests
+# -----------------------------------------------------------------------------
+# Runs one strategy over many symbols and returns a compact summary per
+# symbol instead of every bar.
+#
+# Symbols whose bars fall on exactly the same dates (on NSE that is nearly
+# every stock over a given range; one listed mid-range or suspended for a
+# while forms a group of its own) are stacked into (dates x symbols) frames,
+# one per field, and handed to the strategy's optional
+#
+#     backtest_universe(panel, **params) -> Signal frame (dates x symbols)
+#
+# where panel maps "Open", "High", "Low", "Close", ... to those frames. pandas
+# computes rolling windows, EWMs and comparisons column-wise in one pass, so
+# fifty symbols cost about as much as one. Signals and metrics are then
+# computed on the whole matrix.
+#
+# Strategies without backtest_universe, and groups whose vectorized pass
+# fails, go through backtest_strategy one symbol at a time instead. Both
+# paths produce the same Signal, so the summary is identical either way.
+
+UNIVERSE_MAX_SYMBOLS = int(os.getenv("UNIVERSE_MAX_SYMBOLS", "500"))
+
+
+def load_bars(symbols, start_date, end_date):
+    """
+    {symbol: bars for [start_date, end_date]} for the symbols with data.
+    """
+    frames = {}
+    for symbol in symbols:
+        df = market_data.fetch_historical_data(symbol, start_date, end_date)
+        if df is not None and not df.empty:
+            frames[symbol] = df
+    return frames
+
+
+def group_by_calendar(frames):
+    """
+    Lists of symbols whose bars have identical timestamps, largest first.
+    """
+    groups = defaultdict(list)
+    for symbol, df in frames.items():
+        stamps = df.index.as_unit("ns").asi8
+        groups[hashlib.blake2b(stamps.tobytes(), digest_size=16).digest()].append(symbol)
+    return sorted(groups.values(), key=len, reverse=True)
+
+
+def _field_values(df, fields):
+    columns = list(df.columns)
+    values = df.to_numpy(dtype=float)
+    return values if columns == fields else values[:, [columns.index(field) for field in fields]]
+
+
+def build_panel(frames, symbols):
+    """
+    {field: (dates x symbols) frame} for the fields every symbol has.
+    """
+    fields = [column for column in frames[symbols[0]].columns
+              if all(column in frames[symbol].columns for symbol in symbols)]
+    index = frames[symbols[0]].index
+    # (dates x fields x symbols), one conversion per symbol
+    values = np.stack([_field_values(frames[symbol], fields) for symbol in symbols], axis=2)
+    return {field: pd.DataFrame(values[:, i, :], index=index, columns=symbols) for i, field in enumerate(fields)}
+
+
+def _summary(symbol, mode, dates, signal, metrics):
+    state = signal[signal != 0]
+    return dict(
+        symbol=symbol,
+        mode=mode,
+        bars=len(dates),
+        start=str(dates[0])[:10] if len(dates) else None,
+        end=str(dates[-1])[:10] if len(dates) else None,
+        last_signal=int(signal[-1]) if len(signal) else 0,
+        position="long" if len(state) and state[-1] == 1 else "flat",
+        **metrics,
+    )
+
+
+def run_vectorized(module, frames, symbols, params, settings=None, periods_per_year=PERIODS_PER_YEAR):
+    """
+    One backtest_universe pass over symbols sharing a calendar.
+    """
+    panel = build_panel(frames, symbols)
+    with contextlib.redirect_stdout(io.StringIO()):
+        signal = module.backtest_universe(panel, **params)
+    signal = pd.DataFrame(signal).reindex(index=panel["Close"].index, columns=symbols)
+    signal = np.nan_to_num(signal.to_numpy(dtype=float)).astype(np.int8)
+    dates = panel["Close"].index
+    metrics = evaluate_matrix(panel["Close"].to_numpy(), signal, dates, periods_per_year, **(settings or {}))
+    return [_summary(symbol, "vectorized", dates, signal[:, i], metrics[i]) for i, symbol in enumerate(symbols)]
+
+
+def run_single(module, symbol, start_date, end_date, params, settings=None, periods_per_year=PERIODS_PER_YEAR):
+    """
+    backtest_strategy for one symbol, summarized like a vectorized column.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = module.backtest_strategy(symbol, start_date, end_date, **params)
+    if results is None or len(results) == 0:
+        return {"symbol": symbol, "mode": "per_symbol", "error": "No backtest results"}
+    dates = results["Date"].to_numpy() if "Date" in results else results.index.to_numpy()
+    signal = np.nan_to_num(results["Signal"].to_numpy(dtype=float)).astype(np.int8)
+    return _summary(symbol, "per_symbol", dates, signal, evaluate(results, settings, periods_per_year)["summary"])
+
+
+def run_universe(module, symbols, start_date, end_date, params=None, settings=None, periods_per_year=PERIODS_PER_YEAR):
+    """
+    Backtest and summarize every symbol in this process (settings: quantity,
+    capital, costs and slippage for performance). Returns one row per
+    symbol, in the order given.
+    """
+    params = params or {}
+    module.print = _quiet
+    frames = load_bars(symbols, start_date, end_date)
+    rows = {symbol: {"symbol": symbol, "error": "No data"} for symbol in symbols if symbol not in frames}
+
+    single = []
+    if hasattr(module, "backtest_universe"):
+        for group in group_by_calendar(frames):
+            try:
+                for row in run_vectorized(module, frames, group, params, settings, periods_per_year):
+                    rows[row["symbol"]] = row
+            except Exception as e:
+                print(f"Vectorized backtest failed for {len(group)} symbols, running them one by one: {e}")
+                single += group
+    else:
+        single = list(frames)
+
+    for symbol in single:
+        try:
+            rows[symbol] = run_single(module, symbol, start_date, end_date, params, settings, periods_per_year)
+        except Exception as e:
+            rows[symbol] = {"symbol": symbol, "mode": "per_symbol", "error": f"{type(e).__name__}: {e}"}
+    return [rows[symbol] for symbol in symbols]
+
+
+def summarize(rows, metric="sharpe"):
+    """
+    Universe-wide figures over the symbols that ran.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric {metric}; choose from {list(METRICS)}")
+    ok = [row for row in rows if "error" not in row]
+    summary = {
+        "symbols": len(rows),
+        "vectorized": sum(1 for row in ok if row["mode"] == "vectorized"),
+        "per_symbol": sum(1 for row in ok if row["mode"] == "per_symbol"),
+        "failed": len(rows) - len(ok),
+        "long": sum(1 for row in ok if row["position"] == "long"),
+    }
+    if ok:
+        values = np.array([row[metric] for row in ok])
+        best, worst = int(values.argmax()), int(values.argmin())
+        summary.update({
+            "metric": metric,
+            "mean": float(values.mean()),
+            "median": float(np.median(values)),
+            "best": {"symbol": ok[best]["symbol"], metric: float(values[best])},
+            "worst": {"symbol": ok[worst]["symbol"], metric: float(values[worst])},
+        })
+    return summary